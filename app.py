@@ -5,13 +5,19 @@ EasyCut - Backend Unificado
 API para gerenciamento de barbearias e validação de formulários.
 """
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, make_response
 from flask_cors import CORS
 import json
 import sys
 import logging
 import os
 import math
+import base64
+import queue
+import time as time_module
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from typing import Dict, List, Any, Optional, Callable, Tuple
 from dataclasses import dataclass, asdict, replace
@@ -22,8 +28,6 @@ from email_validator import validate_email, EmailNotValidError
 # Configuração de log para o Render (aparecerá nos Logs do Dashboard)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
 
 # --- AJUSTE DE PATH PARA DEPLOY (Render/Railway) ---
 # Adiciona o diretório 'backend' ao sys.path para que as importações funcionem corretamente
@@ -40,6 +44,23 @@ try:
     from backend.phone_validator import PhoneValidator
     from backend.cpf_cnpj_validator import CPFCNPJValidator
     from backend.email_check_logic import EmailValidator
+    from backend.outbox import (enqueue_event, cancel_pending_events, reminder_time_utc, outbox_metrics,
+                                EVENTO_CRIADO, EVENTO_CONFIRMADO, EVENTO_CANCELADO, EVENTO_LEMBRETE)
+    from backend.migrations import run_migrations
+    from backend.agenda_sync import (initial_position, changed_rows_condition, fetch_removals, sync_cutoff,
+                                     SAFETY_LAG_SECONDS)
+    from backend.event_bus import EventBus
+    from backend.http_cache import make_etag, etag_matches, EtagStats
+    from backend.rollups import (apply_change as rollup_apply_change, query_series as rollup_series,
+                                 GROUPS as ROLLUP_GROUPS, apply_review_change, review_summary)
+    from backend.archive import ARCHIVE_TABLE
+    from backend.schedule import diff_schedule, load_stored_schedule, apply_schedule_diff, ScheduleCache, OpenIndex
+    from backend.geocoding import (request_geocode, build_address, nominatim_suggestions, in_region_text,
+                                   STATUS_PENDENTE, STATUS_SEM_ENDERECO)
+    from backend.geocode_cache import get_geocode_cache
+    from backend.cache_utils import PrefixCache, SingleFlight, normalize_query
+    from backend.resilience import quota_snapshot
+    from backend.blended_search import ExternalSearch, external_item, merge_external
 except (ImportError, ModuleNotFoundError):
     # Fallback para importação direta (ideal para execução local ou via sys.path)
     from google_places_integration import PlacesService
@@ -47,6 +68,23 @@ except (ImportError, ModuleNotFoundError):
     from phone_validator import PhoneValidator
     from cpf_cnpj_validator import CPFCNPJValidator
     from email_check_logic import EmailValidator
+    from outbox import (enqueue_event, cancel_pending_events, reminder_time_utc, outbox_metrics,
+                        EVENTO_CRIADO, EVENTO_CONFIRMADO, EVENTO_CANCELADO, EVENTO_LEMBRETE)
+    from migrations import run_migrations
+    from agenda_sync import (initial_position, changed_rows_condition, fetch_removals, sync_cutoff,
+                             SAFETY_LAG_SECONDS)
+    from event_bus import EventBus
+    from http_cache import make_etag, etag_matches, EtagStats
+    from rollups import (apply_change as rollup_apply_change, query_series as rollup_series,
+                         GROUPS as ROLLUP_GROUPS, apply_review_change, review_summary)
+    from archive import ARCHIVE_TABLE
+    from schedule import diff_schedule, load_stored_schedule, apply_schedule_diff, ScheduleCache, OpenIndex
+    from geocoding import (request_geocode, build_address, nominatim_suggestions, in_region_text,
+                           STATUS_PENDENTE, STATUS_SEM_ENDERECO)
+    from geocode_cache import get_geocode_cache
+    from cache_utils import PrefixCache, SingleFlight, normalize_query
+    from resilience import quota_snapshot
+    from blended_search import ExternalSearch, external_item, merge_external
 
 # Configura explicitamente as pastas de templates e static
 app = Flask(__name__, 
@@ -119,152 +157,10 @@ def init_db():
             conn = get_db_connection()
 
         if conn and conn.is_connected():
-            cursor = conn.cursor()
-            # Tabelas omitidas por brevidade, mas seguem o esquema original
-            # (Clientes, Barbearias, Servicos, Agendamentos, Horarios, Favoritos, Fotos)
-            # ... [Código de criação de tabelas e migrações do barbearias_api.py aqui] ...
-            # Para garantir funcionalidade, o código de init_db do barbearias_api.py deve ser mantido na íntegra.
-            
-            # Criação das tabelas (Restaurado do esquema original)
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS clientes (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    nome_completo VARCHAR(255) NOT NULL,
-                    email VARCHAR(255) NOT NULL UNIQUE,
-                    telefone VARCHAR(20),
-                    senha_hash VARCHAR(255) NOT NULL,
-                    foto_perfil VARCHAR(255),
-                    termos_aceitos TINYINT(1) DEFAULT 1,
-                    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS barbearias (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    nome_barbearia VARCHAR(255) NOT NULL,
-                    cnpj_cpf VARCHAR(20) NOT NULL UNIQUE,
-                    nome_responsavel VARCHAR(255) NOT NULL,
-                    email VARCHAR(255) NOT NULL UNIQUE,
-                    whatsapp VARCHAR(20) NOT NULL,
-                    senha_hash VARCHAR(255) NOT NULL,
-                    termos_aceitos TINYINT(1) DEFAULT 1,
-                    foto_perfil LONGTEXT,
-                    telefone_fixo VARCHAR(20),
-                    instagram VARCHAR(255),
-                    facebook VARCHAR(255),
-                    website VARCHAR(255),
-                    descricao TEXT,
-                    cep VARCHAR(10),
-                    logradouro VARCHAR(255),
-                    numero VARCHAR(20),
-                    complemento VARCHAR(255),
-                    bairro VARCHAR(100),
-                    cidade VARCHAR(100),
-                    estado VARCHAR(2),
-                    ponto_referencia VARCHAR(255),
-                    latitude DECIMAL(10, 8),
-                    longitude DECIMAL(11, 8),
-                    quantidade_barbeiros INT DEFAULT 1,
-                    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS servicos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    barbearia_id INT NOT NULL,
-                    nome_servico VARCHAR(255) NOT NULL,
-                    preco DECIMAL(10, 2),
-                    duracao_minutos INT,
-                    categoria VARCHAR(100),
-                    descricao TEXT,
-                    status VARCHAR(50) DEFAULT 'ativo',
-                    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id)
-                )
-            ''')
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS agendamentos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    cliente_id INT NOT NULL,
-                    barbearia_id INT NOT NULL,
-                    servico_id INT NOT NULL,
-                    data_agendamento DATE NOT NULL,
-                    horario_inicio TIME NOT NULL,
-                    status VARCHAR(50) DEFAULT 'pendente',
-                    valor_total DECIMAL(10, 2),
-                    observacoes TEXT,
-                    avaliacao_nota DECIMAL(2, 1),
-                    avaliacao_comentario TEXT,
-                    resposta_barbearia TEXT,
-                    data_resposta TIMESTAMP NULL,
-                    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (cliente_id) REFERENCES clientes(id),
-                    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id),
-                    FOREIGN KEY (servico_id) REFERENCES servicos(id)
-                )
-            ''')
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS horarios_status (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    barbearia_id INT NOT NULL,
-                    dia_semana VARCHAR(20) NOT NULL,
-                    status VARCHAR(10) DEFAULT 'open',
-                    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id) ON DELETE CASCADE,
-                    UNIQUE KEY unique_status_dia (barbearia_id, dia_semana)
-                )
-            ''')
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS horarios_slots (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    barbearia_id INT NOT NULL,
-                    dia_semana VARCHAR(20) NOT NULL,
-                    inicio TIME NOT NULL,
-                    fim TIME NOT NULL,
-                    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id) ON DELETE CASCADE
-                )
-            ''')
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS barbearia_fotos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    barbearia_id INT NOT NULL,
-                    foto LONGTEXT NOT NULL,
-                    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id) ON DELETE CASCADE
-                )
-            ''')
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS cliente_favoritos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    cliente_id INT NOT NULL,
-                    barbearia_id INT NOT NULL,
-                    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE KEY uq_cliente_barbearia (cliente_id, barbearia_id),
-                    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE,
-                    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id) ON DELETE CASCADE
-                )
-            ''')
-
-            try:
-                cursor.execute('ALTER TABLE clientes MODIFY COLUMN foto_perfil LONGTEXT NULL')
-            except Exception:
-                pass
-
-            try:
-                cursor.execute('ALTER TABLE agendamentos ADD COLUMN duracao_total INT DEFAULT 30 AFTER horario_inicio')
-                conn.commit()
-            except Exception:
-                pass
-
+            # Esquema versionado: backend/migrations/NNNN_*.sql, controlado por schema_version
+            run_migrations(conn)
             print("[OK] Tabelas do banco de dados verificadas/criadas.")
-            conn.commit()
+            conn.close()
     except Exception as e:
         print(f"[ERRO] Ao inicializar banco: {e}")
         print(f"[ERRO] Falha crítica ao inicializar banco: {e}")
@@ -272,45 +168,10 @@ def init_db():
 
 def fetch_barbearia_opening_hours(cursor, barbearia_id):
     try:
-        cursor.execute('SELECT dia_semana, status FROM horarios_status WHERE barbearia_id = %s', (barbearia_id,))
-        status_map = {}
-        for row in cursor.fetchall():
-            if isinstance(row, dict):
-                status_map[row['dia_semana']] = row['status']
-            else:
-                status_map[row[0]] = row[1]
-        cursor.execute('''
-            SELECT dia_semana, MIN(inicio) AS inicio, MAX(fim) AS fim
-            FROM horarios_slots WHERE barbearia_id = %s GROUP BY dia_semana
-        ''', (barbearia_id,))
-        slots_map = {}
-        for row in cursor.fetchall():
-            if isinstance(row, dict):
-                slots_map[row['dia_semana']] = (row['inicio'], row['fim'])
-            else:
-                slots_map[row[0]] = (row[1], row[2])
-        hours = {}
-        for day in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']:
-            status = status_map.get(day, 'closed')
-            if status == 'open' and day in slots_map:
-                open_t, close_t = slots_map[day]
-                hours[day] = {"open": str(open_t)[:5], "close": str(close_t)[:5]}
-            else:
-                hours[day] = {"closed": True}
-        return hours
+        return schedule_cache.get(cursor, barbearia_id).opening_hours()
     except Exception:
         return {}
 
-def _geocode_address(data):
-    try:
-        parts = [data.get('logradouro'), data.get('numero'), data.get('bairro'), data.get('cidade'), data.get('estado'), 'Brasil']
-        full_address = ", ".join([str(p) for p in parts if p])
-        geolocator = Nominatim(user_agent="easycut_app/1.0")
-        location = geolocator.geocode(full_address, timeout=10)
-        if location: return location.latitude, location.longitude
-    except Exception: pass
-    return None, None
-
 # --- UTILITÁRIOS DE SERIALIZAÇÃO E TEMPO (MIGRADOS) ---
 def _json_safe(v: Any) -> Any:
     if isinstance(v, Decimal): return float(v)
@@ -376,10 +237,9 @@ def serialize_barbearia_for_template(cursor, row: Dict[str, Any], barbearia_id:
         if f and str(f) not in photos: photos.append(str(f))
     out["photos"] = photos
 
-    cursor.execute("SELECT AVG(avaliacao_nota) FROM agendamentos WHERE barbearia_id = %s AND avaliacao_nota IS NOT NULL", (barbearia_id,))
-    avg_row = cursor.fetchone()
-    res = avg_row['AVG(avaliacao_nota)'] if isinstance(avg_row, dict) else (avg_row[0] if avg_row else None)
-    out["rating"] = float(res) if res is not None else 5.0
+    resumo = review_summary(cursor, barbearia_id)
+    out["rating"] = resumo["average"] if resumo["average"] is not None else 5.0
+    out["reviews_count"] = resumo["total"]
     out["price_level"] = 2
     return out
 
@@ -387,6 +247,110 @@ def serialize_barbearia_for_template(cursor, row: Dict[str, Any], barbearia_id:
 def _intervals_overlap(a0: int, a1: int, b0: int, b1: int) -> bool:
     return a0 < b1 and b0 < a1
 
+def _now_br() -> datetime:
+    """Horário de Brasília (UTC-3), o mesmo usado no cálculo de disponibilidade."""
+    return datetime.utcnow() - timedelta(hours=3)
+
+def _encode_cursor(*parts: Any) -> str:
+    raw = "|".join(str(_json_safe(p)) for p in parts)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(token: str, n_parts: int) -> List[str]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8")
+    except Exception:
+        raise ValueError("Cursor inválido.")
+    parts = raw.split("|")
+    if len(parts) != n_parts:
+        raise ValueError("Cursor inválido.")
+    return parts
+
+_AGENDA_SCOPES = ("upcoming", "history")
+_AGENDA_PAGE_MAX = 200
+
+def _agenda_page_filters(args, owner_col: str, owner_id: int) -> Tuple[List[str], List[Any], bool, Optional[int]]:
+    """
+    Monta os filtros de listagem de agendamentos a partir da query string.
+
+    Aceita from/to (YYYY-MM-DD), status (lista separada por vírgula, valores da API),
+    scope=upcoming|history e paginação por chave (limit + cursor) sobre
+    (data_agendamento, horario_inicio, id), coberta pelos índices *_agenda.
+    Retorna (condições, parâmetros, ordem_crescente, limit); sem limit/cursor/scope
+    a listagem continua completa, como antes.
+    """
+    where, params = [f"{owner_col} = %s"], [owner_id]
+    for key, op in (("from", ">="), ("to", "<=")):
+        val = (args.get(key) or "").strip()
+        if val:
+            try:
+                datetime.strptime(val, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"Parâmetro '{key}' deve estar no formato YYYY-MM-DD.")
+            where.append(f"a.data_agendamento {op} %s")
+            params.append(val)
+
+    # "?status=," não filtra nada (um IN () vazio seria erro de SQL)
+    statuses = [api_status_to_db(s.strip()) for s in (args.get("status") or "").split(",") if s.strip()]
+    if statuses:
+        where.append(f"a.status IN ({', '.join(['%s'] * len(statuses))})")
+        params.extend(statuses)
+
+    scope = (args.get("scope") or "").strip().lower()
+    if scope and scope not in _AGENDA_SCOPES:
+        raise ValueError("Parâmetro 'scope' deve ser 'upcoming' ou 'history'.")
+    if scope:
+        now = _now_br()
+        today, now_t = now.date().isoformat(), now.strftime("%H:%M:%S")
+        if scope == "upcoming":
+            where.append("(a.data_agendamento > %s OR (a.data_agendamento = %s AND a.horario_inicio >= %s))")
+        else:
+            where.append("(a.data_agendamento < %s OR (a.data_agendamento = %s AND a.horario_inicio < %s))")
+        params.extend([today, today, now_t])
+    ascending = scope == "upcoming"
+
+    limit = None
+    cursor_token = (args.get("cursor") or "").strip()
+    if args.get("limit") or cursor_token or scope:
+        try:
+            limit = int(args.get("limit") or 50)
+        except ValueError:
+            raise ValueError("Parâmetro 'limit' inválido.")
+        limit = max(1, min(limit, _AGENDA_PAGE_MAX))
+    if cursor_token:
+        cursor_scope, d, h, last_id = _decode_cursor(cursor_token, 4)
+        # O cursor só vale para a ordenação em que foi gerado (upcoming é crescente, o resto decrescente)
+        if cursor_scope != (scope or "all"):
+            raise ValueError("Cursor não corresponde ao parâmetro 'scope' da consulta.")
+        op = ">" if ascending else "<"
+        where.append(f"(a.data_agendamento {op} %s OR (a.data_agendamento = %s AND "
+                     f"(a.horario_inicio {op} %s OR (a.horario_inicio = %s AND a.id {op} %s))))")
+        params.extend([d, d, h, h, int(last_id)])
+    return where, params, ascending, limit
+
+def _agenda_order_sql(ascending: bool, prefix: str = "a.") -> str:
+    direction = "ASC" if ascending else "DESC"
+    return f"{prefix}data_agendamento {direction}, {prefix}horario_inicio {direction}, {prefix}id {direction}"
+
+def _archive_select(base_select: str) -> str:
+    """A mesma consulta lendo de agendamentos_arquivo (histórico movido por backend/archive.py)."""
+    assert "FROM agendamentos a" in base_select
+    return base_select.replace("FROM agendamentos a", f"FROM {ARCHIVE_TABLE} a", 1)
+
+def _agenda_next_cursor(rows: List[Dict[str, Any]], limit: Optional[int], scope: str = "") -> Optional[str]:
+    """Remove a linha extra buscada com LIMIT n+1 e devolve o cursor da próxima página (preso ao scope)."""
+    if limit is None or len(rows) <= limit:
+        return None
+    del rows[limit:]
+    last = rows[-1]
+    return _encode_cursor(scope or "all", last["data_agendamento"], _as_hhmm_ss(last["horario_inicio"]), last["id"])
+
+def _as_hhmm_ss(val: Any) -> str:
+    if isinstance(val, timedelta):
+        total = int(val.total_seconds()) % 86400
+        return f"{total // 3600:02d}:{(total % 3600) // 60:02d}:{total % 60:02d}"
+    s = str(val)
+    return s if len(s) >= 8 else f"{s[:5]}:00"
+
 def _serialize_review_row(r: Dict[str, Any], for_barber: bool) -> Dict[str, Any]:
     nome = r.get("nome_cliente") or "Cliente"
     base = {
@@ -424,6 +388,58 @@ class Barbearia:
 class FilterOptions:
     min_rating: Optional[float] = None; max_price_level: Optional[int] = None
     services: Optional[List[str]] = None; max_distance: Optional[float] = None
+    open_at: Optional[Tuple[str, int]] = None  # (dia da semana, minuto do dia)
+
+    @classmethod
+    def from_request(cls, data: Dict[str, Any]) -> "FilterOptions":
+        """
+        Lê os filtros do corpo de /api/barbearias/nearby
+
+        open_now=true usa o horário de Brasília; open_at aceita 'YYYY-MM-DDTHH:MM'.
+
+        Raises:
+            ValueError: Valor de filtro inválido
+        """
+        f = cls()
+        if data.get('min_rating') not in (None, ''):
+            f.min_rating = float(data['min_rating'])
+        if data.get('max_price_level') not in (None, ''):
+            f.max_price_level = int(data['max_price_level'])
+        services = data.get('services')
+        if isinstance(services, str):
+            # "corte, barba" vale como lista; iterar a string daria um filtro por letra
+            services = services.split(',')
+        elif services and not isinstance(services, (list, tuple)):
+            raise ValueError("Parâmetro 'services' deve ser uma lista ou texto separado por vírgula.")
+        if services:
+            f.services = [str(x).strip().lower() for x in services if str(x).strip()] or None
+        if data.get('max_distance') not in (None, ''):
+            f.max_distance = float(data['max_distance'])
+        when = None
+        if data.get('open_at'):
+            when = datetime.fromisoformat(str(data['open_at']))
+        elif data.get('open_now') in (True, 'true', '1', 1):
+            when = _now_br()
+        if when is not None:
+            f.open_at = (_weekday_key(when.date()), when.hour * 60 + when.minute)
+        return f
+
+    def accepts(self, item: Dict[str, Any]) -> bool:
+        """Filtros que dependem do item serializado (nota, preço, serviços, distância)"""
+        if self.min_rating is not None and float(item.get('rating') or 0) < self.min_rating:
+            return False
+        if self.max_price_level is not None and int(item.get('price_level') or 0) > self.max_price_level:
+            return False
+        if self.services:
+            offered = {str(x).lower() for x in item.get('services') or []}
+            if not all(any(wanted in o for o in offered) for wanted in self.services):
+                return False
+        if self.max_distance is not None and item.get('distance') is not None and item['distance'] > self.max_distance:
+            return False
+        return True
+
+# Tempo máximo que a busca por proximidade espera pelo Google Places (a consulta ao banco corre junto)
+EXTERNAL_SEARCH_BUDGET = float(os.getenv('NEARBY_EXTERNAL_BUDGET_MS', 800)) / 1000
 
 class BarbeariasService:
     def __init__(self):
@@ -432,6 +448,23 @@ class BarbeariasService:
             api_key = os.getenv('GOOGLE_PLACES_API_KEY')
             if api_key: self.places_service = PlacesService(api_key)
         except Exception: pass
+        # Consumidores da busca externa (a busca em si usa o pool do PlacesService)
+        self.external_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='nearby-externo')
+
+    def _start_external_search(self, lat, lng, radius):
+        places = self.places_service
+        return ExternalSearch(lambda stop: places.iter_nearby_barbearias(float(lat), float(lng),
+                                                                         int(float(radius) * 1000), stop=stop),
+                              self.external_executor, EXTERNAL_SEARCH_BUDGET)
+
+    def _external_results(self, search, own, lat, lng, radius, filters):
+        """Externos dentro do raio e dos filtros, sem repetir as barbearias cadastradas."""
+        items = [external_item(p, float(lat), float(lng)) for p in search.collect()]
+        items = [i for i in items if i is not None and i['distance'] <= float(radius)
+                 and (filters is None or filters.accepts(i))]
+        if search.timed_out:
+            print(f"[AVISO] Google Places passou de {EXTERNAL_SEARCH_BUDGET * 1000:.0f} ms; {len(items)} resultado(s) parcial(is)")
+        return merge_external(own, items)
 
     def _calculate_distance(self, lat1, lng1, lat2, lng2):
         R = 6371
@@ -439,10 +472,15 @@ class BarbeariasService:
         a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng/2)**2
         return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
 
-    def find_nearby_barbearias(self, lat=None, lng=None, radius=5.0, filters=None, name=None):
+    def find_nearby_barbearias(self, lat=None, lng=None, radius=5.0, filters=None, name=None, include_external=False):
         conn = get_db_connection()
         if not conn:
             return None
+        # Google Places só na busca por localização e sem filtro de horário (não há grade dos externos)
+        external = None
+        if (include_external and self.places_service and lat is not None and lng is not None and not name
+                and (filters is None or filters.open_at is None)):
+            external = self._start_external_search(lat, lng, radius)
         try:
             cursor = conn.cursor(dictionary=True)
             sql = """
@@ -460,6 +498,13 @@ class BarbeariasService:
             rows = cursor.fetchall()
             results = []
             has_coords = lat is not None and lng is not None
+            # "Aberta agora/em": um conjunto do índice e teste de pertinência por barbearia
+            open_ids = None
+            if filters is not None and filters.open_at is not None:
+                open_ids = open_index.open_at(cursor, *filters.open_at)
+                rows = [r for r in rows if r['id'] in open_ids]
+            # Grades de todas as candidatas de uma vez (cache do processo, validado por versão)
+            schedules = schedule_cache.get_many(cursor, [r['id'] for r in rows])
 
             for r in rows:
                 bid = r['id']
@@ -473,7 +518,9 @@ class BarbeariasService:
                     pass
 
                 dist = None
-                if has_coords and lat_b is not None and lng_b is not None:
+                # Endereço alterado e ainda não geocodificado: as coordenadas são do endereço antigo
+                pending = r.get('geocode_status') == STATUS_PENDENTE
+                if has_coords and lat_b is not None and lng_b is not None and not pending:
                     dist = self._calculate_distance(float(lat), float(lng), lat_b, lng_b)
 
                 if name:
@@ -486,13 +533,19 @@ class BarbeariasService:
                 if not include:
                     continue
 
-                item = serialize_barbearia_for_template(cursor, r, bid, fetch_barbearia_opening_hours)
+                item = serialize_barbearia_for_template(cursor, r, bid,
+                                                        lambda _cur, b: schedules[int(b)].opening_hours())
                 item['id'] = str(bid)
                 item['distance'] = dist
                 item['place_id'] = f"db_{bid}"
                 item['appointment_count'] = int(r.get('appointment_count') or 0)
+                if filters is not None and not filters.accepts(item):
+                    continue
                 results.append(item)
 
+            if external is not None:
+                results.extend(self._external_results(external, results, lat, lng, radius, filters))
+
             if name is None and lat is None and lng is None:
                 results.sort(key=lambda x: x.get('appointment_count', 0), reverse=True)
             elif lat is not None and lng is not None:
@@ -515,6 +568,10 @@ class BarbeariasService:
             except Exception:
                 pass
             raise
+        finally:
+            # Sem resposta para a busca externa (erro antes do collect): as buscas do Google param
+            if external is not None:
+                external.cancel()
 
 # Inicialização de instâncias globais
 barbearias_service = BarbeariasService()
@@ -522,6 +579,90 @@ validator = FormValidator()
 phone_validator = PhoneValidator()
 cpf_cnpj_validator = CPFCNPJValidator()
 email_validator_service = EmailValidator()
+# Acorda os streams SSE deste worker quando um agendamento da barbearia é gravado
+agenda_events = EventBus()
+# Acertos (304) e faltas (200) das rotas com GET condicional
+etag_stats = EtagStats()
+# Grades de horário compiladas (detalhes, busca e disponibilidade)
+schedule_cache = ScheduleCache()
+# Barbearias abertas por (dia, minuto), para os filtros "aberta agora/em"
+open_index = OpenIndex()
+# Sugestões de endereço por prefixo (compartilhadas entre usuários) e coalescência das consultas em andamento
+address_suggestions = PrefixCache(max_entries=4096, ttl=6 * 3600)
+suggestion_flight = SingleFlight()
+
+# --- VERSÕES DE RECURSOS (ETag / GET condicional) ---
+def _bump_version(cur, escopo: str, escopo_id: Any, recurso: str) -> None:
+    """Incrementa a versão do recurso; chamar na mesma transação da escrita."""
+    cur.execute("""INSERT INTO recurso_versoes (escopo, escopo_id, recurso, versao) VALUES (%s, %s, %s, 1)
+                   ON DUPLICATE KEY UPDATE versao = versao + 1""", (escopo, escopo_id, recurso))
+
+def _resource_versions(cur, escopo: str, escopo_id: Any, recursos: Tuple[str, ...]) -> Tuple[int, ...]:
+    """Versões atuais dos recursos (0 para os que nunca foram escritos)."""
+    cur.execute("SELECT recurso, versao FROM recurso_versoes WHERE escopo = %s AND escopo_id = %s",
+                (escopo, escopo_id))
+    found = {}
+    for r in cur.fetchall():
+        found[r['recurso'] if isinstance(r, dict) else r[0]] = int(r['versao'] if isinstance(r, dict) else r[1])
+    return tuple(found.get(rec, 0) for rec in recursos)
+
+def conditional_get(route_name: str, token_fn: Callable[..., Any]):
+    """
+    Decorator de GET condicional: calcula o token de versão (consulta por chave
+    primária em recurso_versoes) e responde 304 se o If-None-Match bater, sem
+    executar a consulta completa nem a serialização da rota.
+
+    Args:
+        route_name (str): Nome usado nas métricas de acerto
+        token_fn (Callable): Recebe (cursor, **kwargs da rota) e devolve o token
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            token = None
+            conn = get_db_connection()
+            if conn:
+                cur = conn.cursor()
+                try:
+                    token = token_fn(cur, **kwargs)
+                except Exception as e:
+                    print(f"[AVISO] ETag indisponível para {route_name}: {e}")
+                finally:
+                    cur.close(); conn.close()
+            if token is None:
+                return view(**kwargs)
+            etag = make_etag(route_name, kwargs, token, request.query_string.decode('utf-8', 'replace'))
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                etag_stats.record(route_name, True)
+                resp = Response(status=304)
+            else:
+                etag_stats.record(route_name, False)
+                resp = make_response(view(**kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.headers['ETag'] = etag
+            # Obriga o navegador a revalidar sempre (a revalidação é barata)
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp
+        return wrapper
+    return decorator
+
+def _barbearia_token(*recursos: str) -> Callable[..., Tuple[int, ...]]:
+    def token(cur, barbearia_id, **_):
+        return _resource_versions(cur, 'barbearia', barbearia_id, recursos)
+    return token
+
+def _favoritos_token(cur, cliente_id, **_) -> Tuple[int, ...]:
+    # A lista mostra dados das barbearias favoritas; as versões só crescem,
+    # então a soma muda sempre que qualquer uma delas é alterada.
+    (fav_version,) = _resource_versions(cur, 'cliente', cliente_id, ('favoritos',))
+    cur.execute("""SELECT COALESCE(SUM(v.versao), 0) FROM cliente_favoritos f
+                   JOIN recurso_versoes v ON v.escopo = 'barbearia' AND v.escopo_id = f.barbearia_id
+                        AND v.recurso IN ('perfil', 'servicos', 'avaliacoes')
+                   WHERE f.cliente_id = %s""", (cliente_id,))
+    row = cur.fetchone()
+    total = (list(row.values())[0] if isinstance(row, dict) else row[0]) if row else 0
+    return fav_version, int(total or 0)
 
 # --- ROTAS DE VALIDAÇÃO (Antiga api_validator.py) ---
 @app.route('/')
@@ -653,9 +794,19 @@ def get_nearby_barbearias():
         radius = float(data.get('radius', 5.0))
     except (TypeError, ValueError):
         radius = 5.0
+    try:
+        filters = FilterOptions.from_request(data)
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'Filtros inválidos (services deve ser uma lista; open_at deve ser YYYY-MM-DDTHH:MM).',
+            'barbearias': [],
+            'total': 0,
+        }), 400
 
     try:
-        results = barbearias_service.find_nearby_barbearias(lat, lng, radius, name=name)
+        results = barbearias_service.find_nearby_barbearias(lat, lng, radius, filters=filters, name=name,
+                                                            include_external=bool(data.get('include_external')))
     except Exception as e:
         print(f"[ERRO] get_nearby_barbearias: {e}")
         return jsonify({
@@ -754,6 +905,15 @@ def update_cliente(cliente_id):
     params.append(cliente_id)
     try:
         cursor.execute(f"UPDATE clientes SET {', '.join(updates)} WHERE id = %s", tuple(params))
+        if 'nome_completo' in data:
+            # O nome do cliente aparece nas avaliações das barbearias que ele avaliou
+            cursor.execute(f"""INSERT INTO recurso_versoes (escopo, escopo_id, recurso, versao)
+                               SELECT 'barbearia', barbearia_id, 'avaliacoes', 1 FROM (
+                                   SELECT barbearia_id FROM agendamentos WHERE cliente_id = %s AND avaliacao_nota IS NOT NULL
+                                   UNION
+                                   SELECT barbearia_id FROM {ARCHIVE_TABLE} WHERE cliente_id = %s AND avaliacao_nota IS NOT NULL
+                               ) h
+                               ON DUPLICATE KEY UPDATE versao = versao + 1""", (cliente_id, cliente_id))
         conn.commit()
         cursor.close()
         conn.close()
@@ -811,8 +971,10 @@ def delete_barbearia_foto(barbearia_id, foto_id):
         'DELETE FROM barbearia_fotos WHERE id = %s AND barbearia_id = %s',
         (foto_id, barbearia_id)
     )
-    conn.commit()
     deleted = cursor.rowcount
+    if deleted:
+        _bump_version(cursor, 'barbearia', barbearia_id, 'perfil')
+    conn.commit()
     cursor.close()
     conn.close()
     if not deleted:
@@ -854,8 +1016,9 @@ def add_barbearia_foto(barbearia_id):
             'INSERT INTO barbearia_fotos (barbearia_id, foto) VALUES (%s, %s)',
             (barbearia_id, foto_b64)
         )
-        conn.commit()
         new_id = cursor.lastrowid
+        _bump_version(cursor, 'barbearia', barbearia_id, 'perfil')
+        conn.commit()
         cursor.close()
         conn.close()
         return jsonify({'success': True, 'id': new_id})
@@ -866,6 +1029,7 @@ def add_barbearia_foto(barbearia_id):
         return jsonify({'success': False, 'message': str(e)}), 400
 
 @app.route('/api/barbearias/<int:barbearia_id>', methods=['GET'])
+@conditional_get('barbearia_detalhes', _barbearia_token('perfil', 'servicos', 'horarios', 'avaliacoes'))
 def get_barbearia_details(barbearia_id):
     conn = get_db_connection()
     if not conn: return jsonify({'success': False, 'message': 'Erro DB'}), 500
@@ -905,11 +1069,9 @@ def update_barbearia(barbearia_id):
     for k, v in data.items():
         if k in _BARBEARIA_PUT_FIELDS:
             merged[k] = v
-    if _LOCATION_KEYS & set(data.keys()):
-        lat, lng = _geocode_address(merged)
-        if lat is not None and lng is not None:
-            data['latitude'] = lat
-            data['longitude'] = lng
+    # Endereço alterado: coordenadas resolvidas em segundo plano (outbox -> backend/geocoding.py)
+    regeocode = bool(_LOCATION_KEYS & set(data.keys())) and \
+        (build_address(merged), merged.get('cep')) != (build_address(row), row.get('cep'))
     updates = []
     params = []
     for k, v in data.items():
@@ -923,10 +1085,12 @@ def update_barbearia(barbearia_id):
     params.append(barbearia_id)
     try:
         cursor.execute(f"UPDATE barbearias SET {', '.join(updates)} WHERE id = %s", tuple(params))
+        geocode_status = request_geocode(cursor, barbearia_id, merged) if regeocode else row.get('geocode_status')
+        _bump_version(cursor, 'barbearia', barbearia_id, 'perfil')
         conn.commit()
         cursor.close()
         conn.close()
-        return jsonify({'success': True, 'message': 'Dados atualizados.'})
+        return jsonify({'success': True, 'message': 'Dados atualizados.', 'geocodeStatus': geocode_status})
     except Exception as e:
         conn.rollback()
         cursor.close()
@@ -960,6 +1124,7 @@ def change_password_barbearia(barbearia_id):
             return jsonify({'success': False, 'message': 'A senha atual está incorreta.'}), 401
         
         cursor.execute('UPDATE barbearias SET senha_hash = %s WHERE id = %s', (nova, barbearia_id))
+        _bump_version(cursor, 'barbearia', barbearia_id, 'perfil')
         conn.commit()
         return jsonify({'success': True, 'message': 'Senha alterada com sucesso!'})
     except Exception as e:
@@ -970,6 +1135,7 @@ def change_password_barbearia(barbearia_id):
 
 # --- ROTAS DE SERVIÇOS ---
 @app.route('/api/barbearias/<int:barbearia_id>/servicos', methods=['GET'])
+@conditional_get('barbearia_servicos', _barbearia_token('servicos'))
 def list_servicos_barbearia(barbearia_id):
     conn = get_db_connection()
     if not conn: return jsonify({'success': False}), 500
@@ -994,13 +1160,16 @@ def create_servico_barbearia(barbearia_id):
                        VALUES (%s,%s,%s,%s,%s,%s,%s)""",
                     (barbearia_id, data.get("name"), data.get("price"), data.get("duration"), 
                      data.get("category"), data.get("description"), servico_api_status_to_db(data.get("status"))))
-        conn.commit(); nid = cur.lastrowid
+        nid = cur.lastrowid
+        _bump_version(cur, 'barbearia', barbearia_id, 'servicos')
+        conn.commit()
         return jsonify({'success': True, 'id': nid})
     except Exception as e: return jsonify({'success': False, 'message': str(e)}), 400
     finally: cur.close(); conn.close()
 
 # --- ROTAS DE HORÁRIOS ---
 @app.route('/api/barbearias/<int:barbearia_id>/horarios', methods=['GET'])
+@conditional_get('barbearia_horarios', _barbearia_token('horarios'))
 def get_horarios_barbearia(barbearia_id):
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
@@ -1018,21 +1187,30 @@ def get_horarios_barbearia(barbearia_id):
 
 @app.route('/api/barbearias/<int:barbearia_id>/horarios', methods=['POST'])
 def post_horarios_barbearia(barbearia_id):
+    """
+    Grava a grade semanal aplicando só as diferenças em relação à armazenada.
+    Devolve a versão da grade (recurso 'horarios'), usada para invalidar caches.
+    """
     data = request.get_json() or {}
     schedule = data.get("schedule") or {}
-    conn = get_db_connection(); cur = conn.cursor()
+    conn = get_db_connection(); cur = conn.cursor(dictionary=True)
     try:
-        cur.execute("DELETE FROM horarios_slots WHERE barbearia_id = %s", (barbearia_id,))
-        cur.execute("DELETE FROM horarios_status WHERE barbearia_id = %s", (barbearia_id,))
-        for day, block in schedule.items():
-            st = block.get("status", "closed")
-            cur.execute("INSERT INTO horarios_status (barbearia_id, dia_semana, status) VALUES (%s,%s,%s)", (barbearia_id, day, st))
-            if st == "open":
-                for slot in block.get("slots", []):
-                    cur.execute("INSERT INTO horarios_slots (barbearia_id, dia_semana, inicio, fim) VALUES (%s,%s,%s,%s)",
-                                (barbearia_id, day, slot.get("start"), slot.get("end")))
-        conn.commit(); return jsonify({'success': True})
-    except Exception as e: return jsonify({'success': False, 'message': str(e)}), 400
+        stored_status, stored_slots = load_stored_schedule(cur, barbearia_id)
+        diff = diff_schedule(stored_status, stored_slots, schedule)
+        if not diff.is_empty():
+            apply_schedule_diff(cur, barbearia_id, diff)
+            _bump_version(cur, 'barbearia', barbearia_id, 'horarios')
+            # Versão global: índices que cobrem todas as barbearias (ex.: "aberto agora")
+            _bump_version(cur, 'global', 0, 'horarios')
+        (version,) = _resource_versions(cur, 'barbearia', barbearia_id, ('horarios',))
+        conn.commit()
+        schedule_cache.invalidate(barbearia_id)
+        if not diff.is_empty():
+            open_index.invalidate()
+        return jsonify({'success': True, 'version': version, 'changes': diff.summary()})
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
     finally: cur.close(); conn.close()
 
 # --- LOGICA DE DISPONIBILIDADE ---
@@ -1065,13 +1243,11 @@ def get_availability(barbearia_id: int):
         logger.info(f"Capacidade detectada: {capacity} barbeiros simultâneos.")
 
         day_key = _weekday_key(d)
-        cur.execute("SELECT status FROM horarios_status WHERE barbearia_id = %s AND dia_semana = %s", (barbearia_id, day_key))
-        if (st := cur.fetchone()) and st['status'] == 'closed':
+        compiled = schedule_cache.get(cur, barbearia_id)
+        if compiled.is_closed(day_key):
             logger.info(f"Barbearia fechada no dia: {day_key}")
             return jsonify({'success': True, 'slots': []})
-
-        cur.execute("SELECT inicio, fim FROM horarios_slots WHERE barbearia_id = %s AND dia_semana = %s", (barbearia_id, day_key))
-        ranges = cur.fetchall()
+        ranges = compiled.day_ranges(day_key)
 
         # REGRA 2 & 3: Buscar Ocupação Real (usando duracao_total do agendamento)
         # Se duracao_total for NULL, usamos s.duracao_minutos como fallback
@@ -1093,10 +1269,8 @@ def get_availability(barbearia_id: int):
         now_mins = now_br.hour * 60 + now_br.minute
         
         # REGRA 4: Cálculo de Slots
-        for rng in ranges:
-            t = _time_to_minutes(_as_hhmm(rng["inicio"]))
-            end_rng = _time_to_minutes(_as_hhmm(rng["fim"]))
-            
+        for t, end_rng in ranges:
+
             while t + duration <= end_rng:
                 # Bloqueio de 2h de antecedência para hoje
                 if d == now_br.date() and t < (now_mins + 120): # Antecedência 2h
@@ -1144,103 +1318,702 @@ def create_agendamento():
                     (data["cliente_id"], data["barbearia_id"], data["servico_id"], data["data_agendamento"],
                      data["horario_inicio"], data.get("duracao_total", 30), "pendente", 
                      data.get("valor_total"), data.get("observacoes")))
+        novo_id = cur.lastrowid
+        rollup_apply_change(cur, None, {"barbearia_id": data["barbearia_id"], "data_agendamento": data["data_agendamento"],
+                                        "servico_id": data["servico_id"], "status": "pendente",
+                                        "valor_total": data.get("valor_total")})
+        # Notificações saem pela outbox, no mesmo commit do agendamento
+        enqueue_event(cur, EVENTO_CRIADO, novo_id, {"barbearia_id": data["barbearia_id"], "cliente_id": data["cliente_id"]})
         conn.commit()
-        logger.info(f"Agendamento {cur.lastrowid} criado com sucesso.")
-        return jsonify({'success': True, 'id': cur.lastrowid, 'message': 'Agendamento realizado com sucesso!'})
+        agenda_events.publish(int(data["barbearia_id"]))
+        logger.info(f"Agendamento {novo_id} criado com sucesso.")
+        return jsonify({'success': True, 'id': novo_id, 'message': 'Agendamento realizado com sucesso!'})
     except Exception as e: 
+        conn.rollback()
         logger.error(f"Erro ao salvar agendamento: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
     finally: cur.close(); conn.close()
 
-@app.route('/api/clientes/<int:cliente_id>/agendamentos', methods=['GET'])
-def list_agendamentos_cliente(cliente_id):
-    conn = get_db_connection(); cur = conn.cursor(dictionary=True)
-    cur.execute("""SELECT a.*, b.nome_barbearia, s.nome_servico, s.duracao_minutos FROM agendamentos a
-                   JOIN barbearias b ON b.id = a.barbearia_id JOIN servicos s ON s.id = a.servico_id
-                   WHERE a.cliente_id = %s ORDER BY a.data_agendamento DESC""", (cliente_id,))
-    rows = cur.fetchall(); cur.close(); conn.close()
-    out = [{
+_AGENDA_CLIENTE_SELECT = """SELECT a.*, b.nome_barbearia, s.nome_servico, s.duracao_minutos FROM agendamentos a
+              JOIN barbearias b ON b.id = a.barbearia_id JOIN servicos s ON s.id = a.servico_id"""
+
+_AGENDA_BARBEARIA_SELECT = """SELECT a.*, c.nome_completo, c.telefone, s.nome_servico, s.preco FROM agendamentos a
+              JOIN clientes c ON c.id = a.cliente_id
+              JOIN servicos s ON s.id = a.servico_id"""
+
+def _serialize_agendamento_cliente(r: Dict[str, Any]) -> Dict[str, Any]:
+    return {
         "id": r["id"], "barbearia": r["nome_barbearia"], "service": r["nome_servico"],
         "date": str(r["data_agendamento"]), "time": _as_hhmm(r["horario_inicio"]),
         "status": db_status_to_api(r["status"]), "price": float(r["valor_total"] or 0)
-    } for r in rows]
-    return jsonify({'success': True, 'agendamentos': out})
+    }
 
-@app.route('/api/barbearias/<int:barbearia_id>/agendamentos', methods=['GET'])
-def list_agendamentos_barbearia(barbearia_id):
-    conn = get_db_connection(); cur = conn.cursor(dictionary=True)
-    cur.execute("""SELECT a.*, c.nome_completo, c.telefone, s.nome_servico, s.preco FROM agendamentos a
-                   JOIN clientes c ON c.id = a.cliente_id
-                   JOIN servicos s ON s.id = a.servico_id
-                   WHERE a.barbearia_id = %s
-                   ORDER BY a.data_agendamento DESC""", (barbearia_id,))
-    rows = cur.fetchall(); cur.close(); conn.close()
-    out = [{
+def _serialize_agendamento_barbearia(r: Dict[str, Any]) -> Dict[str, Any]:
+    return {
         "id": r["id"], "clientName": r["nome_completo"], "clientPhone": r["telefone"], "barbearia_id": r["barbearia_id"],
         "date": str(r["data_agendamento"]), "time": _as_hhmm(r["horario_inicio"]), "service": r["nome_servico"],
         "status": db_status_to_api(r["status"]), "totalPrice": float(r["valor_total"] or 0),
         "notes": r["observacoes"] # Adicionado para a lista completa de serviços
-    } for r in rows]
-    return jsonify({'success': True, 'agendamentos': out})
+    }
+
+_DELTA_PAGE_MAX = 500
+
+def _decode_sync_cursor(token: str) -> Tuple[datetime, int, int]:
+    ts_raw, last_id, last_tomb = _decode_cursor(token, 3)
+    try:
+        return datetime.fromisoformat(ts_raw), int(last_id), int(last_tomb)
+    except ValueError:
+        raise ValueError("Cursor inválido.")
+
+def _encode_sync_cursor(ts: datetime, row_id: int, tomb_id: int) -> str:
+    return _encode_cursor(ts.isoformat(), row_id, tomb_id)
+
+def _agenda_changes(cur, base_select: str, owner_col: str, owner_id: int,
+                    position: Tuple[datetime, int, int], max_rows: int = _DELTA_PAGE_MAX):
+    """
+    Lê o feed de alterações a partir de `position` (atualizado_em, id, id da lápide).
+    Retorna (linhas, lápides, nova posição, has_more).
+    """
+    since_ts, last_id, last_tomb = position
+    cutoff = sync_cutoff(cur)
+    where, params = changed_rows_condition(owner_col, owner_id, since_ts, last_id, cutoff)
+    cur.execute(f"{base_select} WHERE {' AND '.join(where)} ORDER BY a.atualizado_em, a.id LIMIT %s",
+                (*params, max_rows + 1))
+    rows = cur.fetchall()
+    removals = fetch_removals(cur, owner_col, owner_id, last_tomb, cutoff, max_rows + 1)
+    has_more = len(rows) > max_rows or len(removals) > max_rows
+    rows, removals = rows[:max_rows], removals[:max_rows]
+    if rows:
+        since_ts, last_id = rows[-1]["atualizado_em"], rows[-1]["id"]
+    elif not has_more and cutoff > since_ts:
+        # Nada pendente até o corte: o cursor avança até ele
+        since_ts, last_id = cutoff, 0
+    if removals:
+        last_tomb = removals[-1]["id"]
+    return rows, removals, (since_ts, last_id, last_tomb), has_more
+
+def _agenda_delta(cur, base_select: str, owner_col: str, owner_id: int, since: str, serialize) -> Dict[str, Any]:
+    """
+    Alterações desde o cursor `since`: agendamentos criados/alterados e ids removidos (lápides).
+    O cursor devolvido é usado na próxima chamada; com hasMore=True, chame de novo em seguida.
+    """
+    rows, removals, position, has_more = _agenda_changes(cur, base_select, owner_col, owner_id,
+                                                         _decode_sync_cursor(since))
+    return {
+        "agendamentos": [serialize(r) for r in rows],
+        "removidos": [r["agendamento_id"] for r in removals],
+        "cursor": _encode_sync_cursor(*position),
+        "hasMore": has_more,
+    }
+
+def _list_agendamentos(base_select: str, owner_col: str, owner_id: int, serialize):
+    """Lista paginada (ver _agenda_page_filters) ou, com ?since=<cursor>, só as alterações."""
+    since = (request.args.get("since") or "").strip()
+    conn = get_db_connection(); cur = conn.cursor(dictionary=True)
+    try:
+        if since:
+            delta = _agenda_delta(cur, base_select, owner_col, owner_id, since, serialize)
+            return jsonify({'success': True, **delta})
+        where, params, ascending, limit = _agenda_page_filters(request.args, f"a.{owner_col}", owner_id)
+        cond, order = ' AND '.join(where), _agenda_order_sql(ascending)
+        limit_sql = " LIMIT %s" if limit is not None else ""
+        limit_params = [limit + 1] if limit is not None else []
+        scope = (request.args.get("scope") or "").strip().lower()
+        if scope == "upcoming":
+            # Datas futuras nunca estão no arquivo
+            sql = f"{base_select} WHERE {cond} ORDER BY {order}{limit_sql}"
+            params = params + limit_params
+        else:
+            # Histórico: cada tabela responde pelo próprio índice e o merge final respeita a ordem/limite
+            sql = (f"({base_select} WHERE {cond} ORDER BY {order}{limit_sql}) UNION ALL "
+                   f"({_archive_select(base_select)} WHERE {cond} ORDER BY {order}{limit_sql}) "
+                   f"ORDER BY {_agenda_order_sql(ascending, prefix='')}{limit_sql}")
+            params = (params + limit_params) * 2 + limit_params
+        # A posição do feed é tirada antes da leitura: alterações concorrentes reaparecem no próximo delta
+        ts, row_id, tomb = initial_position(cur, owner_col, owner_id)
+        cur.execute(sql, tuple(params))
+        rows = cur.fetchall()
+        next_cursor = _agenda_next_cursor(rows, limit, scope)
+        return jsonify({'success': True, 'agendamentos': [serialize(r) for r in rows], 'nextCursor': next_cursor,
+                        'syncCursor': _encode_sync_cursor(ts, row_id, tomb)})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    finally:
+        cur.close(); conn.close()
+
+@app.route('/api/clientes/<int:cliente_id>/agendamentos', methods=['GET'])
+def list_agendamentos_cliente(cliente_id):
+    return _list_agendamentos(_AGENDA_CLIENTE_SELECT, "cliente_id", cliente_id, _serialize_agendamento_cliente)
+
+@app.route('/api/barbearias/<int:barbearia_id>/agendamentos', methods=['GET'])
+def list_agendamentos_barbearia(barbearia_id):
+    return _list_agendamentos(_AGENDA_BARBEARIA_SELECT, "barbearia_id", barbearia_id, _serialize_agendamento_barbearia)
+
+# --- STREAM SSE DA AGENDA ---
+# Dimensionamento: cada stream ocupa uma thread do gthread pela duração da conexão,
+# mas fica parada no EventBus e só abre conexão com o banco para reler o feed.
+# O Procfile usa --threads ${WEB_THREADS}; por processo ficam SSE_RESERVED_THREADS
+# threads para as requisições comuns e o resto atende streams. Para N painéis de
+# barbearia abertos ao mesmo tempo, WEB_THREADS >= N + SSE_RESERVED_THREADS.
+WEB_THREADS = int(os.environ.get('WEB_THREADS', 64))
+SSE_RESERVED_THREADS = int(os.environ.get('SSE_RESERVED_THREADS', 8))
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', max(1, WEB_THREADS - SSE_RESERVED_THREADS)))
+# Sem escrita publicada neste processo, o feed só é relido a cada SSE_POLL_SECONDS
+SSE_POLL_SECONDS = float(os.environ.get('SSE_POLL_SECONDS', 15))
+SSE_HEARTBEAT_SECONDS = 15.0
+SSE_RETRY_MS = 3000
+# Quem ficou sem vaga volta a tentar depois disso (Retry-After)
+SSE_BUSY_RETRY_SECONDS = 30
+# Conexões são encerradas periodicamente; o EventSource reconecta com Last-Event-ID
+SSE_MAX_SECONDS = float(os.environ.get('SSE_MAX_SECONDS', 300))
+
+sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+def _agenda_event_type(r: Dict[str, Any]) -> str:
+    if str(r.get("status") or "").lower() == "cancelado":
+        return "agendamento_cancelado"
+    criado, atualizado = r.get("criado_em"), r.get("atualizado_em")
+    if criado and atualizado and abs((atualizado - criado).total_seconds()) < 1:
+        return "agendamento_criado"
+    return "agendamento_atualizado"
+
+def _sse_message(event: str, event_id: str, data: Any) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=_json_safe)}\n\n"
+
+def _agenda_stream_read(barbearia_id: int, position: Optional[Tuple[datetime, int, int]]):
+    """
+    Uma leitura do feed numa única conexão: devolve (mensagens SSE, nova posição).
+    Sem conexão com o banco, devolve a posição inalterada.
+    """
+    messages: List[str] = []
+    conn = get_db_connection()
+    if not conn:
+        return messages, position
+    cur = conn.cursor(dictionary=True)
+    try:
+        if position is None:
+            return messages, initial_position(cur, "barbearia_id", barbearia_id)
+        has_more = True
+        while has_more:
+            rows, removals, new_pos, has_more = _agenda_changes(
+                cur, _AGENDA_BARBEARIA_SELECT, "barbearia_id", barbearia_id, position)
+            for r in rows:
+                event_id = _encode_sync_cursor(r["atualizado_em"], r["id"], position[2])
+                messages.append(_sse_message(_agenda_event_type(r), event_id, _serialize_agendamento_barbearia(r)))
+            for t in removals:
+                event_id = _encode_sync_cursor(new_pos[0], new_pos[1], t["id"])
+                messages.append(_sse_message("agendamento_removido", event_id,
+                                             {"id": t["agendamento_id"], "motivo": t["motivo"]}))
+            position = new_pos
+        return messages, position
+    finally:
+        cur.close(); conn.close()
+
+@app.route('/api/barbearias/<int:barbearia_id>/agendamentos/stream', methods=['GET'])
+def stream_agendamentos_barbearia(barbearia_id):
+    """
+    Server-Sent Events com criações, alterações e cancelamentos da agenda.
+    O feed é lido do banco quando uma escrita deste processo publica em
+    agenda_events (após a janela de segurança do feed) ou, sem publicações,
+    a cada SSE_POLL_SECONDS. Retoma a partir de Last-Event-ID (ou ?since=<syncCursor>).
+    Acima de SSE_MAX_STREAMS conexões simultâneas responde 503 com Retry-After.
+    """
+    token = (request.headers.get('Last-Event-ID') or request.args.get('since') or '').strip()
+    try:
+        position = _decode_sync_cursor(token) if token else None
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if not sse_slots.acquire(blocking=False):
+        response = jsonify({'success': False, 'message': 'Muitas conexões de atualização ao vivo; tente mais tarde.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(SSE_BUSY_RETRY_SECONDS)
+        return response
+    wake = agenda_events.subscribe(barbearia_id)
+
+    def generate(position):
+        started = last_sent = time_module.monotonic()
+        next_read = started
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while True:
+            now = time_module.monotonic()
+            if now - started >= SSE_MAX_SECONDS:
+                return
+            if now >= next_read:
+                messages, position = _agenda_stream_read(barbearia_id, position)
+                for message in messages:
+                    yield message
+                if messages:
+                    last_sent = time_module.monotonic()
+                next_read = time_module.monotonic() + SSE_POLL_SECONDS
+            if time_module.monotonic() - last_sent >= SSE_HEARTBEAT_SECONDS:
+                yield ": ping\n\n"
+                last_sent = time_module.monotonic()
+            deadline = min(next_read, last_sent + SSE_HEARTBEAT_SECONDS, started + SSE_MAX_SECONDS)
+            try:
+                wake.get(timeout=max(0.0, deadline - time_module.monotonic()))
+                # A escrita só entra no feed depois da janela de segurança (agenda_sync.SAFETY_LAG_SECONDS)
+                next_read = min(next_read, time_module.monotonic() + SAFETY_LAG_SECONDS + 0.05)
+            except queue.Empty:
+                pass
+
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            agenda_events.unsubscribe(barbearia_id, wake)
+            sse_slots.release()
+
+    response = Response(generate(position), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # call_on_close roda mesmo se o cliente desconectar antes do gerador começar
+    response.call_on_close(release)
+    return response
+
+# --- RESUMO DOS DASHBOARDS ---
+# Janela de "clientes ativos" do dashboard; menor que a retenção do arquivo, então só lê agendamentos
+DASHBOARD_ACTIVE_CLIENT_DAYS = 90
+
+def _dashboard_payload(today: date, agg: Dict[str, Any], avg: Any, reviews: int) -> Dict[str, Any]:
+    return {
+        "today": today.isoformat(),
+        "statusCounts": {db_status_to_api(k): int(agg.get(k) or 0) for k in ("pendente", "confirmado", "cancelado", "concluido")},
+        "totalAppointments": int(agg.get("total") or 0),
+        "todayCount": int(agg.get("hoje") or 0),
+        "revenue": {
+            "day": float(agg.get("receita_dia") or 0),
+            "week": float(agg.get("receita_semana") or 0),
+            "month": float(agg.get("receita_mes") or 0),
+            "total": float(agg.get("receita_total") or 0),
+        },
+        "averageRating": round(float(avg), 2) if avg is not None else None,
+        "totalReviews": int(reviews or 0),
+        "activeClients": int(agg.get("clientes") or 0),
+    }
+
+def _dashboard_summary(cur, owner_col: str, owner_id: int, now: datetime) -> Dict[str, Any]:
+    """
+    Contagens, receita e avaliação média de uma barbearia ou cliente
+    (owner_col é 'barbearia_id' ou 'cliente_id').
+
+    A barbearia lê os dias passados de metricas_diarias e a nota de
+    avaliacoes_resumo; de agendamentos só vêm hoje e as datas futuras.
+    O cliente não tem rollup: seu histórico é pequeno e agregado direto.
+    """
+    if owner_col == "barbearia_id":
+        return _dashboard_summary_barbearia(cur, owner_id, now)
+    today = now.date()
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    cur.execute(f"""SELECT COUNT(*) AS total,
+                           COALESCE(SUM(status = 'pendente'), 0) AS pendente,
+                           COALESCE(SUM(status = 'confirmado'), 0) AS confirmado,
+                           COALESCE(SUM(status = 'cancelado'), 0) AS cancelado,
+                           COALESCE(SUM(status = 'concluido'), 0) AS concluido,
+                           COALESCE(SUM(data_agendamento = %s AND status != 'cancelado'), 0) AS hoje,
+                           COALESCE(SUM(CASE WHEN status = 'concluido' AND data_agendamento = %s THEN valor_total END), 0) AS receita_dia,
+                           COALESCE(SUM(CASE WHEN status = 'concluido' AND data_agendamento BETWEEN %s AND %s THEN valor_total END), 0) AS receita_semana,
+                           COALESCE(SUM(CASE WHEN status = 'concluido' AND data_agendamento BETWEEN %s AND %s THEN valor_total END), 0) AS receita_mes,
+                           COALESCE(SUM(CASE WHEN status = 'concluido' THEN valor_total END), 0) AS receita_total,
+                           COUNT(DISTINCT cliente_id) AS clientes,
+                           AVG(avaliacao_nota) AS media_avaliacao,
+                           COUNT(avaliacao_nota) AS total_avaliacoes
+                    FROM (SELECT status, data_agendamento, valor_total, cliente_id, avaliacao_nota
+                          FROM agendamentos WHERE {owner_col} = %s
+                          UNION ALL
+                          SELECT status, data_agendamento, valor_total, cliente_id, avaliacao_nota
+                          FROM {ARCHIVE_TABLE} WHERE {owner_col} = %s) h""",
+                (today, today, week_start, today, month_start, today, owner_id, owner_id))
+    agg = cur.fetchone() or {}
+    return _dashboard_payload(today, agg, agg.get("media_avaliacao"), agg.get("total_avaliacoes"))
+
+def _dashboard_summary_barbearia(cur, barbearia_id: int, now: datetime) -> Dict[str, Any]:
+    today = now.date()
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    # Dias passados: intervalo da PK (barbearia_id, dia, servico_id) do rollup
+    cur.execute("""SELECT COALESCE(SUM(qtd_total), 0) AS total,
+                          COALESCE(SUM(qtd_pendente), 0) AS pendente,
+                          COALESCE(SUM(qtd_confirmado), 0) AS confirmado,
+                          COALESCE(SUM(qtd_cancelado), 0) AS cancelado,
+                          COALESCE(SUM(qtd_concluido), 0) AS concluido,
+                          COALESCE(SUM(CASE WHEN dia >= %s THEN receita END), 0) AS receita_semana,
+                          COALESCE(SUM(CASE WHEN dia >= %s THEN receita END), 0) AS receita_mes,
+                          COALESCE(SUM(receita), 0) AS receita_total
+                   FROM metricas_diarias WHERE barbearia_id = %s AND dia < %s""",
+                (week_start, month_start, barbearia_id, today))
+    past = cur.fetchone() or {}
+    # Hoje e futuro (e a janela de clientes ativos): intervalo de idx_agendamentos_barbearia_agenda
+    active_since = today - timedelta(days=DASHBOARD_ACTIVE_CLIENT_DAYS)
+    cur.execute("""SELECT COALESCE(SUM(atual), 0) AS total,
+                          COALESCE(SUM(atual AND status = 'pendente'), 0) AS pendente,
+                          COALESCE(SUM(atual AND status = 'confirmado'), 0) AS confirmado,
+                          COALESCE(SUM(atual AND status = 'cancelado'), 0) AS cancelado,
+                          COALESCE(SUM(atual AND status = 'concluido'), 0) AS concluido,
+                          COALESCE(SUM(data_agendamento = %s AND status != 'cancelado'), 0) AS hoje,
+                          COALESCE(SUM(CASE WHEN status = 'concluido' AND data_agendamento = %s THEN valor_total END), 0) AS receita_dia,
+                          COALESCE(SUM(CASE WHEN status = 'concluido' AND atual THEN valor_total END), 0) AS receita_total,
+                          COUNT(DISTINCT cliente_id) AS clientes
+                   FROM (SELECT status, data_agendamento, valor_total, cliente_id, data_agendamento >= %s AS atual
+                         FROM agendamentos WHERE barbearia_id = %s AND data_agendamento >= %s) h""",
+                (today, today, today, barbearia_id, active_since))
+    current = cur.fetchone() or {}
+    agg = {k: (past.get(k) or 0) + (current.get(k) or 0)
+           for k in ("total", "pendente", "confirmado", "cancelado", "concluido", "receita_total")}
+    receita_dia = current.get("receita_dia") or 0
+    agg.update({
+        "hoje": current.get("hoje"),
+        "receita_dia": receita_dia,
+        "receita_semana": (past.get("receita_semana") or 0) + receita_dia,
+        "receita_mes": (past.get("receita_mes") or 0) + receita_dia,
+        "clientes": current.get("clientes"),
+    })
+    reviews = review_summary(cur, barbearia_id)
+    return _dashboard_payload(today, agg, reviews["average"], reviews["total"])
+
+def _dashboard_next_condition(now: datetime) -> Tuple[str, List[Any]]:
+    today, now_t = now.date().isoformat(), now.strftime("%H:%M:%S")
+    return ("a.status IN ('pendente', 'confirmado') AND "
+            "(a.data_agendamento > %s OR (a.data_agendamento = %s AND a.horario_inicio >= %s))",
+            [today, today, now_t])
+
+@app.route('/api/barbearias/<int:barbearia_id>/dashboard', methods=['GET'])
+def get_dashboard_barbearia(barbearia_id):
+    """Resumo do dashboard da barbearia: agenda do dia, contagens, receita e próximo atendimento."""
+    conn = get_db_connection()
+    if not conn: return jsonify({'success': False, 'message': 'Erro DB'}), 500
+    cur = conn.cursor(dictionary=True)
+    try:
+        now = _now_br()
+        resumo = _dashboard_summary(cur, "barbearia_id", barbearia_id, now)
+        cols = """a.id, a.data_agendamento, a.horario_inicio, a.status, a.valor_total, a.observacoes,
+                  c.nome_completo, s.nome_servico"""
+        joins = "JOIN clientes c ON c.id = a.cliente_id JOIN servicos s ON s.id = a.servico_id"
+
+        def ser(r):
+            return {"id": r["id"], "clientName": r["nome_completo"], "service": r["nome_servico"],
+                    "date": str(r["data_agendamento"]), "time": _as_hhmm(r["horario_inicio"]),
+                    "status": db_status_to_api(r["status"]), "totalPrice": float(r["valor_total"] or 0),
+                    "notes": r["observacoes"]}
+
+        cur.execute(f"""SELECT {cols} FROM agendamentos a {joins}
+                        WHERE a.barbearia_id = %s AND a.data_agendamento = %s
+                        ORDER BY a.horario_inicio, a.id""", (barbearia_id, resumo["today"]))
+        resumo["todayAgenda"] = [ser(r) for r in cur.fetchall()]
+
+        cond, params = _dashboard_next_condition(now)
+        cur.execute(f"""SELECT {cols} FROM agendamentos a {joins}
+                        WHERE a.barbearia_id = %s AND {cond}
+                        ORDER BY a.data_agendamento, a.horario_inicio, a.id LIMIT 1""", (barbearia_id, *params))
+        nxt = cur.fetchone()
+        resumo["nextAppointment"] = ser(nxt) if nxt else None
+
+        # Atividade recente: agendamentos a partir de 48h atrás e avaliações do mesmo período
+        since = (now.date() - timedelta(days=2)).isoformat()
+        cur.execute(f"""SELECT {cols} FROM agendamentos a {joins}
+                        WHERE a.barbearia_id = %s AND a.data_agendamento >= %s
+                        ORDER BY a.data_agendamento, a.horario_inicio, a.id LIMIT 50""", (barbearia_id, since))
+        resumo["recentAppointments"] = [ser(r) for r in cur.fetchall()]
+        cur.execute("""SELECT a.id, a.data_agendamento, a.avaliacao_nota, a.avaliacao_comentario, a.resposta_barbearia,
+                              a.data_resposta, c.nome_completo AS nome_cliente, s.nome_servico
+                       FROM agendamentos a JOIN clientes c ON c.id = a.cliente_id JOIN servicos s ON s.id = a.servico_id
+                       WHERE a.barbearia_id = %s AND a.data_agendamento >= %s AND a.avaliacao_nota IS NOT NULL
+                       ORDER BY a.data_agendamento DESC LIMIT 20""", (barbearia_id, since))
+        resumo["recentReviews"] = [_serialize_review_row(r, True) for r in cur.fetchall()]
+        return jsonify({'success': True, 'resumo': resumo})
+    finally:
+        cur.close(); conn.close()
+
+_METRICAS_MAX_DIAS = 731
+
+@app.route('/api/barbearias/<int:barbearia_id>/metricas', methods=['GET'])
+def get_metricas_barbearia(barbearia_id):
+    """
+    Séries de agendamentos, receita e avaliações lidas do rollup diário.
+    Parâmetros: from/to (YYYY-MM-DD, padrão últimos 30 dias) e group=day|service|weekday.
+    """
+    group = request.args.get('group', 'day')
+    if group not in ROLLUP_GROUPS:
+        return jsonify({'success': False, 'message': 'group deve ser day, service ou weekday.'}), 400
+    today = _now_br().date()
+    try:
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else today
+        start = (datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from')
+                 else end - timedelta(days=29))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Datas devem estar no formato YYYY-MM-DD.'}), 400
+    if start > end or (end - start).days >= _METRICAS_MAX_DIAS:
+        return jsonify({'success': False, 'message': f'Intervalo inválido (máximo de {_METRICAS_MAX_DIAS} dias).'}), 400
+    conn = get_db_connection()
+    if not conn: return jsonify({'success': False, 'message': 'Erro DB'}), 500
+    cur = conn.cursor(dictionary=True)
+    try:
+        series = rollup_series(cur, barbearia_id, start, end, group)
+    finally:
+        cur.close(); conn.close()
+    reviews = sum(p['reviews'] for p in series)
+    rating_sum = sum(p['ratingSum'] for p in series)
+    totals = {
+        'bookings': sum(p['bookings'] for p in series),
+        'completed': sum(p['completed'] for p in series),
+        'cancelled': sum(p['cancelled'] for p in series),
+        'revenue': round(sum(p['revenue'] for p in series), 2),
+        'reviews': reviews,
+        'averageRating': round(rating_sum / reviews, 2) if reviews else None,
+    }
+    return jsonify({'success': True, 'from': start.isoformat(), 'to': end.isoformat(), 'group': group,
+                    'series': series, 'totals': totals})
+
+@app.route('/api/clientes/<int:cliente_id>/dashboard', methods=['GET'])
+def get_dashboard_cliente(cliente_id):
+    """Resumo do dashboard do cliente: agendamentos de hoje, contagens, gastos e próximo horário."""
+    conn = get_db_connection()
+    if not conn: return jsonify({'success': False, 'message': 'Erro DB'}), 500
+    cur = conn.cursor(dictionary=True)
+    try:
+        now = _now_br()
+        resumo = _dashboard_summary(cur, "cliente_id", cliente_id, now)
+        resumo.pop("activeClients")
+        resumo["spent"] = resumo.pop("revenue")
+        cols = """a.id, a.barbearia_id, a.data_agendamento, a.horario_inicio, a.status, a.valor_total,
+                  a.avaliacao_nota, b.nome_barbearia, s.nome_servico"""
+        joins = "JOIN barbearias b ON b.id = a.barbearia_id JOIN servicos s ON s.id = a.servico_id"
+
+        def ser(r):
+            return {"id": r["id"], "barbearia_id": r["barbearia_id"], "barbearia": r["nome_barbearia"],
+                    "service": r["nome_servico"], "date": str(r["data_agendamento"]),
+                    "time": _as_hhmm(r["horario_inicio"]), "status": db_status_to_api(r["status"]),
+                    "price": float(r["valor_total"] or 0),
+                    "rating": float(r["avaliacao_nota"]) if r["avaliacao_nota"] is not None else None}
+
+        cur.execute(f"""SELECT {cols} FROM agendamentos a {joins}
+                        WHERE a.cliente_id = %s AND a.data_agendamento = %s
+                        ORDER BY a.horario_inicio, a.id""", (cliente_id, resumo["today"]))
+        resumo["todayAgenda"] = [ser(r) for r in cur.fetchall()]
+
+        cond, params = _dashboard_next_condition(now)
+        cur.execute(f"""SELECT {cols} FROM agendamentos a {joins}
+                        WHERE a.cliente_id = %s AND {cond}
+                        ORDER BY a.data_agendamento, a.horario_inicio, a.id LIMIT 1""", (cliente_id, *params))
+        nxt = cur.fetchone()
+        resumo["nextAppointment"] = ser(nxt) if nxt else None
+
+        since = (now.date() - timedelta(days=2)).isoformat()
+        cur.execute(f"""SELECT {cols} FROM agendamentos a {joins}
+                        WHERE a.cliente_id = %s AND a.data_agendamento >= %s
+                        ORDER BY a.data_agendamento, a.horario_inicio, a.id LIMIT 20""", (cliente_id, since))
+        resumo["recentAppointments"] = [ser(r) for r in cur.fetchall()]
+
+        cur.execute("SELECT COUNT(*) AS n FROM cliente_favoritos WHERE cliente_id = %s", (cliente_id,))
+        resumo["favoritesCount"] = int((cur.fetchone() or {}).get("n") or 0)
+        return jsonify({'success': True, 'resumo': resumo})
+    finally:
+        cur.close(); conn.close()
 
 @app.route('/api/agendamentos/<int:agendamento_id>', methods=['PUT'])
 def update_agendamento(agendamento_id):
     data = request.get_json() or {}
-    conn = get_db_connection(); cur = conn.cursor()
+    conn = get_db_connection(); cur = conn.cursor(dictionary=True)
     try:
         if 'status' in data:
-            cur.execute("UPDATE agendamentos SET status = %s WHERE id = %s", (api_status_to_db(data['status']), agendamento_id))
+            novo_status = api_status_to_db(data['status'])
+            cur.execute("""SELECT barbearia_id, servico_id, status, data_agendamento, horario_inicio, valor_total, avaliacao_nota
+                           FROM agendamentos WHERE id = %s FOR UPDATE""", (agendamento_id,))
+            atual = cur.fetchone()
+            cur.execute("UPDATE agendamentos SET status = %s WHERE id = %s", (novo_status, agendamento_id))
+            if atual and atual['status'] != novo_status:
+                rollup_apply_change(cur, atual, dict(atual, status=novo_status))
+                if novo_status == 'confirmado':
+                    enqueue_event(cur, EVENTO_CONFIRMADO, agendamento_id)
+                    lembrete_em = reminder_time_utc(atual['data_agendamento'], atual['horario_inicio'])
+                    if lembrete_em and lembrete_em > datetime.utcnow():
+                        enqueue_event(cur, EVENTO_LEMBRETE, agendamento_id, disponivel_em=lembrete_em)
+                elif novo_status == 'cancelado':
+                    cancel_pending_events(cur, EVENTO_LEMBRETE, agendamento_id)
+                    enqueue_event(cur, EVENTO_CANCELADO, agendamento_id)
             conn.commit()
+            if atual:
+                agenda_events.publish(int(atual['barbearia_id']))
         return jsonify({'success': True})
-    except Exception as e: return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
     finally: cur.close(); conn.close()
 
 # --- AVALIAÇÕES E FAVORITOS ---
 @app.route('/api/agendamentos/<int:agendamento_id>/avaliacao', methods=['POST'])
 def post_avaliacao(agendamento_id):
     data = request.get_json() or {}
-    conn = get_db_connection(); cur = conn.cursor()
     try:
-        cur.execute("UPDATE agendamentos SET avaliacao_nota = %s, avaliacao_comentario = %s WHERE id = %s",
-                    (data.get('rating'), data.get('comment'), agendamento_id))
+        nota = float(data.get('rating'))
+    except (TypeError, ValueError):
+        nota = None
+    if nota is None or not 1 <= nota <= 5:
+        return jsonify({'success': False, 'message': 'A nota deve estar entre 1 e 5.'}), 400
+    conn = get_db_connection(); cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("""SELECT barbearia_id, servico_id, status, data_agendamento, valor_total, avaliacao_nota
+                       FROM agendamentos WHERE id = %s FOR UPDATE""", (agendamento_id,))
+        atual = cur.fetchone()
+        if not atual:
+            return jsonify({'success': False, 'message': 'Agendamento não encontrado.'}), 404
+        cur.execute("""UPDATE agendamentos SET avaliacao_nota = %s, avaliacao_comentario = %s, avaliado_em = NOW(6)
+                       WHERE id = %s""", (nota, data.get('comment'), agendamento_id))
+        rollup_apply_change(cur, atual, dict(atual, avaliacao_nota=nota))
+        apply_review_change(cur, atual['barbearia_id'], atual['avaliacao_nota'], nota)
+        _bump_version(cur, 'barbearia', atual['barbearia_id'], 'avaliacoes')
         conn.commit(); return jsonify({'success': True})
-    except Exception as e: return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
     finally: cur.close(); conn.close()
 
+_REVIEWS_PAGE_MAX = 50
+
 @app.route('/api/barbearias/<int:barbearia_id>/avaliacoes', methods=['GET'])
+@conditional_get('barbearia_avaliacoes', _barbearia_token('avaliacoes', 'servicos'))
 def list_avaliacoes(barbearia_id):
+    """
+    Avaliações da barbearia, mais recentes primeiro. Com limit/cursor/rating a
+    lista é paginada por chave (avaliado_em, id) e filtrável pela estrela;
+    sem parâmetros devolve todas, como antes.
+    """
+    args = request.args
+    where, params = ["a.barbearia_id = %s", "a.avaliacao_nota IS NOT NULL"], [barbearia_id]
+    limit = None
+    try:
+        rating = (args.get("rating") or "").strip()
+        if rating:
+            star = int(rating)
+            if not 1 <= star <= 5:
+                raise ValueError
+            # Mesma faixa do histograma: parte inteira da nota, entre 1 e 5
+            if star > 1:
+                where.append("a.avaliacao_nota >= %s"); params.append(star)
+            if star < 5:
+                where.append("a.avaliacao_nota < %s"); params.append(star + 1)
+        cursor_token = (args.get("cursor") or "").strip()
+        if args.get("limit") or cursor_token or rating:
+            limit = max(1, min(int(args.get("limit") or 10), _REVIEWS_PAGE_MAX))
+        if cursor_token:
+            ts, last_id = _decode_cursor(cursor_token, 2)
+            where.append("(a.avaliado_em < %s OR (a.avaliado_em = %s AND a.id < %s))")
+            params.extend([ts, ts, int(last_id)])
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parâmetros de paginação inválidos.'}), 400
+    sel = f"""SELECT a.*, c.nome_completo as nome_cliente, s.nome_servico FROM agendamentos a
+              JOIN clientes c ON c.id = a.cliente_id JOIN servicos s ON s.id = a.servico_id
+              WHERE {' AND '.join(where)} ORDER BY a.avaliado_em DESC, a.id DESC"""
+    limit_sql = " LIMIT %s" if limit is not None else ""
+    limit_params = [limit + 1] if limit is not None else []
+    sql = (f"({sel}{limit_sql}) UNION ALL ({_archive_select(sel)}{limit_sql}) "
+           f"ORDER BY avaliado_em DESC, id DESC{limit_sql}")
     conn = get_db_connection(); cur = conn.cursor(dictionary=True)
-    cur.execute("""SELECT a.*, c.nome_completo as nome_cliente, s.nome_servico FROM agendamentos a
-                   JOIN clientes c ON c.id = a.cliente_id JOIN servicos s ON s.id = a.servico_id
-                   WHERE a.barbearia_id = %s AND a.avaliacao_nota IS NOT NULL""", (barbearia_id,))
-    reviews = [_serialize_review_row(r, True) for r in cur.fetchall()]
-    cur.close(); conn.close()
-    return jsonify({'success': True, 'reviews': reviews})
+    try:
+        cur.execute(sql, tuple((params + limit_params) * 2 + limit_params))
+        rows = cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        del rows[limit:]
+        next_cursor = _encode_cursor(rows[-1]["avaliado_em"], rows[-1]["id"])
+    reviews = [_serialize_review_row(r, True) for r in rows]
+    return jsonify({'success': True, 'reviews': reviews, 'nextCursor': next_cursor})
+
+@app.route('/api/barbearias/<int:barbearia_id>/avaliacoes/resumo', methods=['GET'])
+@conditional_get('barbearia_avaliacoes_resumo', _barbearia_token('avaliacoes'))
+def get_avaliacoes_resumo(barbearia_id):
+    """Histograma por estrela, média e total, lidos de avaliacoes_resumo."""
+    conn = get_db_connection()
+    if not conn: return jsonify({'success': False, 'message': 'Erro DB'}), 500
+    cur = conn.cursor(dictionary=True)
+    try:
+        return jsonify({'success': True, 'resumo': review_summary(cur, barbearia_id)})
+    finally:
+        cur.close(); conn.close()
 
 @app.route('/api/clientes/<int:cliente_id>/favoritos', methods=['GET'])
+@conditional_get('cliente_favoritos', _favoritos_token)
 def list_favoritos(cliente_id):
+    """
+    Favoritos do cliente com número fixo de consultas: uma para as barbearias
+    (com a nota de avaliacoes_resumo) e uma janela para os 3 primeiros serviços de todas.
+    """
     conn = get_db_connection(); cur = conn.cursor(dictionary=True)
-    cur.execute("""SELECT b.* FROM cliente_favoritos f JOIN barbearias b ON b.id = f.barbearia_id
-                   WHERE f.cliente_id = %s""", (cliente_id,))
-    rows = cur.fetchall()
+    try:
+        cur.execute("""SELECT b.id, b.nome_barbearia, b.logradouro, b.numero, b.bairro, b.cidade, b.estado, b.whatsapp,
+                              r.total AS total_avaliacoes, r.soma_notas
+                       FROM cliente_favoritos f JOIN barbearias b ON b.id = f.barbearia_id
+                       LEFT JOIN avaliacoes_resumo r ON r.barbearia_id = b.id
+                       WHERE f.cliente_id = %s ORDER BY f.id""", (cliente_id,))
+        rows = cur.fetchall()
+        servicos: Dict[int, List[str]] = {}
+        if rows:
+            cur.execute("""SELECT barbearia_id, nome_servico FROM (
+                               SELECT s.barbearia_id, s.nome_servico,
+                                      ROW_NUMBER() OVER (PARTITION BY s.barbearia_id ORDER BY s.id) AS pos
+                               FROM cliente_favoritos f JOIN servicos s ON s.barbearia_id = f.barbearia_id
+                               WHERE f.cliente_id = %s AND s.status = 'ativo'
+                           ) t WHERE pos <= 3 ORDER BY barbearia_id, pos""", (cliente_id,))
+            for s in cur.fetchall():
+                servicos.setdefault(s['barbearia_id'], []).append(s['nome_servico'])
+    finally:
+        cur.close(); conn.close()
     favoritos = []
     for r in rows:
-        bid = r['id']
-        cur.execute("SELECT nome_servico FROM servicos WHERE barbearia_id = %s AND status = 'ativo' LIMIT 3", (bid,))
-        svcs = [s['nome_servico'] if isinstance(s, dict) else s[0] for s in cur.fetchall()]
+        total = int(r.get("total_avaliacoes") or 0)
         favoritos.append({
-            "id": str(bid), "name": r["nome_barbearia"], "address": format_barbearia_address(r),
-            "rating": 4.5, "phone": r["whatsapp"], "services": svcs
+            "id": str(r["id"]), "name": r["nome_barbearia"], "address": format_barbearia_address(r),
+            "rating": round(float(r["soma_notas"]) / total, 1) if total else None, "totalReviews": total,
+            "phone": r["whatsapp"], "services": servicos.get(r["id"], [])
         })
-    cur.close(); conn.close()
     return jsonify({'success': True, 'favoritos': favoritos})
 
+_FAVORITOS_STATUS_MAX = 100
+
+@app.route('/api/clientes/<int:cliente_id>/favoritos/<int:barbearia_id>', methods=['GET'])
+def get_favorito_status(cliente_id, barbearia_id):
+    """Se a barbearia está nos favoritos do cliente (consulta pontual em uq_cliente_barbearia)."""
+    conn = get_db_connection()
+    if not conn: return jsonify({'success': False, 'message': 'Erro DB'}), 500
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT 1 FROM cliente_favoritos WHERE cliente_id = %s AND barbearia_id = %s",
+                    (cliente_id, barbearia_id))
+        return jsonify({'success': True, 'favorito': cur.fetchone() is not None})
+    finally:
+        cur.close(); conn.close()
+
+@app.route('/api/clientes/<int:cliente_id>/favoritos/status', methods=['GET'])
+def get_favoritos_status(cliente_id):
+    """Quais das barbearias em ?ids=1,2,3 estão nos favoritos (para os corações dos cards de busca)."""
+    try:
+        ids = sorted({int(i) for i in (request.args.get('ids') or '').split(',') if i.strip()})
+    except ValueError:
+        return jsonify({'success': False, 'message': 'ids deve ser uma lista de números separados por vírgula.'}), 400
+    if len(ids) > _FAVORITOS_STATUS_MAX:
+        return jsonify({'success': False, 'message': f'Máximo de {_FAVORITOS_STATUS_MAX} ids por consulta.'}), 400
+    if not ids:
+        return jsonify({'success': True, 'favoritos': []})
+    conn = get_db_connection()
+    if not conn: return jsonify({'success': False, 'message': 'Erro DB'}), 500
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""SELECT barbearia_id FROM cliente_favoritos
+                        WHERE cliente_id = %s AND barbearia_id IN ({', '.join(['%s'] * len(ids))})""",
+                    (cliente_id, *ids))
+        return jsonify({'success': True, 'favoritos': sorted(r[0] for r in cur.fetchall())})
+    finally:
+        cur.close(); conn.close()
+
 @app.route('/api/clientes/<int:cliente_id>/favoritos', methods=['POST'])
 def add_favorito(cliente_id):
     data = request.get_json() or {}
     conn = get_db_connection(); cur = conn.cursor()
     try:
         cur.execute("INSERT IGNORE INTO cliente_favoritos (cliente_id, barbearia_id) VALUES (%s,%s)", (cliente_id, data.get('barbearia_id')))
+        _bump_version(cur, 'cliente', cliente_id, 'favoritos')
         conn.commit(); return jsonify({'success': True})
     except Exception as e: return jsonify({'success': False, 'message': str(e)}), 400
     finally: cur.close(); conn.close()
@@ -1249,6 +2022,7 @@ def add_favorito(cliente_id):
 def remove_favorito(cliente_id, barbearia_id):
     conn = get_db_connection(); cur = conn.cursor()
     cur.execute("DELETE FROM cliente_favoritos WHERE cliente_id = %s AND barbearia_id = %s", (cliente_id, barbearia_id))
+    _bump_version(cur, 'cliente', cliente_id, 'favoritos')
     conn.commit(); cur.close(); conn.close()
     return jsonify({'success': True})
 
@@ -1291,14 +2065,13 @@ def register_barbearia():
     if not conn:
         return jsonify({'success': False, 'message': 'Erro de conexão com o banco de dados.'}), 503
 
-    lat, lng = _geocode_address(data)
     cursor = conn.cursor()
     try:
         cursor.execute(
             """INSERT INTO barbearias (
                    nome_barbearia, email, whatsapp, senha_hash, cnpj_cpf,
-                   nome_responsavel, latitude, longitude, termos_aceitos
-               ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 1)""",
+                   nome_responsavel, termos_aceitos, geocode_status
+               ) VALUES (%s, %s, %s, %s, %s, %s, 1, %s)""",
             (
                 data.get('nomeBarbearia').strip(),
                 data.get('email').strip(),
@@ -1306,10 +2079,13 @@ def register_barbearia():
                 data.get('senha'),
                 data.get('cnpjCpf').strip(),
                 data.get('responsavel').strip(),
-                lat,
-                lng,
+                STATUS_SEM_ENDERECO,
             ),
         )
+        # O formulário de cadastro não tem endereço; ele chega pela edição do perfil.
+        # Se vier, as coordenadas chegam depois pelo worker da outbox
+        if build_address(data):
+            request_geocode(cursor, cursor.lastrowid, data)
         conn.commit()
         return jsonify({'success': True, 'message': 'Cadastro realizado com sucesso!'})
     except Exception as e:
@@ -1330,6 +2106,82 @@ def register_barbearia():
 def health_check():
     return jsonify({'success': True, 'message': 'API Unificada Online', 'timestamp': datetime.now().isoformat()})
 
+@app.route('/api/metrics/outbox', methods=['GET'])
+def get_outbox_metrics():
+    """Fila da outbox: pendentes, lag do evento mais antigo e vazão de envio."""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'message': 'Erro DB'}), 500
+    cur = conn.cursor(dictionary=True)
+    try:
+        return jsonify({'success': True, 'outbox': outbox_metrics(cur)})
+    finally:
+        cur.close(); conn.close()
+
+
+@app.route('/api/metrics/etags', methods=['GET'])
+def get_etag_metrics():
+    """Taxa de acerto (respostas 304) do GET condicional por rota, neste worker."""
+    return jsonify({'success': True, 'etags': etag_stats.snapshot()})
+
+
+@app.route('/api/metrics/geocode', methods=['GET'])
+def get_geocode_metrics():
+    """Cache de geocodificação (acertos, faltas, latência do geocoder externo), de sugestões e das respostas do Google."""
+    suggestions = address_suggestions.snapshot()
+    suggestions['coalescidas'] = suggestion_flight.coalesced
+    metrics = {'success': True, 'geocode': get_geocode_cache().snapshot(), 'sugestoes': suggestions}
+    if barbearias_service.places_service:
+        places_api = barbearias_service.places_service.places_api
+        metrics['google'] = dict(places_api.cache.snapshot(), coalescidas=places_api.flight.coalesced)
+    return jsonify(metrics)
+
+
+@app.route('/api/metrics/quotas', methods=['GET'])
+def get_quota_metrics():
+    """Uso das cotas locais e estado do circuit breaker de cada API externa (Google Places, Nominatim)."""
+    return jsonify({'success': True, 'quotas': quota_snapshot()})
+
+
+# --- SUGESTÕES DE ENDEREÇO ---
+SUGGEST_MIN_CHARS = 3
+# Limite de previsões do Places Autocomplete; menos que isso = lista completa para o prefixo
+GOOGLE_SUGGESTION_LIMIT = 5
+VALE_DO_ACO_CENTER = {'lat': -19.4703, 'lng': -42.5369}
+
+def _fetch_address_suggestions(scope, query):
+    """Consulta o provedor e guarda no cache de prefixos (listas vazias não são guardadas)."""
+    if scope == 'google':
+        raw = barbearias_service.places_service.get_address_suggestions(query, VALE_DO_ACO_CENTER)
+        suggestions, complete = [s for s in raw if in_region_text(s)], len(raw) < GOOGLE_SUGGESTION_LIMIT
+    else:
+        suggestions, complete = nominatim_suggestions(query)
+    if suggestions:
+        address_suggestions.put(scope, query, suggestions, complete)
+    return suggestions
+
+@app.route('/api/address/suggest', methods=['GET'])
+def suggest_address():
+    """
+    Autocomplete de endereço no Vale do Aço, feito no servidor (a chave do Google não vai ao navegador).
+    Prefixos já consultados por qualquer usuário saem do cache; consultas iguais simultâneas viram uma só.
+    """
+    query = (request.args.get('q') or '').strip()
+    if len(normalize_query(query)) < SUGGEST_MIN_CHARS:
+        return jsonify({'success': True, 'suggestions': []})
+    scope = 'google' if barbearias_service.places_service else 'nominatim'
+    try:
+        suggestions = address_suggestions.get(scope, query)
+        if suggestions is None:
+            suggestions = suggestion_flight.do((scope, normalize_query(query)),
+                                               lambda: _fetch_address_suggestions(scope, query))
+    except Exception as e:
+        logger.warning(f"[SUGGEST] Provedor de sugestões indisponível: {e}")
+        return jsonify({'success': False, 'message': 'Sugestões indisponíveis no momento.'}), 503
+    resp = jsonify({'success': True, 'suggestions': suggestions[:GOOGLE_SUGGESTION_LIMIT]})
+    # Backspace e redigitação do mesmo prefixo nem chegam ao servidor
+    resp.headers['Cache-Control'] = 'public, max-age=300'
+    return resp
 
 @app.errorhandler(404)
 def handle_not_found(e):
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Sincronização de Agendamentos
+Consultas do feed de alterações (delta) das listas de agendamentos:
+linhas alteradas desde um cursor (atualizado_em, id) e lápides de remoções.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Janela de segurança: alterações mais recentes que isso ficam para o próximo
+# ciclo, para não pular transações que ainda não fizeram commit.
+# Limite da garantia: atualizado_em (e removido_em) é o instante do comando, não
+# o do commit. Uma transação que faz commit mais de SAFETY_LAG_SECONDS depois de
+# gravar a linha pode aparecer atrás de um cursor que já avançou e não é
+# entregue pelo delta; o cliente só a vê ao recarregar a lista. As escritas de
+# agendamentos são transações curtas (sem chamadas externas entre o comando e o
+# commit), o que mantém esse caso fora do uso normal.
+SAFETY_LAG_SECONDS = 1
+
+_OWNER_COLUMNS = ('barbearia_id', 'cliente_id')
+
+
+def _check_owner(owner_col: str) -> None:
+    if owner_col not in _OWNER_COLUMNS:
+        raise ValueError(f"Coluna de dono inválida: {owner_col}")
+
+
+def sync_cutoff(cursor) -> datetime:
+    """Instante (relógio do banco) até onde o feed pode avançar com segurança"""
+    cursor.execute(f"SELECT NOW(6) - INTERVAL {SAFETY_LAG_SECONDS} SECOND AS corte")
+    row = cursor.fetchone()
+    return row['corte'] if isinstance(row, dict) else row[0]
+
+
+def initial_position(cursor, owner_col: str, owner_id: int) -> Tuple[datetime, int, int]:
+    """
+    Posição inicial do feed para quem acabou de carregar a lista completa
+
+    Returns:
+        Tuple[datetime, int, int]: (atualizado_em, id do agendamento, id da última lápide)
+    """
+    _check_owner(owner_col)
+    corte = sync_cutoff(cursor)
+    cursor.execute(f"""SELECT COALESCE(MAX(id), 0) AS ultimo FROM agendamentos_removidos
+                       WHERE {owner_col} = %s AND removido_em <= %s""", (owner_id, corte))
+    row = cursor.fetchone()
+    return corte, 0, int((row['ultimo'] if isinstance(row, dict) else row[0]) or 0)
+
+
+def changed_rows_condition(owner_col: str, owner_id: int, since_ts: datetime, since_id: int,
+                           cutoff: datetime) -> Tuple[List[str], List[Any]]:
+    """
+    Condições (alias 'a') para agendamentos criados/alterados após (since_ts, since_id)
+
+    Returns:
+        Tuple[List[str], List[Any]]: Condições SQL e parâmetros; ordenar por a.atualizado_em, a.id
+    """
+    _check_owner(owner_col)
+    return (
+        [f"a.{owner_col} = %s",
+         "(a.atualizado_em > %s OR (a.atualizado_em = %s AND a.id > %s))",
+         "a.atualizado_em <= %s"],
+        [owner_id, since_ts, since_ts, since_id, cutoff],
+    )
+
+
+def fetch_removals(cursor, owner_col: str, owner_id: int, after_id: int, cutoff: datetime,
+                   limit: int) -> List[Dict[str, Any]]:
+    """Lápides posteriores a after_id, em ordem de id"""
+    _check_owner(owner_col)
+    cursor.execute(f"""SELECT id, agendamento_id, motivo FROM agendamentos_removidos
+                       WHERE {owner_col} = %s AND id > %s AND removido_em <= %s
+                       ORDER BY id LIMIT %s""", (owner_id, after_id, cutoff, limit))
+    return [r if isinstance(r, dict) else {'id': r[0], 'agendamento_id': r[1], 'motivo': r[2]}
+            for r in cursor.fetchall()]
+
+
+def record_removals(cursor, where_sql: str, params: tuple, motivo: str = 'removido') -> None:
+    """
+    Grava lápides para os agendamentos que serão apagados por `where_sql`.
+    Todo DELETE em agendamentos (hoje só o arquivamento, backend/archive.py)
+    deve chamá-la antes, na mesma transação.
+    """
+    cursor.execute(f"""INSERT INTO agendamentos_removidos (agendamento_id, barbearia_id, cliente_id, motivo)
+                       SELECT id, barbearia_id, cliente_id, %s FROM agendamentos WHERE {where_sql}""",
+                   (motivo, *params))
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Arquivo de Agendamentos
+Move agendamentos antigos para agendamentos_arquivo em lotes, mantendo a
+tabela principal (disponibilidade, agenda futura) só com dados recentes, e
+mede o efeito nas consultas quentes.
+"""
+
+import os
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .agenda_sync import record_removals
+except ImportError:
+    from agenda_sync import record_removals
+
+ARCHIVE_TABLE = 'agendamentos_arquivo'
+
+# Agendamentos com data anterior a hoje - RETENTION_DAYS vão para o arquivo
+RETENTION_DAYS = int(os.environ.get('AGENDAMENTOS_RETENCAO_DIAS', 180))
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def archive_cutoff(today: date, retention_days: int = RETENTION_DAYS) -> date:
+    """Primeiro dia que permanece na tabela principal"""
+    return today - timedelta(days=max(retention_days, 1))
+
+
+def archive_batch(cursor, cutoff: date, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Move um lote de agendamentos anteriores a `cutoff` para o arquivo.
+    O chamador faz o commit; cada lote é uma transação curta.
+
+    Grava lápides com motivo 'arquivado': o feed de sincronização só acompanha
+    a tabela principal, então a linha sai do conjunto sincronizado (continua
+    visível nas listagens de histórico, que leem as duas tabelas).
+
+    Returns:
+        int: Quantidade de agendamentos movidos
+    """
+    cursor.execute("""SELECT id FROM agendamentos WHERE data_agendamento < %s
+                      ORDER BY data_agendamento, id LIMIT %s FOR UPDATE""", (cutoff, batch_size))
+    ids = [r['id'] if isinstance(r, dict) else r[0] for r in cursor.fetchall()]
+    if not ids:
+        return 0
+    marks = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"INSERT INTO {ARCHIVE_TABLE} SELECT * FROM agendamentos WHERE id IN ({marks})", tuple(ids))
+    record_removals(cursor, f"id IN ({marks})", tuple(ids), motivo='arquivado')
+    cursor.execute(f"DELETE FROM agendamentos WHERE id IN ({marks})", tuple(ids))
+    return len(ids)
+
+
+def run_archiver(conn, cutoff: date, batch_size: int = DEFAULT_BATCH_SIZE, pause: float = 0.0,
+                 log: Callable[[str], None] = print) -> int:
+    """
+    Arquiva em lotes até não restar nada anterior a `cutoff`
+
+    Args:
+        conn: Conexão MySQL
+        cutoff (date): Primeiro dia mantido na tabela principal
+        batch_size (int): Agendamentos por transação
+        pause (float): Pausa entre lotes, em segundos, para aliviar a réplica/IO
+
+    Returns:
+        int: Total movido
+    """
+    cursor = conn.cursor()
+    total = 0
+    try:
+        while True:
+            try:
+                moved = archive_batch(cursor, cutoff, batch_size)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            total += moved
+            if moved:
+                log(f"[ARQUIVO] {moved} agendamento(s) movido(s) (total {total}).")
+            if moved < batch_size:
+                return total
+            if pause:
+                time.sleep(pause)
+    finally:
+        cursor.close()
+
+
+# --- BENCHMARK ---
+# Consultas quentes com {tabela}; a versão "histórico completo" roda a mesma
+# consulta nas duas tabelas (UNION ALL), como se nada tivesse sido arquivado.
+BENCHMARK_QUERIES = (
+    ("disponibilidade (dia seguinte)",
+     "SELECT a.horario_inicio, a.duracao_total FROM {tabela} a WHERE a.barbearia_id = %s "
+     "AND a.data_agendamento = %s AND a.status != 'cancelado'",
+     lambda bid, today: (bid, today + timedelta(days=1))),
+    ("agenda futura da barbearia",
+     "SELECT a.id FROM {tabela} a WHERE a.barbearia_id = %s AND a.data_agendamento >= %s "
+     "ORDER BY a.data_agendamento, a.horario_inicio, a.id LIMIT 50",
+     lambda bid, today: (bid, today)),
+    ("resumo do dashboard",
+     "SELECT COUNT(*), SUM(a.valor_total) FROM {tabela} a WHERE a.barbearia_id = %s AND a.data_agendamento <= %s",
+     lambda bid, today: (bid, today)),
+)
+
+
+def _median_ms(cursor, sql: str, params: tuple, repeats: int) -> float:
+    samples = []
+    for _ in range(max(repeats, 1)):
+        t0 = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def _estimated_rows(cursor, sql: str, params: tuple) -> int:
+    cursor.execute(f"EXPLAIN {sql}", params)
+    return sum(int((r.get('rows') if isinstance(r, dict) else 0) or 0) for r in cursor.fetchall())
+
+
+def benchmark(cursor, barbearia_id: int, today: date, repeats: int = 20) -> List[Dict[str, Any]]:
+    """
+    Compara as consultas quentes só na tabela principal e no histórico completo
+
+    Args:
+        cursor: Cursor com dictionary=True
+        barbearia_id (int): Barbearia usada nas consultas
+        today (date): Data de referência
+        repeats (int): Execuções por consulta (mediana)
+
+    Returns:
+        List[Dict[str, Any]]: Tempo mediano (ms) e linhas estimadas pelo EXPLAIN, por consulta
+    """
+    report = []
+    for description, template, make_params in BENCHMARK_QUERIES:
+        params = make_params(barbearia_id, today)
+        live = template.format(tabela='agendamentos')
+        archived = template.format(tabela=ARCHIVE_TABLE)
+        full = f"({live}) UNION ALL ({archived})"
+        report.append({
+            'query': description,
+            'recent_ms': _median_ms(cursor, live, params, repeats),
+            'full_ms': _median_ms(cursor, full, params + params, repeats),
+            'recent_rows': _estimated_rows(cursor, live, params),
+            'full_rows': _estimated_rows(cursor, live, params) + _estimated_rows(cursor, archived, params),
+        })
+    return report
+
+
+def table_sizes(cursor) -> Dict[str, Dict[str, int]]:
+    """Linhas (estimadas) e bytes de dados+índices das duas tabelas"""
+    cursor.execute("""SELECT TABLE_NAME AS tabela, TABLE_ROWS AS linhas, DATA_LENGTH + INDEX_LENGTH AS bytes
+                      FROM information_schema.TABLES
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ('agendamentos', %s)""", (ARCHIVE_TABLE,))
+    return {r['tabela']: {'linhas': int(r['linhas'] or 0), 'bytes': int(r['bytes'] or 0)} for r in cursor.fetchall()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Arquivamento do histórico de agendamentos do EasyCut")
+    parser.add_argument('--days', type=int, default=RETENTION_DAYS, help="Dias de histórico mantidos na tabela principal")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=0.0, help="Pausa entre lotes (s)")
+    parser.add_argument('--benchmark', action='store_true', help="Só mede as consultas quentes, sem mover nada")
+    parser.add_argument('--barbearia', type=int, default=1, help="Barbearia usada no benchmark")
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    from app import get_db_connection, _now_br
+    conn = get_db_connection()
+    if not conn:
+        print("[ERRO] Sem conexão com o banco.")
+        return 1
+    today = _now_br().date()
+    try:
+        if args.benchmark:
+            cursor = conn.cursor(dictionary=True)
+            for tabela, info in table_sizes(cursor).items():
+                print(f"  {tabela}: ~{info['linhas']} linhas, {info['bytes'] / 1024 / 1024:.1f} MB")
+            for item in benchmark(cursor, args.barbearia, today, args.repeats):
+                print(f"  {item['query']}: recente {item['recent_ms']} ms ({item['recent_rows']} linhas est.) | "
+                      f"histórico completo {item['full_ms']} ms ({item['full_rows']} linhas est.)")
+            cursor.close()
+            return 0
+        cutoff = archive_cutoff(today, args.days)
+        total = run_archiver(conn, cutoff, args.batch_size, args.pause)
+        print(f"[OK] {total} agendamento(s) anteriores a {cutoff.isoformat()} arquivado(s).")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Busca Combinada
+Mistura na busca por proximidade os estabelecimentos do Google Places com as
+barbearias cadastradas. A consulta externa roda em paralelo com a do banco e
+só entra o que chegou dentro do orçamento de tempo; o que chegar depois é
+descartado, então a resposta nunca espera pelo Google além do orçamento.
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+try:
+    from .cache_utils import normalize_query
+except ImportError:
+    from cache_utils import normalize_query
+
+# Palavras que não distinguem um estabelecimento de outro ("Barbearia do Zé" == "Zé Barber Shop")
+GENERIC_WORDS = frozenset({
+    'barbearia', 'barber', 'barbershop', 'shop', 'salao', 'studio', 'estudio', 'cabeleireiro',
+    'cabeleireiros', 'beleza', 'hair', 'do', 'da', 'de', 'dos', 'das', 'e', 'the', 'o', 'a',
+})
+# Distância até a qual dois resultados com nomes parecidos são o mesmo lugar
+DEDUP_DISTANCE_KM = 0.15
+# Fração mínima de palavras em comum (Jaccard) para nomes parecidos
+NAME_SIMILARITY = 0.5
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    dlat, dlng = math.radians(lat2 - lat1), math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def name_tokens(name: str) -> frozenset:
+    """Palavras significativas do nome (sem acento, caixa e termos genéricos)"""
+    return frozenset(w for w in normalize_query(name).split() if w not in GENERIC_WORDS)
+
+
+def similar_names(a: frozenset, b: frozenset) -> bool:
+    """Um nome contém o outro ou têm boa parte das palavras em comum; nomes só genéricos só casam entre si"""
+    if not a or not b:
+        return a == b
+    if a <= b or b <= a:
+        return True
+    return len(a & b) / len(a | b) >= NAME_SIMILARITY
+
+
+def external_item(place: Dict[str, Any], lat: float, lng: float) -> Optional[Dict[str, Any]]:
+    """
+    Resultado da Nearby Search no formato dos cards da busca
+
+    Args:
+        place (Dict[str, Any]): Resultado do Google Places
+        lat (float): Latitude da busca
+        lng (float): Longitude da busca
+
+    Returns:
+        Optional[Dict[str, Any]]: Item com external=True, ou None sem nome/coordenadas
+    """
+    location = (place.get('geometry') or {}).get('location') or {}
+    if not place.get('name') or location.get('lat') is None or location.get('lng') is None:
+        return None
+    place_lat, place_lng = float(location['lat']), float(location['lng'])
+    return {
+        'id': place.get('place_id'),
+        'place_id': place.get('place_id'),
+        'name': place['name'],
+        'address': place.get('vicinity') or place.get('formatted_address') or '',
+        'latitude': place_lat,
+        'longitude': place_lng,
+        'distance': haversine_km(lat, lng, place_lat, place_lng),
+        'rating': place.get('rating'),
+        'reviews_count': place.get('user_ratings_total', 0),
+        'price_level': place.get('price_level'),
+        'photos': [],
+        'services': [],
+        'opening_hours': None,
+        'appointment_count': 0,
+        'external': True,
+        'source': 'google_places',
+    }
+
+
+def merge_external(own: List[Dict[str, Any]], external: Iterable[Dict[str, Any]],
+                   max_km: float = DEDUP_DISTANCE_KM) -> List[Dict[str, Any]]:
+    """
+    Externos que não repetem uma barbearia própria (nem outro externo já aceito)
+
+    Duplicata = a menos de `max_km` e com nome parecido; a barbearia cadastrada
+    sempre prevalece, pois tem agenda e serviços.
+
+    Args:
+        own (List[Dict[str, Any]]): Itens do banco (com latitude/longitude)
+        external (Iterable[Dict[str, Any]]): Itens de external_item()
+
+    Returns:
+        List[Dict[str, Any]]: Externos a acrescentar
+    """
+    kept = [(name_tokens(item.get('name', '')), float(item['latitude']), float(item['longitude']))
+            for item in own if item.get('latitude') is not None and item.get('longitude') is not None]
+    added = []
+    for item in external:
+        tokens = name_tokens(item['name'])
+        duplicate = any(haversine_km(lat, lng, item['latitude'], item['longitude']) <= max_km
+                        and similar_names(tokens, other) for other, lat, lng in kept)
+        if duplicate:
+            continue
+        kept.append((tokens, item['latitude'], item['longitude']))
+        added.append(item)
+    return added
+
+
+class ExternalSearch:
+    """
+    Consome um gerador de resultados externos em segundo plano até o prazo
+
+    collect() devolve o que chegou até o prazo e manda o gerador parar; cancel()
+    só manda parar (a requisição terminou sem ler o resultado). O gerador recebe
+    o mesmo evento de parada, então o consumo termina sem esperar a página
+    em andamento.
+    """
+
+    def __init__(self, source: Callable[[threading.Event], Iterator[Dict[str, Any]]], executor: Executor,
+                 budget: float, clock: Callable[[], float] = time.monotonic):
+        self.deadline = clock() + budget
+        self.clock = clock
+        self._items: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self.timed_out = False
+        executor.submit(self._run, source)
+
+    def _run(self, source: Callable[[threading.Event], Iterator[Dict[str, Any]]]) -> None:
+        results = None
+        try:
+            results = source(self._stop)
+            for item in results:
+                if self._stop.is_set():
+                    break
+                with self._lock:
+                    self._items.append(item)
+        except Exception as e:
+            print(f"[AVISO] Busca externa falhou: {e}")
+        finally:
+            if results is not None and hasattr(results, 'close'):
+                results.close()
+            self._done.set()
+
+    def cancel(self) -> None:
+        """Descarta a busca: o gerador para na próxima verificação"""
+        self._stop.set()
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """Espera o fim da busca externa ou o prazo, o que vier primeiro"""
+        self.timed_out = not self._done.wait(max(0.0, self.deadline - self.clock()))
+        self._stop.set()
+        with self._lock:
+            return list(self._items)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Utilitários de Cache
+Cache LRU com validade, coalescência de chamadas simultâneas (single-flight)
+e cache de prefixos (trie) para sugestões de endereço.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+def normalize_query(text: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples (sem expandir abreviações, para preservar prefixos)"""
+    text = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode('ascii').lower()
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', text)).strip()
+
+
+class TTLCache:
+    """LRU limitado por quantidade de entradas, com validade por entrada"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(encontrado, valor); entradas vencidas contam como falta e são removidas"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._data.keys())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {'entradas': len(self._data), 'acertos': self.hits, 'faltas': self.misses,
+                    'taxa_acerto': round(self.hits / total, 4) if total else 0.0}
+
+
+class _Call:
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalescência de chamadas: enquanto uma chamada para a chave está em andamento,
+    as demais threads esperam e recebem o mesmo resultado (ou a mesma exceção)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class _TrieNode:
+    __slots__ = ('children', 'has_value')
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.has_value = False
+
+
+class PrefixCache:
+    """
+    Sugestões por prefixo digitado
+
+    Guarda cada consulta (normalizada) numa trie com LRU/validade. Uma consulta
+    nova é atendida por um prefixo já guardado quando a lista dele veio
+    completa (o provedor devolveu menos itens que o limite dele): a lista do
+    prefixo é filtrada pelas palavras da consulta, sem chamar o provedor. Uma
+    lista cortada no limite pode ter deixado de fora o que a consulta mais
+    longa encontraria, então nesse caso vai ao provedor.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        self._values = TTLCache(max_entries, ttl, clock)
+        self._root = _TrieNode()
+        self._lock = threading.Lock()
+        self._inserted = 0
+        self.hits = self.prefix_hits = self.misses = 0
+
+    @staticmethod
+    def _key(scope: str, query: str) -> str:
+        return f"{scope}\x1f{normalize_query(query)}"
+
+    def _insert(self, key: str) -> None:
+        node = self._root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.has_value = True
+
+    def _ancestors(self, key: str) -> List[str]:
+        """Prefixos guardados de `key`, do mais longo ao mais curto"""
+        found, node = [], self._root
+        for i, ch in enumerate(key):
+            node = node.children.get(ch)
+            if node is None:
+                break
+            if node.has_value:
+                found.append(key[:i + 1])
+        return found[::-1]
+
+    @staticmethod
+    def _matches(query: str, suggestion: str) -> bool:
+        words = normalize_query(suggestion).split()
+        return all(any(w.startswith(token) for w in words) for token in query.split())
+
+    def get(self, scope: str, query: str) -> Optional[List[str]]:
+        """Sugestões guardadas (exatas ou filtradas de um prefixo completo), ou None"""
+        key = self._key(scope, query)
+        found, value = self._values.get(key)
+        if found:
+            self.hits += 1
+            return list(value[0])
+        with self._lock:
+            ancestors = self._ancestors(key)
+        scope_len = len(scope) + 1
+        for ancestor in ancestors:
+            if len(ancestor) <= scope_len:
+                break
+            ok, cached = self._values.get(ancestor)
+            if ok and cached[1]:
+                self.prefix_hits += 1
+                return [s for s in cached[0] if self._matches(key[scope_len:], s)]
+        self.misses += 1
+        return None
+
+    def put(self, scope: str, query: str, suggestions: List[str], complete: bool = False) -> None:
+        """
+        Guarda as sugestões da consulta
+
+        Args:
+            scope (str): Provedor (consultas de provedores diferentes não se misturam)
+            query (str): Texto digitado
+            suggestions (List[str]): Sugestões devolvidas
+            complete (bool): O provedor devolveu tudo o que tinha (não cortou no limite)
+        """
+        key = self._key(scope, query)
+        self._values.set(key, (list(suggestions), complete))
+        with self._lock:
+            self._insert(key)
+            self._inserted += 1
+            # O LRU descarta valores mas a trie só cresce: refaz a trie com as chaves vivas de tempos em tempos
+            if self._inserted > 4 * self._values.max_entries:
+                self._root = _TrieNode()
+                keys = self._values.keys()
+                for live in keys:
+                    self._insert(live)
+                self._inserted = len(keys)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.prefix_hits + self.misses
+        return {'entradas': len(self._values), 'acertos': self.hits, 'acertos_por_prefixo': self.prefix_hits,
+                'faltas': self.misses, 'taxa_acerto': round((lookups - self.misses) / lookups, 4) if lookups else 0.0}
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Barramento de Eventos em Processo
+Pub/sub simples por chave (ex.: id da barbearia) usado para acordar os
+streams SSE assim que um agendamento é gravado neste worker.
+"""
+
+import queue
+import threading
+from typing import Any, Dict, Hashable, Set
+
+
+class EventBus:
+    """
+    Pub/sub em memória. Cada assinante recebe uma fila própria; publicações
+    para filas cheias são descartadas (o assinante relê o feed do banco de
+    qualquer forma, então a mensagem serve apenas como "acorde").
+    """
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[Hashable, Set[queue.Queue]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key: Hashable) -> queue.Queue:
+        """
+        Registra um assinante para a chave
+
+        Args:
+            key (Hashable): Chave do canal (ex.: id da barbearia)
+
+        Returns:
+            queue.Queue: Fila que receberá as publicações
+        """
+        q: queue.Queue = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(q)
+        return q
+
+    def unsubscribe(self, key: Hashable, q: queue.Queue) -> None:
+        with self._lock:
+            subs = self._subscribers.get(key)
+            if subs is None:
+                return
+            subs.discard(q)
+            if not subs:
+                del self._subscribers[key]
+
+    def publish(self, key: Hashable, message: Any = None) -> int:
+        """
+        Publica uma mensagem para todos os assinantes da chave
+
+        Returns:
+            int: Quantidade de assinantes que receberam a mensagem
+        """
+        with self._lock:
+            subs = list(self._subscribers.get(key, ()))
+        delivered = 0
+        for q in subs:
+            try:
+                q.put_nowait(message)
+                delivered += 1
+            except queue.Full:
+                pass
+        return delivered
+
+    def subscriber_count(self, key: Hashable) -> int:
+        with self._lock:
+            return len(self._subscribers.get(key, ()))
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Gazetteer do Vale do Aço
+Geocodificação offline por CEP e por logradouro+bairro+cidade para a região
+atendida (Ipatinga, Timóteo, Coronel Fabriciano e Santana do Paraíso).
+O CSV em backend/data é compilado num arquivo binário ordenado, lido via
+mmap com busca binária; o geocoder externo só é usado nas faltas.
+
+O CSV (colunas de CSV_COLUMNS, base de CEPs/logradouros da região) não é
+distribuído com o repositório: sem ele e sem o binário em GAZETTEER_PATH, o
+gazetteer fica vazio e toda geocodificação segue para o geocoder externo.
+
+Uso:
+    python -m backend.gazetteer build [--csv backend/data/gazetteer_vale_do_aco.csv] [--out instance/gazetteer.bin]
+    python -m backend.gazetteer lookup --cep 35160-000
+"""
+
+import csv
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+try:
+    from .geocode_cache import normalize_address
+except ImportError:
+    from geocode_cache import normalize_address
+
+Coordinates = Tuple[float, float]
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_PATH = os.path.join(_ROOT, 'backend', 'data', 'gazetteer_vale_do_aco.csv')
+BIN_PATH = os.environ.get('GAZETTEER_PATH', os.path.join(_ROOT, 'instance', 'gazetteer.bin'))
+
+# Mesmo viewbox da busca de endereços em VisualizarBarbearias.html (lng_min, lat_min, lng_max, lat_max)
+VIEWBOX = (-42.8, -19.6, -42.2, -19.2)
+
+CSV_COLUMNS = ('cep', 'logradouro', 'bairro', 'cidade', 'uf', 'lat', 'lng')
+
+# Cabeçalho: magic, versão, qtd. de CEPs, qtd. de logradouros
+_HEADER = struct.Struct('<4sHII')
+_MAGIC = b'EZGZ'
+# 2: chaves de logradouro com a normalização de geocode_cache que só expande o tipo de logradouro
+_VERSION = 2
+# Registros de tamanho fixo, ordenados pela chave; coordenadas em milionésimos de grau (graus * 1e6)
+_CEP_RECORD = struct.Struct('<Iii')
+_STREET_RECORD = struct.Struct('<Qii')
+
+
+def normalize_cep(cep: Any) -> Optional[int]:
+    """'35160-000' -> 35160000; None se não tiver 8 dígitos"""
+    digits = ''.join(ch for ch in str(cep or '') if ch.isdigit())
+    return int(digits) if len(digits) == 8 else None
+
+
+def is_city_cep(cep: Any) -> bool:
+    """CEP geral de cidade (sufixo 000), sem logradouro específico"""
+    key = normalize_cep(cep)
+    return key is not None and key % 1000 == 0
+
+
+def street_key(logradouro: Any, bairro: Any, cidade: Any) -> Optional[int]:
+    """Hash de 64 bits de logradouro|bairro|cidade normalizados; None se faltar logradouro ou cidade"""
+    parts = [normalize_address(str(p or '')) for p in (logradouro, bairro, cidade)]
+    if not parts[0] or not parts[2]:
+        return None
+    digest = hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=8).digest()
+    return struct.unpack('<Q', digest)[0]
+
+
+def in_region(lat: float, lng: float) -> bool:
+    lng_min, lat_min, lng_max, lat_max = VIEWBOX
+    return lat_min <= lat <= lat_max and lng_min <= lng <= lng_max
+
+
+def build(rows: Iterable[Mapping[str, Any]], out_path: str) -> Dict[str, int]:
+    """
+    Compila as linhas do CSV no arquivo binário
+
+    Linhas fora do viewbox ou sem coordenadas válidas são descartadas; chaves
+    repetidas ficam com a primeira ocorrência.
+
+    Args:
+        rows (Iterable[Mapping[str, Any]]): Linhas com as colunas de CSV_COLUMNS
+        out_path (str): Arquivo de saída
+
+    Returns:
+        Dict[str, int]: Contagens (ceps, logradouros, descartadas)
+    """
+    ceps: Dict[int, Tuple[int, int]] = {}
+    streets: Dict[int, Tuple[int, int]] = {}
+    discarded = 0
+    for row in rows:
+        try:
+            lat, lng = float(row.get('lat')), float(row.get('lng'))
+        except (TypeError, ValueError):
+            discarded += 1
+            continue
+        if not in_region(lat, lng):
+            discarded += 1
+            continue
+        point = (round(lat * 1e6), round(lng * 1e6))
+        cep = normalize_cep(row.get('cep'))
+        if cep is not None:
+            ceps.setdefault(cep, point)
+        key = street_key(row.get('logradouro'), row.get('bairro'), row.get('cidade'))
+        if key is not None:
+            streets.setdefault(key, point)
+        if cep is None and key is None:
+            discarded += 1
+
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(out_dir, exist_ok=True)
+    # Temporário exclusivo na mesma pasta: workers compilando ao mesmo tempo não escrevem no mesmo arquivo
+    fd, tmp_path = tempfile.mkstemp(prefix='.gazetteer-', suffix='.tmp', dir=out_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(ceps), len(streets)))
+            for cep in sorted(ceps):
+                f.write(_CEP_RECORD.pack(cep, *ceps[cep]))
+            for key in sorted(streets):
+                f.write(_STREET_RECORD.pack(key, *streets[key]))
+        # Troca atômica: processos com o arquivo antigo mapeado continuam lendo a versão deles
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return {'ceps': len(ceps), 'logradouros': len(streets), 'descartadas': discarded}
+
+
+def build_from_csv(csv_path: str = CSV_PATH, out_path: str = BIN_PATH) -> Dict[str, int]:
+    with open(csv_path, encoding='utf-8', newline='') as f:
+        return build(csv.DictReader(f), out_path)
+
+
+class Gazetteer:
+    """Leitor do arquivo compilado (mmap somente leitura, busca binária)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._map: Optional[mmap.mmap] = None
+        self._cep_count = self._street_count = 0
+        if path and os.path.exists(path) and os.path.getsize(path) >= _HEADER.size:
+            with open(path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self._cep_count, self._street_count = _HEADER.unpack_from(self._map, 0)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"Arquivo de gazetteer inválido: {path}")
+        self._street_offset = _HEADER.size + self._cep_count * _CEP_RECORD.size
+
+    def __len__(self) -> int:
+        return self._cep_count + self._street_count
+
+    def _search(self, record: struct.Struct, offset: int, count: int, key: int) -> Optional[Coordinates]:
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found, lat, lng = record.unpack_from(self._map, offset + mid * record.size)
+            if found == key:
+                return lat / 1e6, lng / 1e6
+            if found < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def lookup_cep(self, cep: Any) -> Optional[Coordinates]:
+        key = normalize_cep(cep)
+        if key is None or not self._cep_count:
+            return None
+        return self._search(_CEP_RECORD, _HEADER.size, self._cep_count, key)
+
+    def lookup_street(self, logradouro: Any, bairro: Any, cidade: Any) -> Optional[Coordinates]:
+        key = street_key(logradouro, bairro, cidade)
+        if key is None or not self._street_count:
+            return None
+        return self._search(_STREET_RECORD, self._street_offset, self._street_count, key)
+
+    def lookup(self, data: Mapping[str, Any]) -> Optional[Coordinates]:
+        """
+        Coordenadas do endereço da barbearia: logradouro+bairro+cidade (mais preciso), depois CEP
+
+        O CEP só serve de reserva quando é de logradouro: um CEP geral de
+        cidade (xxxxx-000) daria o centro da cidade, que não é localização
+        da barbearia; nesse caso a falta vai para o geocoder externo.
+
+        Args:
+            data (Mapping[str, Any]): Linha/corpo com logradouro, bairro, cidade e cep
+
+        Returns:
+            Optional[Coordinates]: (lat, lng) ou None se a região não estiver no gazetteer
+        """
+        if self._map is None:
+            return None
+        coords = self.lookup_street(data.get('logradouro'), data.get('bairro'), data.get('cidade'))
+        if coords is None and not is_city_cep(data.get('cep')):
+            coords = self.lookup_cep(data.get('cep'))
+        return coords
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+_shared: Optional[Gazetteer] = None
+_shared_lock = threading.Lock()
+
+
+def _bin_version(path: str) -> Optional[int]:
+    """Versão gravada no cabeçalho (None se o arquivo não for um gazetteer)"""
+    try:
+        with open(path, 'rb') as f:
+            magic, version, _, _ = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return version if magic == _MAGIC else None
+
+
+def get_gazetteer() -> Gazetteer:
+    """
+    Instância do processo. Se o binário em GAZETTEER_PATH não existir ou for mais
+    antigo que o CSV, compila o CSV na primeira chamada; sem nenhum dos dois,
+    devolve um gazetteer vazio (tudo é falta).
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            stale = not os.path.exists(BIN_PATH) or _bin_version(BIN_PATH) != _VERSION or (
+                os.path.exists(CSV_PATH) and os.path.getmtime(CSV_PATH) > os.path.getmtime(BIN_PATH))
+            if stale and os.path.exists(CSV_PATH):
+                try:
+                    build_from_csv(CSV_PATH, BIN_PATH)
+                except OSError:
+                    pass
+            _shared = Gazetteer(BIN_PATH)
+        return _shared
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Gazetteer offline do Vale do Aço")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_build = sub.add_parser('build', help="Compila o CSV no arquivo binário")
+    p_build.add_argument('--csv', default=CSV_PATH)
+    p_build.add_argument('--out', default=BIN_PATH)
+    p_lookup = sub.add_parser('lookup', help="Consulta um CEP ou endereço")
+    p_lookup.add_argument('--cep')
+    p_lookup.add_argument('--logradouro')
+    p_lookup.add_argument('--bairro')
+    p_lookup.add_argument('--cidade')
+    p_lookup.add_argument('--arquivo', default=BIN_PATH)
+    args = parser.parse_args(argv)
+
+    if args.cmd == 'build':
+        counts = build_from_csv(args.csv, args.out)
+        print(f"[OK] {args.out}: {counts['ceps']} CEP(s), {counts['logradouros']} logradouro(s), "
+              f"{counts['descartadas']} linha(s) descartada(s).")
+        return 0
+    gaz = Gazetteer(args.arquivo)
+    coords = gaz.lookup({'cep': args.cep, 'logradouro': args.logradouro, 'bairro': args.bairro,
+                         'cidade': args.cidade})
+    print(coords if coords else "Não encontrado.")
+    return 0 if coords else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Stand-in das APIs de Geolocalização
+Servidor HTTP local que responde no lugar do Google Places/Geocoding
+(/maps/api/...) e do Nominatim (/search, /reverse) a partir de respostas
+gravadas, com latência e erros injetáveis. Permite medir e testar carga da
+geocodificação e da busca sem tocar as APIs reais.
+
+Uso:
+    # Gravar: repassa ao upstream o que não estiver nas fixtures e grava a resposta
+    python -m backend.geo_standin --record --fixtures instance/geo_fixtures.json
+    # Reproduzir, com 80±30 ms de latência e 2% de HTTP 500
+    python -m backend.geo_standin --fixtures instance/geo_fixtures.json --latency-ms 80 --jitter-ms 30 --error-rate 0.02
+
+    GOOGLE_PLACES_BASE_URL=http://127.0.0.1:8765/maps/api NOMINATIM_DOMAIN=127.0.0.1:8765 NOMINATIM_SCHEME=http ...
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+try:
+    from .cache_utils import normalize_query
+except ImportError:
+    from cache_utils import normalize_query
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'instance', 'geo_fixtures.json')
+GOOGLE_PREFIX = '/maps/api/'
+GOOGLE_UPSTREAM = 'https://maps.googleapis.com'
+NOMINATIM_UPSTREAM = 'https://nominatim.openstreetmap.org'
+# Parâmetros que não entram na chave da fixture (credenciais e ruído do cliente)
+_IGNORED_PARAMS = {'key', 'sessiontoken'}
+# Texto livre comparado sem acento/caixa, como no cache de respostas
+_TEXT_PARAMS = {'input', 'address', 'q'}
+
+FixtureKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def fixture_key(path: str, params: List[Tuple[str, str]]) -> FixtureKey:
+    """Caminho + parâmetros normalizados e ordenados (sem a API key)"""
+    items = sorted((name, normalize_query(value) if name in _TEXT_PARAMS else value)
+                   for name, value in params if name not in _IGNORED_PARAMS)
+    return path.rstrip('/') or '/', tuple(items)
+
+
+def is_google(path: str) -> bool:
+    return path.startswith(GOOGLE_PREFIX)
+
+
+class FixtureStore:
+    """Respostas gravadas: lista JSON de {path, params, status, body}"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[FixtureKey, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for entry in json.load(f):
+                    self.add(entry['path'], list(entry.get('params', {}).items()),
+                             entry.get('status', 200), entry['body'], save=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: str, params: List[Tuple[str, str]]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.get(fixture_key(path, params))
+
+    def add(self, path: str, params: List[Tuple[str, str]], status: int, body: Any, save: bool = True) -> None:
+        key = fixture_key(path, params)
+        with self._lock:
+            self._entries[key] = {'path': key[0], 'params': dict(key[1]), 'status': status, 'body': body}
+        if save:
+            self.save()
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: (e['path'], sorted(e['params'].items())))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def not_found_body(path: str) -> Any:
+    """Resposta de 'nada encontrado' de cada API, para consultas sem fixture"""
+    if is_google(path):
+        return {'status': 'ZERO_RESULTS', 'results': [], 'predictions': []}
+    return []
+
+
+class StandinConfig:
+    """Latência e injeção de erros (alteráveis com o servidor rodando)"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, record: bool = False, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.record = record
+        self.random = random.Random(seed)
+
+    def delay(self) -> float:
+        jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+
+class GeoStandin(ThreadingHTTPServer):
+    """Servidor do stand-in; `stats` conta respostas por tipo"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], store: FixtureStore, config: StandinConfig):
+        super().__init__(address, _Handler)
+        self.store = store
+        self.config = config
+        self._lock = threading.Lock()
+        self.stats = {'requisicoes': 0, 'fixtures': 0, 'sem_fixture': 0, 'gravadas': 0,
+                      'erros_injetados': 0, 'limites_injetados': 0}
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: GeoStandin
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: Any) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _record(self, path: str, params: List[Tuple[str, str]]) -> Tuple[int, Any]:
+        import requests
+        upstream = GOOGLE_UPSTREAM if is_google(path) else NOMINATIM_UPSTREAM
+        response = requests.get(f"{upstream}{path}?{urlencode(params)}", timeout=15,
+                                headers={'User-Agent': self.headers.get('User-Agent', 'easycut_app/1.0')})
+        body = response.json()
+        if response.status_code == 200:
+            self.server.store.add(path, params, response.status_code, body)
+            self.server.count('gravadas')
+        return response.status_code, body
+
+    def do_GET(self) -> None:
+        server, config = self.server, self.server.config
+        server.count('requisicoes')
+        url = urlsplit(self.path)
+        path, params = url.path, parse_qsl(url.query, keep_blank_values=True)
+        time.sleep(config.delay())
+
+        roll = config.random.random()
+        if roll < config.error_rate:
+            server.count('erros_injetados')
+            return self._send(500, {'error': 'erro injetado pelo stand-in'})
+        if roll < config.error_rate + config.throttle_rate:
+            server.count('limites_injetados')
+            if is_google(path):
+                return self._send(200, {'status': 'OVER_QUERY_LIMIT', 'error_message': 'limite injetado pelo stand-in'})
+            return self._send(429, {'error': 'limite injetado pelo stand-in'})
+
+        entry = server.store.get(path, params)
+        if entry is not None:
+            server.count('fixtures')
+            return self._send(entry['status'], entry['body'])
+        if config.record:
+            try:
+                return self._send(*self._record(path, params))
+            except Exception as e:
+                return self._send(502, {'error': f"upstream indisponível: {e}"})
+        server.count('sem_fixture')
+        self._send(200, not_found_body(path))
+
+
+def start(store: FixtureStore, config: Optional[StandinConfig] = None,
+          host: str = '127.0.0.1', port: int = 0) -> GeoStandin:
+    """
+    Sobe o stand-in numa thread (port=0 escolhe uma porta livre)
+
+    Returns:
+        GeoStandin: Servidor em execução; base_url para os clientes, shutdown() para parar
+    """
+    server = GeoStandin((host, port), store, config or StandinConfig())
+    threading.Thread(target=server.serve_forever, name='geo-standin', daemon=True).start()
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Stand-in local do Google Places e do Nominatim")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', default=FIXTURES_PATH)
+    parser.add_argument('--record', action='store_true', help="Repassa ao upstream o que faltar e grava")
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fração de respostas HTTP 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help="Fração de OVER_QUERY_LIMIT (Google) / HTTP 429 (Nominatim)")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    store = FixtureStore(args.fixtures)
+    config = StandinConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate,
+                           args.record, args.seed)
+    server = GeoStandin((args.host, args.port), store, config)
+    print(f"[OK] Stand-in em {server.base_url} ({len(store)} fixture(s){', gravando' if args.record else ''}).")
+    print(f"  GOOGLE_PLACES_BASE_URL={server.base_url}/maps/api "
+          f"NOMINATIM_DOMAIN={args.host}:{server.server_address[1]} NOMINATIM_SCHEME=http")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"  {server.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Backfill de Coordenadas
+Geocodifica em lotes as barbearias sem latitude/longitude (que hoje somem da
+busca por raio), passando pelo gazetteer, pelo cache e, nas faltas, pelo
+geocoder externo com limite de requisições por segundo. O progresso fica num
+checkpoint JSON, então uma execução interrompida continua de onde parou.
+
+Uso:
+    python -m backend.geocode_backfill [--batch-size 50] [--rate 1] [--limit N] [--reset]
+    python -m backend.geocode_backfill --fixtures geocoder.json --no-cache   # offline, para testes
+"""
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .geocoding import (LOOKUP_FIELDS, STATUS_FALHOU, STATUS_PENDENTE, Coordinates,
+                            build_address, clear_coordinates, geocode_address, nominatim_geocode,
+                            set_geocode_status, store_coordinates)
+    from .geocode_cache import get_geocode_cache, normalize_address
+except ImportError:
+    from geocoding import (LOOKUP_FIELDS, STATUS_FALHOU, STATUS_PENDENTE, Coordinates,
+                           build_address, clear_coordinates, geocode_address, nominatim_geocode,
+                           set_geocode_status, store_coordinates)
+    from geocode_cache import get_geocode_cache, normalize_address
+
+CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'instance', 'geocode_backfill.json')
+DEFAULT_BATCH_SIZE = 50
+# Política de uso do Nominatim público: no máximo 1 requisição por segundo
+DEFAULT_RATE = 1.0
+
+
+@dataclass
+class BackfillProgress:
+    """Estado gravado no checkpoint (acumulado entre execuções)"""
+    ultimo_id: int = 0
+    processados: int = 0
+    resolvidos: int = 0
+    nao_encontrados: int = 0
+    sem_endereco: int = 0
+    erros: int = 0
+    ids_com_erro: List[int] = field(default_factory=list)
+    atualizado_em: Optional[str] = None
+
+    @classmethod
+    def load(cls, path: str) -> "BackfillProgress":
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(**{k: v for k, v in data.items() if k in cls.__dataclass_fields__})
+
+    def save(self, path: str) -> None:
+        """Grava com troca atômica (um kill no meio não corrompe o checkpoint)"""
+        self.atualizado_em = datetime.utcnow().isoformat()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+class Throttle:
+    """Intervalo mínimo entre chamadas ao geocoder externo"""
+
+    def __init__(self, rate: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.clock = clock
+        self.sleep = sleep
+        self._next = 0.0
+
+    def wait(self) -> None:
+        now = self.clock()
+        if now < self._next:
+            self.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+    def wrap(self, fn: Callable[[str], Optional[Coordinates]]) -> Callable[[str], Optional[Coordinates]]:
+        def throttled(address: str) -> Optional[Coordinates]:
+            self.wait()
+            return fn(address)
+        return throttled
+
+
+class FixtureGeocoder:
+    """
+    Geocoder local para testes e execuções offline: arquivo JSON
+    {"endereço": [lat, lng] | null}; endereços ausentes contam como não encontrados
+    """
+
+    def __init__(self, fixtures: Dict[str, Any]):
+        self.fixtures = {normalize_address(k): v for k, v in fixtures.items()}
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: str) -> "FixtureGeocoder":
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __call__(self, address: str) -> Optional[Coordinates]:
+        self.calls += 1
+        value = self.fixtures.get(normalize_address(address))
+        return (float(value[0]), float(value[1])) if value else None
+
+
+def fetch_candidates(cursor, after_id: int, limit: int) -> List[Dict[str, Any]]:
+    """Próximo lote (por id) de barbearias sem coordenadas e sem job de geocodificação pendente"""
+    cursor.execute(f"""SELECT id, {', '.join(LOOKUP_FIELDS)} FROM barbearias
+                       WHERE (latitude IS NULL OR longitude IS NULL)
+                         AND geocode_status <> %s AND id > %s
+                       ORDER BY id LIMIT %s""", (STATUS_PENDENTE, after_id, limit))
+    return cursor.fetchall()
+
+
+class Backfill:
+    """
+    Executa o backfill em lotes; cada lote é gravado e comitado antes de o
+    checkpoint avançar, então repetir um lote interrompido é seguro.
+    """
+
+    def __init__(self, connection_factory: Callable[[], Any], geocoder: Callable[[str], Optional[Coordinates]],
+                 checkpoint_path: str = CHECKPOINT_PATH, batch_size: int = DEFAULT_BATCH_SIZE,
+                 log: Callable[[str], None] = print):
+        self.connection_factory = connection_factory
+        self.geocoder = geocoder
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.log = log
+
+    def _process(self, cursor, row: Dict[str, Any], progress: BackfillProgress) -> None:
+        progress.processados += 1
+        if not build_address(row):
+            clear_coordinates(cursor, row['id'])
+            progress.sem_endereco += 1
+            return
+        try:
+            coords = geocode_address(row, self.geocoder)
+        except Exception as e:
+            # Fica como está; o id vai para o relatório e pode ser refeito com --reset
+            progress.erros += 1
+            progress.ids_com_erro.append(row['id'])
+            self.log(f"  [ERRO] Barbearia {row['id']}: {e}")
+            return
+        if coords is None:
+            set_geocode_status(cursor, row['id'], STATUS_FALHOU)
+            progress.nao_encontrados += 1
+            return
+        store_coordinates(cursor, row['id'], coords)
+        progress.resolvidos += 1
+
+    def run(self, limit: Optional[int] = None, reset: bool = False) -> Dict[str, Any]:
+        """
+        Processa lotes até acabar (ou até `limit` barbearias nesta execução)
+
+        Args:
+            limit (int, optional): Máximo de barbearias nesta execução
+            reset (bool): Ignora o checkpoint e recomeça do primeiro id
+
+        Returns:
+            Dict[str, Any]: Progresso acumulado mais a vazão desta execução
+        """
+        progress = BackfillProgress() if reset else BackfillProgress.load(self.checkpoint_path)
+        started = time.perf_counter()
+        done_now = 0
+        conn = self.connection_factory()
+        if not conn:
+            raise RuntimeError("Sem conexão com o banco.")
+        cursor = conn.cursor(dictionary=True)
+        try:
+            while limit is None or done_now < limit:
+                size = self.batch_size if limit is None else min(self.batch_size, limit - done_now)
+                rows = fetch_candidates(cursor, progress.ultimo_id, size)
+                if not rows:
+                    conn.commit()
+                    break
+                for row in rows:
+                    self._process(cursor, row, progress)
+                conn.commit()
+                progress.ultimo_id = rows[-1]['id']
+                progress.save(self.checkpoint_path)
+                done_now += len(rows)
+                elapsed = time.perf_counter() - started
+                self.log(f"  lote até id {progress.ultimo_id}: {done_now} nesta execução, "
+                         f"{done_now / elapsed if elapsed else 0:.2f}/s, {progress.resolvidos} resolvidas, "
+                         f"{progress.nao_encontrados} não encontradas, {progress.erros} erros")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        elapsed = time.perf_counter() - started
+        report = asdict(progress)
+        report.update({'nesta_execucao': done_now, 'segundos': round(elapsed, 3),
+                       'por_segundo': round(done_now / elapsed, 2) if elapsed else 0.0})
+        return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Backfill de coordenadas das barbearias do EasyCut")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="Requisições/s ao geocoder externo")
+    parser.add_argument('--limit', type=int, default=None, help="Máximo de barbearias nesta execução")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    parser.add_argument('--reset', action='store_true', help="Ignora o checkpoint e recomeça")
+    parser.add_argument('--fixtures', help="JSON {endereço: [lat, lng]} no lugar do Nominatim (offline)")
+    parser.add_argument('--no-cache', action='store_true', help="Não usa o cache SQLite de geocodificação")
+    args = parser.parse_args(argv)
+
+    upstream = FixtureGeocoder.from_file(args.fixtures) if args.fixtures else nominatim_geocode
+    throttled = Throttle(args.rate).wrap(upstream)
+    if args.no_cache:
+        geocoder = throttled
+    else:
+        cache = get_geocode_cache()
+        origem = 'fixtures' if args.fixtures else 'nominatim'
+        geocoder = lambda address: cache.lookup(address, throttled, origem=origem)
+
+    from app import get_db_connection
+    report = Backfill(get_db_connection, geocoder, args.checkpoint, args.batch_size).run(args.limit, args.reset)
+    print(f"[OK] {report['nesta_execucao']} barbearia(s) em {report['segundos']}s ({report['por_segundo']}/s). "
+          f"Total: {report['resolvidos']} resolvidas, {report['nao_encontrados']} não encontradas, "
+          f"{report['sem_endereco']} sem endereço, {report['erros']} erro(s).")
+    if report['ids_com_erro']:
+        print(f"  Ids com erro: {report['ids_com_erro']}")
+    return 0 if not report['erros'] else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
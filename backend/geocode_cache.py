@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Cache de Geocodificação
+Cache persistente (SQLite) de endereço normalizado -> coordenadas, com
+validade, cache negativo (endereço não encontrado) e métricas de acerto
+e latência. Compartilhado pelo worker de geocodificação e pelo PlacesService.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Coordinates = Tuple[float, float]
+
+CACHE_PATH = os.environ.get(
+    'GEOCODE_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'geocode_cache.sqlite3'),
+)
+# Validade das respostas positivas e das negativas (endereço não encontrado)
+TTL_SECONDS = float(os.environ.get('GEOCODE_CACHE_TTL_DIAS', 90)) * 86400
+NEGATIVE_TTL_SECONDS = float(os.environ.get('GEOCODE_CACHE_TTL_NEGATIVO_HORAS', 24)) * 3600
+
+# Tipos de logradouro abreviados: só expandidos na primeira palavra ou quando escritos com ponto
+# ("Av. Brasil" e "Av Brasil", mas não o "Est" de "Rua Est")
+_STREET_TYPES = {
+    'av': 'avenida', 'al': 'alameda', 'pca': 'praca', 'pc': 'praca', 'rod': 'rodovia',
+    'trav': 'travessa', 'tv': 'travessa', 'est': 'estrada',
+}
+# Marcador de número antes de dígitos ("nº 100", "n. 100", "num 100"): sai, o número fica
+_NUMBER_MARKER = re.compile(r'\b(?:n|no|num|numero)\b\.?\s*(?=\d)')
+
+
+def normalize_address(address: str) -> str:
+    """
+    Endereço comparável: sem acentos, minúsculas, sem pontuação, sem o marcador
+    de número e com o tipo de logradouro abreviado expandido
+
+    'Av. Pedro Linhares Gomes, nº 100 - Centro' -> 'avenida pedro linhares gomes 100 centro'
+    """
+    text = unicodedata.normalize('NFKD', str(address or '')).encode('ascii', 'ignore').decode('ascii').lower()
+    text = _NUMBER_MARKER.sub(' ', text)
+    words = []
+    for i, token in enumerate(re.findall(r'[a-z0-9]+\.?', text)):
+        word = token.rstrip('.')
+        if word in _STREET_TYPES and (i == 0 or token.endswith('.')):
+            word = _STREET_TYPES[word]
+        words.append(word)
+    return ' '.join(words)
+
+
+def cache_key(address: str, origem: str = '') -> str:
+    """
+    Chave do cache: geocoder + endereço normalizado. Cada geocoder tem as
+    próprias entradas, para que o "não encontrado" de um não esconda o outro
+    e as fixtures do backfill não se misturem às respostas reais.
+    """
+    return f"{origem}:{normalize_address(address)}"
+
+
+class GeocodeCache:
+    """
+    Cache SQLite de geocodificação
+
+    Uma conexão por thread; o modo WAL permite que os workers do gunicorn e o
+    worker da outbox usem o mesmo arquivo. Exceções do geocoder não são
+    guardadas (a próxima consulta tenta de novo); None vira cache negativo.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = TTL_SECONDS,
+                 negative_ttl: float = NEGATIVE_TTL_SECONDS, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'acertos': 0, 'acertos_negativos': 0, 'faltas': 0, 'erros': 0,
+                       'consultas_externas': 0, 'latencia_externa_total': 0.0}
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""CREATE TABLE IF NOT EXISTS geocode_cache (
+                                chave TEXT PRIMARY KEY,
+                                lat REAL,
+                                lng REAL,
+                                origem TEXT NOT NULL DEFAULT '',
+                                expira_em REAL NOT NULL
+                            )""")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def get(self, address: str, origem: str = '') -> Tuple[bool, Optional[Coordinates]]:
+        """
+        Consulta o cache (entradas do geocoder `origem`)
+
+        Returns:
+            Tuple[bool, Optional[Coordinates]]: (encontrado, coordenadas); (True, None) é cache negativo
+        """
+        row = self._conn().execute("SELECT lat, lng, expira_em FROM geocode_cache WHERE chave = ?",
+                                   (cache_key(address, origem),)).fetchone()
+        if row is None or row[2] <= self.clock():
+            return False, None
+        if row[0] is None:
+            return True, None
+        return True, (row[0], row[1])
+
+    def put(self, address: str, coords: Optional[Coordinates], origem: str = '') -> None:
+        """Grava o resultado (None = não encontrado, com validade menor)"""
+        ttl = self.ttl if coords is not None else self.negative_ttl
+        lat, lng = coords if coords is not None else (None, None)
+        conn = self._conn()
+        conn.execute("""INSERT OR REPLACE INTO geocode_cache (chave, lat, lng, origem, expira_em)
+                        VALUES (?, ?, ?, ?, ?)""", (cache_key(address, origem), lat, lng, origem, self.clock() + ttl))
+        conn.commit()
+
+    def lookup(self, address: str, resolver: Callable[[str], Optional[Coordinates]],
+               origem: str = '') -> Optional[Coordinates]:
+        """
+        Lê do cache ou resolve com o geocoder e guarda o resultado
+
+        Args:
+            address (str): Endereço como digitado
+            resolver (Callable): Geocoder real (endereço -> coordenadas ou None)
+            origem (str): Nome do geocoder, gravado junto da entrada
+
+        Returns:
+            Optional[Coordinates]: Coordenadas, ou None se o endereço não existe
+        """
+        if not normalize_address(address):
+            return None
+        try:
+            found, coords = self.get(address, origem)
+        except sqlite3.Error:
+            found, coords = False, None
+        if found:
+            self._count('acertos' if coords is not None else 'acertos_negativos')
+            return coords
+        self._count('faltas')
+        started = time.perf_counter()
+        try:
+            coords = resolver(address)
+        except Exception:
+            self._count('erros')
+            raise
+        finally:
+            self._count('consultas_externas')
+            self._count('latencia_externa_total', time.perf_counter() - started)
+        try:
+            self.put(address, coords, origem)
+        except sqlite3.Error:
+            pass
+        return coords
+
+    def purge_expired(self) -> int:
+        """Remove entradas vencidas; devolve quantas saíram"""
+        conn = self._conn()
+        cur = conn.execute("DELETE FROM geocode_cache WHERE expira_em <= ?", (self.clock(),))
+        conn.commit()
+        return cur.rowcount
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Acertos, faltas e latência média do geocoder externo (neste processo)"""
+        with self._lock:
+            stats = dict(self._stats)
+        total_latency = stats.pop('latencia_externa_total')
+        calls = stats['consultas_externas']
+        lookups = stats['acertos'] + stats['acertos_negativos'] + stats['faltas']
+        stats['taxa_acerto'] = round((lookups - stats['faltas']) / lookups, 4) if lookups else 0.0
+        stats['latencia_externa_media_ms'] = round(total_latency / calls * 1000, 2) if calls else 0.0
+        try:
+            stats['entradas'] = self._conn().execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+        except sqlite3.Error:
+            stats['entradas'] = None
+        return stats
+
+
+_shared: Optional[GeocodeCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_geocode_cache() -> GeocodeCache:
+    """Instância do processo, no arquivo de GEOCODE_CACHE_PATH"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = GeocodeCache()
+        return _shared
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Geocodificação
+Endereço da barbearia -> coordenadas. O cadastro e a edição de perfil
+resolvem na hora pelo gazetteer offline (backend/gazetteer.py) quando a base
+da região está instalada; nas faltas só enfileiram o pedido na outbox (mesma
+transação da escrita) e o worker resolve o endereço e grava latitude/longitude
+com retentativas.
+"""
+
+import json
+import logging
+import os
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+try:
+    from .outbox import EventHandler, enqueue_event
+    from .geocode_cache import get_geocode_cache
+    from .gazetteer import VIEWBOX, get_gazetteer
+    from .resilience import UPSTREAM_NOMINATIM, get_guard
+except ImportError:
+    from outbox import EventHandler, enqueue_event
+    from geocode_cache import get_geocode_cache
+    from gazetteer import VIEWBOX, get_gazetteer
+    from resilience import UPSTREAM_NOMINATIM, get_guard
+
+logger = logging.getLogger(__name__)
+
+EVENTO_GEOCODIFICAR = 'barbearia_geocodificar'
+
+# Valores de barbearias.geocode_status
+STATUS_PENDENTE = 'pendente'
+STATUS_OK = 'ok'
+STATUS_FALHOU = 'falhou'
+STATUS_SEM_ENDERECO = 'sem_endereco'
+
+ADDRESS_FIELDS = ('logradouro', 'numero', 'bairro', 'cidade', 'estado')
+# Campos lidos pelo gazetteer além do endereço montado
+LOOKUP_FIELDS = ADDRESS_FIELDS + ('cep',)
+
+NOMINATIM_USER_AGENT = os.environ.get('NOMINATIM_USER_AGENT', 'easycut_app/1.0')
+NOMINATIM_TIMEOUT = float(os.environ.get('NOMINATIM_TIMEOUT', 10))
+# Servidor do Nominatim; em testes de carga, o stand-in local (ex.: NOMINATIM_DOMAIN=127.0.0.1:8765, NOMINATIM_SCHEME=http)
+NOMINATIM_DOMAIN = os.environ.get('NOMINATIM_DOMAIN', 'nominatim.openstreetmap.org')
+NOMINATIM_SCHEME = os.environ.get('NOMINATIM_SCHEME', 'https')
+# Quantos resultados o Nominatim devolve por consulta de sugestão
+SUGGESTION_LIMIT = 10
+
+# Cidades atendidas; sugestões fora delas são descartadas
+REGION_TERMS = ('ipatinga', 'timoteo', 'coronel fabriciano', 'santana do paraiso', 'vale do aco', 'minas gerais')
+
+Coordinates = Tuple[float, float]
+
+
+def build_address(data: Mapping[str, Any]) -> str:
+    """
+    Monta o endereço usado na busca ('' quando não há nenhuma parte preenchida)
+
+    Args:
+        data (Mapping[str, Any]): Linha da barbearia ou corpo da requisição
+
+    Returns:
+        str: 'logradouro, número, bairro, cidade, estado, Brasil'
+    """
+    parts = [str(data.get(f)).strip() for f in ADDRESS_FIELDS if data.get(f) and str(data.get(f)).strip()]
+    return ", ".join(parts + ['Brasil']) if parts else ''
+
+
+_geolocator = None
+_geolocator_lock = threading.Lock()
+
+
+def _nominatim():
+    """Cliente Nominatim compartilhado pelo processo (criado na primeira chamada)"""
+    global _geolocator
+    with _geolocator_lock:
+        if _geolocator is None:
+            from geopy.geocoders import Nominatim
+            _geolocator = Nominatim(user_agent=NOMINATIM_USER_AGENT, timeout=NOMINATIM_TIMEOUT,
+                                    domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME)
+        return _geolocator
+
+
+def _nominatim_call(fn: Callable[[], Any]) -> Any:
+    """Chamada ao Nominatim sob a cota e o circuit breaker do processo (backend/resilience.py)"""
+    from geopy.exc import GeocoderQuotaExceeded
+    # HTTP 429/509: o Nominatim pediu para parar; conta como limitada (não como falha) e o circuito abre na hora
+    return get_guard(UPSTREAM_NOMINATIM).call(fn, throttled_error=lambda e: isinstance(e, GeocoderQuotaExceeded))
+
+
+def nominatim_geocode(address: str) -> Optional[Coordinates]:
+    """
+    Consulta o Nominatim
+
+    Returns:
+        Optional[Coordinates]: (lat, lng), ou None se o endereço não foi encontrado
+
+    Raises:
+        geopy.exc.GeocoderServiceError: Falha de rede, timeout ou limite (o job é reagendado)
+        UpstreamUnavailable: Cota local esgotada ou circuito aberto (idem)
+    """
+    location = _nominatim_call(lambda: _nominatim().geocode(address))
+    if location is None:
+        return None
+    return float(location.latitude), float(location.longitude)
+
+
+def in_region_text(text: str) -> bool:
+    """O endereço (texto livre) cita uma das cidades do Vale do Aço?"""
+    plain = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode('ascii').lower()
+    return any(term in plain for term in REGION_TERMS)
+
+
+def _format_suggestion(raw: Mapping[str, Any]) -> str:
+    """'Rua, número, bairro, cidade - estado' a partir do addressdetails do Nominatim"""
+    address = raw.get('address') or {}
+    street = address.get('road') or address.get('pedestrian') or address.get('footway')
+    text = ''
+    if street:
+        text = f"{street}, {address['house_number']}" if address.get('house_number') else street
+    for part in (address.get('suburb') or address.get('neighbourhood') or address.get('quarter'),
+                 address.get('city') or address.get('town') or address.get('village')):
+        if part:
+            text = f"{text}, {part}" if text else part
+    if address.get('state'):
+        text = f"{text} - {address['state']}" if text else address['state']
+    return text or raw.get('display_name', '')
+
+
+def nominatim_suggestions(query: str) -> Tuple[List[str], bool]:
+    """
+    Sugestões de endereço do Nominatim restritas ao viewbox do Vale do Aço
+
+    Args:
+        query (str): Texto digitado
+
+    Returns:
+        Tuple[List[str], bool]: (endereços formatados, o Nominatim devolveu menos que o limite)
+    """
+    lng_min, lat_min, lng_max, lat_max = VIEWBOX
+    locations = _nominatim_call(lambda: _nominatim().geocode(
+        f"{query}, Vale do Aço, Minas Gerais, Brasil", exactly_one=False, limit=SUGGESTION_LIMIT,
+        addressdetails=True, country_codes='br', viewbox=[(lat_max, lng_min), (lat_min, lng_max)],
+        bounded=True)) or []
+    suggestions = []
+    for location in locations:
+        text = _format_suggestion(location.raw)
+        if in_region_text(location.raw.get('display_name', '')) and text and text not in suggestions:
+            suggestions.append(text)
+    return suggestions, len(locations) < SUGGESTION_LIMIT
+
+
+def cached_geocode(address: str) -> Optional[Coordinates]:
+    """Nominatim atrás do cache persistente (backend/geocode_cache.py)"""
+    return get_geocode_cache().lookup(address, nominatim_geocode, origem='nominatim')
+
+
+def offline_geocode(data: Mapping[str, Any]) -> Optional[Coordinates]:
+    """Gazetteer local (mmap, microssegundos); None numa falta"""
+    try:
+        return get_gazetteer().lookup(data)
+    except (OSError, ValueError) as e:
+        logger.warning(f"[GEOCODE] Gazetteer indisponível: {e}")
+        return None
+
+
+def geocode_address(data: Mapping[str, Any],
+                    geocoder: Callable[[str], Optional[Coordinates]] = cached_geocode) -> Optional[Coordinates]:
+    """
+    Geocodifica o endereço de uma barbearia: gazetteer offline e, na falta, o geocoder externo
+
+    Args:
+        data (Mapping[str, Any]): Campos de endereço (ver LOOKUP_FIELDS)
+        geocoder (Callable): Função endereço -> (lat, lng)
+
+    Returns:
+        Optional[Coordinates]: Coordenadas, ou None sem endereço / não encontrado
+    """
+    address = build_address(data)
+    if not address:
+        return None
+    return offline_geocode(data) or geocoder(address)
+
+
+def _bump_profile(cursor, barbearia_id: int) -> None:
+    """Invalida o ETag do perfil (GET condicional dos detalhes)"""
+    cursor.execute("""INSERT INTO recurso_versoes (escopo, escopo_id, recurso, versao)
+                      VALUES ('barbearia', %s, 'perfil', 1)
+                      ON DUPLICATE KEY UPDATE versao = versao + 1""", (barbearia_id,))
+
+
+def store_coordinates(cursor, barbearia_id: int, coords: Coordinates) -> None:
+    """Grava as coordenadas resolvidas e invalida o ETag do perfil"""
+    cursor.execute("""UPDATE barbearias SET latitude = %s, longitude = %s, geocode_status = %s
+                      WHERE id = %s""", (coords[0], coords[1], STATUS_OK, barbearia_id))
+    _bump_profile(cursor, barbearia_id)
+
+
+def clear_coordinates(cursor, barbearia_id: int) -> None:
+    """Endereço apagado: as coordenadas antigas não valem mais (a barbearia sai da busca por proximidade)"""
+    cursor.execute("""UPDATE barbearias SET latitude = NULL, longitude = NULL, geocode_status = %s
+                      WHERE id = %s""", (STATUS_SEM_ENDERECO, barbearia_id))
+
+
+def set_geocode_status(cursor, barbearia_id: int, status: str) -> None:
+    cursor.execute("UPDATE barbearias SET geocode_status = %s WHERE id = %s", (status, barbearia_id))
+
+
+def request_geocode(cursor, barbearia_id: int, data: Mapping[str, Any]) -> str:
+    """
+    Resolve pelo gazetteer offline ou marca a barbearia como pendente e enfileira
+    a geocodificação, na transação da escrita
+
+    Enquanto pendente, latitude/longitude continuam as do endereço anterior; a
+    busca por proximidade (find_nearby_barbearias em app.py) ignora barbearias
+    pendentes até o worker gravar as novas coordenadas.
+
+    Args:
+        cursor: Cursor da conexão que fará o commit do cadastro/edição
+        barbearia_id (int): ID da barbearia
+        data (Mapping[str, Any]): Endereço já mesclado (linha + alterações)
+
+    Returns:
+        str: Novo geocode_status ('ok', 'pendente' ou 'sem_endereco')
+    """
+    address = build_address(data)
+    coords = offline_geocode(data) if address else None
+    if coords is not None:
+        cursor.execute("""UPDATE barbearias SET latitude = %s, longitude = %s, geocode_status = %s
+                          WHERE id = %s""", (coords[0], coords[1], STATUS_OK, barbearia_id))
+        return STATUS_OK
+    if not address:
+        clear_coordinates(cursor, barbearia_id)
+        return STATUS_SEM_ENDERECO
+    set_geocode_status(cursor, barbearia_id, STATUS_PENDENTE)
+    enqueue_event(cursor, EVENTO_GEOCODIFICAR, barbearia_id, {'endereco': address})
+    return STATUS_PENDENTE
+
+
+class GeocodeHandler(EventHandler):
+    """
+    Job 'barbearia_geocodificar' do worker da outbox
+
+    O endereço é lido numa transação curta, geocodificado sem transação
+    aberta e gravado numa segunda transação, que relê a linha: se o endereço
+    mudou nesse meio tempo (ou já era outro no pedido), o resultado é
+    descartado, pois a edição posterior enfileirou outro. Erros do geocoder
+    sobem para o worker, que reagenda com backoff.
+    """
+
+    def __init__(self, geocoder: Callable[[str], Optional[Coordinates]] = cached_geocode):
+        self.geocoder = geocoder
+
+    def _load(self, cursor, barbearia_id: int, lock: bool = False) -> Optional[Dict[str, Any]]:
+        cursor.execute(f"SELECT id, {', '.join(LOOKUP_FIELDS)} FROM barbearias WHERE id = %s"
+                       f"{' FOR UPDATE' if lock else ''}", (barbearia_id,))
+        return cursor.fetchone()
+
+    def prepare(self, cursor, evento: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._load(cursor, evento['agregado_id'])
+
+    def resolve(self, evento: Dict[str, Any], row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Geocodifica fora de transação
+
+        Returns:
+            Optional[Dict[str, Any]]: {'endereco', 'status', 'coords'}, ou None se não há o que gravar
+        """
+        if not row:
+            return None
+        address = build_address(row)
+        if not address:
+            return {'endereco': '', 'status': STATUS_SEM_ENDERECO, 'coords': None}
+        if address != _payload(evento).get('endereco', address):
+            logger.info(f"[GEOCODE] Barbearia {evento['agregado_id']}: endereço alterado, pedido antigo ignorado")
+            return None
+        coords = geocode_address(row, self.geocoder)
+        return {'endereco': address, 'status': STATUS_OK if coords else STATUS_FALHOU, 'coords': coords}
+
+    def handle(self, cursor, evento: Dict[str, Any], resolved: Optional[Dict[str, Any]] = None) -> None:
+        if resolved is None:
+            return
+        barbearia_id = evento['agregado_id']
+        row = self._load(cursor, barbearia_id, lock=True)
+        if not row or build_address(row) != resolved['endereco']:
+            logger.info(f"[GEOCODE] Barbearia {barbearia_id}: endereço alterado durante a geocodificação")
+            return
+        if resolved['status'] == STATUS_OK:
+            store_coordinates(cursor, barbearia_id, resolved['coords'])
+        elif resolved['status'] == STATUS_SEM_ENDERECO:
+            clear_coordinates(cursor, barbearia_id)
+            _bump_profile(cursor, barbearia_id)
+        else:
+            set_geocode_status(cursor, barbearia_id, STATUS_FALHOU)
+            logger.warning(f"[GEOCODE] Barbearia {barbearia_id}: endereço não encontrado ({resolved['endereco']})")
+
+    def give_up(self, cursor, evento: Dict[str, Any], error: Exception) -> None:
+        cursor.execute("UPDATE barbearias SET geocode_status = %s WHERE id = %s AND geocode_status = %s",
+                       (STATUS_FALHOU, evento['agregado_id'], STATUS_PENDENTE))
+
+
+def _payload(evento: Dict[str, Any]) -> Dict[str, Any]:
+    payload = evento.get('payload')
+    if isinstance(payload, (bytes, str)):
+        try:
+            return json.loads(payload or '{}')
+        except ValueError:
+            return {}
+    return payload or {}
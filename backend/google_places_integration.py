@@ -6,11 +6,56 @@ Integração com Google Places para sugestões de endereços e geocoding
 """
 
 import requests
+import copy
 import json
-from typing import Dict, List, Any, Optional
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import os
 from dataclasses import dataclass
 
+try:
+    from .geocode_cache import get_geocode_cache
+    from .cache_utils import TTLCache, SingleFlight, normalize_query
+    from .resilience import UPSTREAM_GOOGLE, UpstreamUnavailable, get_guard
+except ImportError:
+    from geocode_cache import get_geocode_cache
+    from cache_utils import TTLCache, SingleFlight, normalize_query
+    from resilience import UPSTREAM_GOOGLE, UpstreamUnavailable, get_guard
+
+# Raiz da API; em testes de carga aponta para o stand-in local (python -m backend.geo_standin)
+BASE_URL = os.environ.get('GOOGLE_PLACES_BASE_URL', 'https://maps.googleapis.com/maps/api')
+
+# Validade (s) das respostas em cache por endpoint; detalhes de um place_id mudam raramente
+RESPONSE_TTLS = {
+    'place/autocomplete': 6 * 3600,
+    'place/details': 7 * 86400,
+    'geocode': 86400,
+    'place/nearbysearch': 15 * 60,
+}
+# ZERO_RESULTS também é guardado, por menos tempo
+ZERO_RESULTS_TTL = 10 * 60
+# Status que não dependem do momento (erros como OVER_QUERY_LIMIT não entram no cache)
+CACHEABLE_STATUSES = ('OK', 'ZERO_RESULTS')
+# Parâmetros de texto livre comparados sem acento/caixa/espaços extras
+_TEXT_PARAMS = ('input', 'address')
+# Coordenadas arredondadas na chave (~1 m), para que floats quase iguais não gerem chaves diferentes
+_COORD_PARAMS = ('location', 'latlng')
+
+# Tipos consultados na busca de barbearias próximas (em paralelo)
+NEARBY_TYPES = ('beauty_salon', 'hair_care', 'establishment')
+# Nearby Search devolve 20 por página e no máximo 3 páginas (60 resultados)
+NEARBY_MAX_PAGES = 3
+# O next_page_token só fica válido alguns segundos depois de emitido
+PAGE_TOKEN_DELAY = 2.0
+PAGE_TOKEN_ATTEMPTS = 3
+# Intervalo em que as buscas por tipo e o consumidor conferem se a busca foi encerrada
+QUEUE_POLL_SECONDS = 0.1
+# Conexões HTTP mantidas por host; cobre as threads da busca em paralelo
+HTTP_POOL_SIZE = 10
+
 @dataclass
 class PlaceResult:
     """Resultado de uma busca de local"""
@@ -27,10 +72,68 @@ class GooglePlacesAPI:
     Classe para integração com Google Places API
     """
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache_size: int = 2048, base_url: Optional[str] = None):
         self.api_key = api_key
-        self.base_url = "https://maps.googleapis.com/maps/api"
+        self.base_url = (base_url or BASE_URL).rstrip('/')
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.page_token_delay = PAGE_TOKEN_DELAY
+        self.cache = TTLCache(max_entries=cache_size)
+        self.flight = SingleFlight()
+        # Cota e circuit breaker compartilhados por todas as instâncias do processo
+        self.guard = get_guard(UPSTREAM_GOOGLE)
+    
+    @staticmethod
+    def _cache_key(endpoint: str, params: Dict[str, Any]) -> Tuple:
+        """Chave do cache: endpoint + parâmetros normalizados, sem a API key"""
+        items = []
+        for name, value in params.items():
+            if name == 'key':
+                continue
+            if name in _TEXT_PARAMS:
+                value = normalize_query(value)
+            elif name in _COORD_PARAMS:
+                value = ','.join(f"{float(v):.5f}" for v in str(value).split(','))
+            items.append((name, str(value)))
+        return (endpoint, tuple(sorted(items)))
+    
+    def _get_json(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        GET em {base_url}/{endpoint}/json com cache TTL+LRU e coalescência
+        
+        Chamadas iguais simultâneas compartilham uma única requisição; respostas
+        OK/ZERO_RESULTS ficam em cache pelo tempo de RESPONSE_TTLS.
+        
+        Args:
+            endpoint (str): Caminho da API (ex.: 'place/details')
+            params (Dict[str, Any]): Parâmetros da consulta (com a key)
+            
+        Returns:
+            Dict[str, Any]: Corpo JSON (cópia própria do chamador)
+            
+        Raises:
+            requests.RequestException: Falha de rede/HTTP
+            UpstreamUnavailable: Cota local esgotada ou circuito aberto
+        """
+        key = self._cache_key(endpoint, params)
+        found, data = self.cache.get(key)
+        if not found:
+            data = self.flight.do(key, lambda: self._fetch(endpoint, params, key))
+        return copy.deepcopy(data)
+    
+    def _fetch(self, endpoint: str, params: Dict[str, Any], key: Tuple) -> Dict[str, Any]:
+        def request() -> Dict[str, Any]:
+            response = self.session.get(f"{self.base_url}/{endpoint}/json", params=params, timeout=10)
+            response.raise_for_status()
+            return response.json()
+        
+        data = self.guard.call(request, throttled=lambda d: d.get('status') == 'OVER_QUERY_LIMIT')
+        status = data.get('status')
+        if status in CACHEABLE_STATUSES:
+            self.cache.set(key, data, RESPONSE_TTLS[endpoint] if status == 'OK' else ZERO_RESULTS_TTL)
+        return data
     
     def get_place_autocomplete(self, query: str, location: Optional[Dict[str, float]] = None, radius: int = 50000) -> List[Dict[str, Any]]:
         """
@@ -44,8 +147,6 @@ class GooglePlacesAPI:
         Returns:
             List[Dict[str, Any]]: Lista de sugestões
         """
-        url = f"{self.base_url}/place/autocomplete/json"
-        
         params = {
             'input': query,
             'key': self.api_key,
@@ -58,10 +159,7 @@ class GooglePlacesAPI:
             params['radius'] = radius
         
         try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._get_json('place/autocomplete', params)
             
             if data['status'] != 'OK':
                 print(f"Erro na API: {data['status']} - {data.get('error_message', 'Erro desconhecido')}")
@@ -75,6 +173,9 @@ class GooglePlacesAPI:
         except json.JSONDecodeError as e:
             print(f"Erro ao decodificar JSON: {e}")
             return []
+        except UpstreamUnavailable as e:
+            print(f"Google Places indisponível: {e}")
+            return []
     
     def get_place_details(self, place_id: str) -> Optional[PlaceResult]:
         """
@@ -86,8 +187,6 @@ class GooglePlacesAPI:
         Returns:
             Optional[PlaceResult]: Detalhes do local
         """
-        url = f"{self.base_url}/place/details/json"
-        
         params = {
             'place_id': place_id,
             'key': self.api_key,
@@ -96,10 +195,7 @@ class GooglePlacesAPI:
         }
         
         try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._get_json('place/details', params)
             
             if data['status'] != 'OK':
                 print(f"Erro na API: {data['status']} - {data.get('error_message', 'Erro desconhecido')}")
@@ -123,6 +219,9 @@ class GooglePlacesAPI:
         except json.JSONDecodeError as e:
             print(f"Erro ao decodificar JSON: {e}")
             return None
+        except UpstreamUnavailable as e:
+            print(f"Google Places indisponível: {e}")
+            return None
     
     def geocode_address(self, address: str) -> Optional[Dict[str, Any]]:
         """
@@ -134,37 +233,11 @@ class GooglePlacesAPI:
         Returns:
             Optional[Dict[str, Any]]: Coordenadas e detalhes
         """
-        url = f"{self.base_url}/geocode/json"
-        
-        params = {
-            'address': address,
-            'key': self.api_key,
-            'language': 'pt-BR',
-            'region': 'br'
-        }
-        
         try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if data['status'] != 'OK':
-                print(f"Erro na API: {data['status']} - {data.get('error_message', 'Erro desconhecido')}")
+            status, result = self.geocode_with_status(address)
+            if status != 'OK':
                 return None
-            
-            results = data.get('results', [])
-            if not results:
-                return None
-            
-            result = results[0]
-            
-            return {
-                'formatted_address': result['formatted_address'],
-                'geometry': result['geometry'],
-                'place_id': result['place_id'],
-                'types': result.get('types', [])
-            }
+            return result
             
         except requests.RequestException as e:
             print(f"Erro na requisição: {e}")
@@ -172,6 +245,49 @@ class GooglePlacesAPI:
         except json.JSONDecodeError as e:
             print(f"Erro ao decodificar JSON: {e}")
             return None
+        except UpstreamUnavailable as e:
+            print(f"Google Places indisponível: {e}")
+            return None
+    
+    def geocode_with_status(self, address: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Geocodificação que preserva o status da API (distingue ZERO_RESULTS de falha)
+        
+        Args:
+            address (str): Endereço para geocodificar
+            
+        Returns:
+            Tuple[str, Optional[Dict[str, Any]]]: (status, resultado quando 'OK')
+            
+        Raises:
+            requests.RequestException: Falha de rede/HTTP
+            UpstreamUnavailable: Cota local esgotada ou circuito aberto
+        """
+        params = {
+            'address': address,
+            'key': self.api_key,
+            'language': 'pt-BR',
+            'region': 'br'
+        }
+        
+        data = self._get_json('geocode', params)
+        
+        if data['status'] != 'OK':
+            print(f"Erro na API: {data['status']} - {data.get('error_message', 'Erro desconhecido')}")
+            return data['status'], None
+        
+        results = data.get('results', [])
+        if not results:
+            return 'ZERO_RESULTS', None
+        
+        result = results[0]
+        
+        return 'OK', {
+            'formatted_address': result['formatted_address'],
+            'geometry': result['geometry'],
+            'place_id': result['place_id'],
+            'types': result.get('types', [])
+        }
     
     def reverse_geocode(self, lat: float, lng: float) -> Optional[Dict[str, Any]]:
         """
@@ -184,8 +300,6 @@ class GooglePlacesAPI:
         Returns:
             Optional[Dict[str, Any]]: Endereço e detalhes
         """
-        url = f"{self.base_url}/geocode/json"
-        
         params = {
             'latlng': f"{lat},{lng}",
             'key': self.api_key,
@@ -193,10 +307,7 @@ class GooglePlacesAPI:
         }
         
         try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._get_json('geocode', params)
             
             if data['status'] != 'OK':
                 print(f"Erro na API: {data['status']} - {data.get('error_message', 'Erro desconhecido')}")
@@ -221,6 +332,9 @@ class GooglePlacesAPI:
         except json.JSONDecodeError as e:
             print(f"Erro ao decodificar JSON: {e}")
             return None
+        except UpstreamUnavailable as e:
+            print(f"Google Places indisponível: {e}")
+            return None
     
     def search_nearby_places(self, lat: float, lng: float, radius: int = 5000, place_type: str = "beauty_salon") -> List[Dict[str, Any]]:
         """
@@ -235,8 +349,28 @@ class GooglePlacesAPI:
         Returns:
             List[Dict[str, Any]]: Lista de locais próximos
         """
-        url = f"{self.base_url}/place/nearbysearch/json"
+        return next(self.iter_nearby_pages(lat, lng, radius, place_type, max_pages=1), [])
+    
+    def iter_nearby_pages(self, lat: float, lng: float, radius: int = 5000, place_type: str = "beauty_salon",
+                          max_pages: int = NEARBY_MAX_PAGES,
+                          stop: Optional[threading.Event] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Páginas da Nearby Search, seguindo o next_page_token sob demanda
         
+        A página seguinte só é pedida quando o consumidor avança o gerador
+        (e não é pedida se `stop` estiver marcado).
+        
+        Args:
+            lat (float): Latitude
+            lng (float): Longitude
+            radius (int): Raio em metros
+            place_type (str): Tipo de local
+            max_pages (int): Limite de páginas
+            stop (threading.Event, optional): Interrompe a paginação
+            
+        Yields:
+            List[Dict[str, Any]]: Resultados de cada página
+        """
         # API do Google Places limita radius a 50000 metros (50km)
         # Se o usuário pedir mais (ex: 100km), limitamos ao máximo permitido pela API para não gerar erro
         safe_radius = min(radius, 50000)
@@ -249,24 +383,44 @@ class GooglePlacesAPI:
             'language': 'pt-BR'
         }
         
-        try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+        for page in range(max_pages):
+            try:
+                data = self._get_json('place/nearbysearch', params) if page == 0 else self._get_next_page(params, stop)
+            except requests.RequestException as e:
+                print(f"Erro na requisição: {e}")
+                return
+            except json.JSONDecodeError as e:
+                print(f"Erro ao decodificar JSON: {e}")
+                return
+            except UpstreamUnavailable as e:
+                print(f"Google Places indisponível: {e}")
+                return
+            if data is None:
+                return
             
             if data['status'] != 'OK':
-                print(f"Erro na API: {data['status']} - {data.get('error_message', 'Erro desconhecido')}")
-                return []
+                if data['status'] != 'ZERO_RESULTS':
+                    print(f"Erro na API: {data['status']} - {data.get('error_message', 'Erro desconhecido')}")
+                return
             
-            return data.get('results', [])
+            yield data.get('results', [])
             
-        except requests.RequestException as e:
-            print(f"Erro na requisição: {e}")
-            return []
-        except json.JSONDecodeError as e:
-            print(f"Erro ao decodificar JSON: {e}")
-            return []
+            token = data.get('next_page_token')
+            if not token or (stop is not None and stop.is_set()):
+                return
+            params = {'pagetoken': token, 'key': self.api_key}
+    
+    def _get_next_page(self, params: Dict[str, Any], stop: Optional[threading.Event]) -> Optional[Dict[str, Any]]:
+        """Pede a página do token, esperando ele ficar válido (INVALID_REQUEST enquanto não fica)"""
+        wait = stop.wait if stop is not None else threading.Event().wait
+        data = None
+        for _ in range(PAGE_TOKEN_ATTEMPTS):
+            if wait(self.page_token_delay):
+                return None
+            data = self._get_json('place/nearbysearch', params)
+            if data['status'] != 'INVALID_REQUEST':
+                break
+        return data
 
 
 class PlacesService:
@@ -280,6 +434,8 @@ class PlacesService:
             raise ValueError("API Key do Google Places é obrigatória")
         
         self.places_api = GooglePlacesAPI(self.api_key)
+        # Pool limitado para as buscas por tipo; as threads compartilham as conexões da sessão
+        self.executor = ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix='places')
     
     def get_address_suggestions(self, query: str, user_location: Optional[Dict[str, float]] = None) -> List[str]:
         """
@@ -313,16 +469,28 @@ class PlacesService:
         Returns:
             Optional[Dict[str, float]]: Coordenadas {lat, lng}
         """
-        result = self.places_api.geocode_address(address)
-        if not result:
+        try:
+            coords = get_geocode_cache().lookup(address, self._resolve_coordinates, origem='google')
+        except Exception as e:
+            print(f"Erro ao geocodificar: {e}")
+            return None
+        if coords is None:
             return None
-        
-        location = result['geometry']['location']
         return {
-            'lat': location['lat'],
-            'lng': location['lng']
+            'lat': coords[0],
+            'lng': coords[1]
         }
     
+    def _resolve_coordinates(self, address: str) -> Optional[Tuple[float, float]]:
+        """Consulta a API; só ZERO_RESULTS vira cache negativo, os demais status levantam erro"""
+        status, result = self.places_api.geocode_with_status(address)
+        if status == 'ZERO_RESULTS':
+            return None
+        if status != 'OK':
+            raise RuntimeError(f"Geocoding indisponível: {status}")
+        location = result['geometry']['location']
+        return location['lat'], location['lng']
+    
     def get_address_from_coordinates(self, lat: float, lng: float) -> Optional[str]:
         """
         Converte coordenadas em endereço
@@ -352,22 +520,76 @@ class PlacesService:
         Returns:
             List[Dict[str, Any]]: Lista de barbearias
         """
-        # Buscar diferentes tipos de estabelecimentos relacionados
-        types_to_search = ['beauty_salon', 'hair_care', 'establishment']
-        all_results = []
-        
-        for place_type in types_to_search:
-            results = self.places_api.search_nearby_places(lat, lng, radius, place_type)
-            all_results.extend(results)
-        
-        # Remover duplicatas por place_id
-        unique_results = {}
-        for result in all_results:
-            place_id = result['place_id']
-            if place_id not in unique_results:
-                unique_results[place_id] = result
-        
-        return list(unique_results.values())
+        return list(self.iter_nearby_barbearias(lat, lng, radius))
+    
+    def iter_nearby_barbearias(self, lat: float, lng: float, radius: int = 5000,
+                               max_pages: int = NEARBY_MAX_PAGES,
+                               stop: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Barbearias próximas à medida que as páginas chegam, sem repetir place_id
+        
+        Os tipos de NEARBY_TYPES são buscados em paralelo, então a latência é a
+        da busca mais lenta e não a soma. A fila entre as buscas e o consumidor é
+        limitada: quem não é consumido espera em vez de continuar paginando, e
+        fechar o gerador (ou marcar `stop`) faz as buscas pararem antes de pedir
+        a página seguinte.
+        
+        Args:
+            lat (float): Latitude
+            lng (float): Longitude
+            radius (int): Raio em metros
+            max_pages (int): Limite de páginas por tipo
+            stop (threading.Event, optional): Encerra o gerador mesmo sem página nova
+            
+        Yields:
+            Dict[str, Any]: Resultado da Nearby Search
+        """
+        pages: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(maxsize=len(NEARBY_TYPES))
+        halt = threading.Event()
+        
+        def offer(page: Optional[List[Dict[str, Any]]]) -> bool:
+            while not halt.is_set():
+                try:
+                    pages.put(page, timeout=QUEUE_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def search(place_type: str) -> None:
+            try:
+                for page in self.places_api.iter_nearby_pages(lat, lng, radius, place_type, max_pages, halt):
+                    if not offer(page):
+                        return
+            except Exception as e:
+                print(f"Erro na busca por '{place_type}': {e}")
+            finally:
+                offer(None)
+        
+        for place_type in NEARBY_TYPES:
+            self.executor.submit(search, place_type)
+        
+        pending = len(NEARBY_TYPES)
+        seen = set()
+        try:
+            while pending:
+                if stop is not None and stop.is_set():
+                    return
+                try:
+                    page = pages.get(timeout=QUEUE_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                if page is None:
+                    pending -= 1
+                    continue
+                for result in page:
+                    place_id = result.get('place_id')
+                    if place_id in seen:
+                        continue
+                    seen.add(place_id)
+                    yield result
+        finally:
+            halt.set()
 
 
 # Exemplo de uso
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Cache HTTP Condicional
+ETags derivadas de tokens de versão dos recursos, comparação com
+If-None-Match e contadores de acerto (304) por rota.
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Gera uma ETag forte a partir das partes do token de versão
+
+    Returns:
+        str: ETag já entre aspas, pronta para o cabeçalho
+    """
+    raw = "|".join(str(p) for p in parts)
+    return '"' + hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Verifica se o cabeçalho If-None-Match contém a ETag (comparação fraca, RFC 9110)
+
+    Args:
+        if_none_match (str, optional): Valor bruto do cabeçalho
+        etag (str): ETag atual do recurso
+
+    Returns:
+        bool: True se o cliente já possui a versão atual
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    wanted = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+class EtagStats:
+    """Contadores de respostas 304 (acertos) e 200 (faltas) por rota"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, route: str, hit: bool) -> None:
+        with self._lock:
+            c = self._counts.setdefault(route, {'hits': 0, 'misses': 0})
+            c['hits' if hit else 'misses'] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            out = {}
+            for route, c in self._counts.items():
+                total = c['hits'] + c['misses']
+                out[route] = {**c, 'hit_ratio': round(c['hits'] / total, 4) if total else 0.0}
+            return out
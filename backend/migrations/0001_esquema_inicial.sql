@@ -0,0 +1,128 @@
+-- Esquema base do EasyCut (antes criado diretamente em init_db)
+
+CREATE TABLE IF NOT EXISTS clientes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nome_completo VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    telefone VARCHAR(20),
+    senha_hash VARCHAR(255) NOT NULL,
+    foto_perfil VARCHAR(255),
+    termos_aceitos TINYINT(1) DEFAULT 1,
+    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS barbearias (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nome_barbearia VARCHAR(255) NOT NULL,
+    cnpj_cpf VARCHAR(20) NOT NULL UNIQUE,
+    nome_responsavel VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    whatsapp VARCHAR(20) NOT NULL,
+    senha_hash VARCHAR(255) NOT NULL,
+    termos_aceitos TINYINT(1) DEFAULT 1,
+    foto_perfil LONGTEXT,
+    telefone_fixo VARCHAR(20),
+    instagram VARCHAR(255),
+    facebook VARCHAR(255),
+    website VARCHAR(255),
+    descricao TEXT,
+    cep VARCHAR(10),
+    logradouro VARCHAR(255),
+    numero VARCHAR(20),
+    complemento VARCHAR(255),
+    bairro VARCHAR(100),
+    cidade VARCHAR(100),
+    estado VARCHAR(2),
+    ponto_referencia VARCHAR(255),
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    quantidade_barbeiros INT DEFAULT 1,
+    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS servicos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    barbearia_id INT NOT NULL,
+    nome_servico VARCHAR(255) NOT NULL,
+    preco DECIMAL(10, 2),
+    duracao_minutos INT,
+    categoria VARCHAR(100),
+    descricao TEXT,
+    status VARCHAR(50) DEFAULT 'ativo',
+    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id)
+);
+
+CREATE TABLE IF NOT EXISTS agendamentos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    cliente_id INT NOT NULL,
+    barbearia_id INT NOT NULL,
+    servico_id INT NOT NULL,
+    data_agendamento DATE NOT NULL,
+    horario_inicio TIME NOT NULL,
+    status VARCHAR(50) DEFAULT 'pendente',
+    valor_total DECIMAL(10, 2),
+    observacoes TEXT,
+    avaliacao_nota DECIMAL(2, 1),
+    avaliacao_comentario TEXT,
+    resposta_barbearia TEXT,
+    data_resposta TIMESTAMP NULL,
+    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id),
+    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id),
+    FOREIGN KEY (servico_id) REFERENCES servicos(id)
+);
+
+CREATE TABLE IF NOT EXISTS horarios_status (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    barbearia_id INT NOT NULL,
+    dia_semana VARCHAR(20) NOT NULL,
+    status VARCHAR(10) DEFAULT 'open',
+    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_status_dia (barbearia_id, dia_semana)
+);
+
+CREATE TABLE IF NOT EXISTS horarios_slots (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    barbearia_id INT NOT NULL,
+    dia_semana VARCHAR(20) NOT NULL,
+    inicio TIME NOT NULL,
+    fim TIME NOT NULL,
+    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS barbearia_fotos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    barbearia_id INT NOT NULL,
+    foto LONGTEXT NOT NULL,
+    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS cliente_favoritos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    cliente_id INT NOT NULL,
+    barbearia_id INT NOT NULL,
+    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_cliente_barbearia (cliente_id, barbearia_id),
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE,
+    FOREIGN KEY (barbearia_id) REFERENCES barbearias(id) ON DELETE CASCADE
+);
+
+-- Outbox transacional (backend/outbox.py)
+CREATE TABLE IF NOT EXISTS outbox_eventos (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo_evento VARCHAR(50) NOT NULL,
+    agregado_id INT NOT NULL,
+    payload TEXT,
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    tentativas INT NOT NULL DEFAULT 0,
+    disponivel_em DATETIME NOT NULL,
+    processado_em DATETIME NULL,
+    ultimo_erro TEXT,
+    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_outbox_fila (status, disponivel_em, id),
+    INDEX idx_outbox_processado (status, processado_em),
+    INDEX idx_outbox_agregado (agregado_id, tipo_evento)
+);
@@ -0,0 +1,6 @@
+-- Ajustes que init_db aplicava com try/except. Em bancos antigos a coluna
+-- já existe (erro 1060), o que o runner trata como migração já aplicada.
+
+ALTER TABLE clientes MODIFY COLUMN foto_perfil LONGTEXT NULL;
+
+ALTER TABLE agendamentos ADD COLUMN duracao_total INT DEFAULT 30 AFTER horario_inicio;
@@ -0,0 +1,6 @@
+-- Paginação por chave das listas de agendamentos (data_agendamento, horario_inicio, id).
+-- O índice do cliente também atende filtros por (cliente_id, data_agendamento).
+
+CREATE INDEX idx_agendamentos_cliente_agenda ON agendamentos (cliente_id, data_agendamento, horario_inicio, id);
+
+CREATE INDEX idx_agendamentos_barbearia_agenda ON agendamentos (barbearia_id, data_agendamento, horario_inicio, id);
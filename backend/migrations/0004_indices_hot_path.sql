@@ -0,0 +1,8 @@
+-- Índices das consultas quentes: disponibilidade, serviços ativos e faixas de horário.
+-- agendamentos(cliente_id, data_agendamento) é prefixo de idx_agendamentos_cliente_agenda (0003).
+
+CREATE INDEX idx_agendamentos_barbearia_data_status ON agendamentos (barbearia_id, data_agendamento, status);
+
+CREATE INDEX idx_servicos_barbearia_status ON servicos (barbearia_id, status);
+
+CREATE INDEX idx_horarios_slots_barbearia_dia ON horarios_slots (barbearia_id, dia_semana);
@@ -0,0 +1,23 @@
+-- Sincronização incremental (delta) das listas de agendamentos.
+-- atualizado_em tem precisão de microssegundos para servir de cursor.
+
+ALTER TABLE agendamentos ADD COLUMN atualizado_em TIMESTAMP(6) NOT NULL
+    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+UPDATE agendamentos SET atualizado_em = criado_em WHERE criado_em IS NOT NULL;
+
+CREATE INDEX idx_agendamentos_barbearia_sync ON agendamentos (barbearia_id, atualizado_em, id);
+
+CREATE INDEX idx_agendamentos_cliente_sync ON agendamentos (cliente_id, atualizado_em, id);
+
+-- Lápides: agendamentos removidos da tabela principal (ver backend/agenda_sync.py)
+CREATE TABLE IF NOT EXISTS agendamentos_removidos (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    agendamento_id INT NOT NULL,
+    barbearia_id INT NOT NULL,
+    cliente_id INT NOT NULL,
+    motivo VARCHAR(20) NOT NULL DEFAULT 'removido',
+    removido_em TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_removidos_barbearia (barbearia_id, id),
+    INDEX idx_removidos_cliente (cliente_id, id)
+);
@@ -0,0 +1,13 @@
+-- Contadores de versão dos recursos de leitura frequente (ETag / GET condicional).
+-- escopo/escopo_id identificam o dono (ex.: 'barbearia', 7) e recurso a parte
+-- versionada ('perfil', 'servicos', 'horarios', 'avaliacoes', 'favoritos').
+-- Cada escrita incrementa a versão na mesma transação (ver _bump_version em app.py).
+
+CREATE TABLE IF NOT EXISTS recurso_versoes (
+    escopo VARCHAR(20) NOT NULL,
+    escopo_id INT NOT NULL,
+    recurso VARCHAR(30) NOT NULL,
+    versao BIGINT NOT NULL DEFAULT 1,
+    atualizado_em TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    PRIMARY KEY (escopo, escopo_id, recurso)
+);
@@ -0,0 +1,29 @@
+-- Rollup diário de métricas por barbearia, dia e serviço (ver backend/rollups.py).
+-- Mantido incrementalmente pelas escritas de agendamentos; reconstruível com
+-- python -m backend.rollups --rebuild
+
+CREATE TABLE IF NOT EXISTS metricas_diarias (
+    barbearia_id INT NOT NULL,
+    dia DATE NOT NULL,
+    servico_id INT NOT NULL,
+    qtd_total INT NOT NULL DEFAULT 0,
+    qtd_pendente INT NOT NULL DEFAULT 0,
+    qtd_confirmado INT NOT NULL DEFAULT 0,
+    qtd_cancelado INT NOT NULL DEFAULT 0,
+    qtd_concluido INT NOT NULL DEFAULT 0,
+    receita DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    -- Notas podem ser fracionárias (avaliacao_nota DECIMAL(2,1))
+    soma_notas DECIMAL(12, 1) NOT NULL DEFAULT 0,
+    qtd_notas INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (barbearia_id, dia, servico_id)
+);
+
+-- Carga inicial a partir do histórico existente
+INSERT INTO metricas_diarias (barbearia_id, dia, servico_id, qtd_total, qtd_pendente, qtd_confirmado,
+                              qtd_cancelado, qtd_concluido, receita, soma_notas, qtd_notas)
+SELECT barbearia_id, data_agendamento, servico_id, COUNT(*),
+       SUM(status = 'pendente'), SUM(status = 'confirmado'), SUM(status = 'cancelado'), SUM(status = 'concluido'),
+       COALESCE(SUM(CASE WHEN status = 'concluido' THEN valor_total END), 0),
+       COALESCE(SUM(avaliacao_nota), 0), COUNT(avaliacao_nota)
+FROM agendamentos
+GROUP BY barbearia_id, data_agendamento, servico_id;
@@ -0,0 +1,10 @@
+-- Histórico antigo de agendamentos (ver backend/archive.py).
+-- Particionar agendamentos por mês não é viável no InnoDB: tabelas particionadas
+-- não aceitam chaves estrangeiras, e a chave de partição teria de entrar na PK.
+-- O arquivo tem a mesma estrutura (LIKE copia colunas e índices, sem as FKs);
+-- migrações futuras que alterarem agendamentos devem alterar as duas tabelas.
+
+CREATE TABLE IF NOT EXISTS agendamentos_arquivo LIKE agendamentos;
+
+-- Varredura do job de arquivamento
+CREATE INDEX idx_agendamentos_data ON agendamentos (data_agendamento, id);
@@ -0,0 +1,39 @@
+-- Feed paginado de avaliações (mais recentes primeiro) e histograma por barbearia.
+-- avaliado_em marca a última gravação da nota; o arquivo recebe a mesma coluna
+-- para manter a estrutura idêntica à da tabela principal.
+
+ALTER TABLE agendamentos ADD COLUMN avaliado_em TIMESTAMP(6) NULL;
+
+ALTER TABLE agendamentos_arquivo ADD COLUMN avaliado_em TIMESTAMP(6) NULL;
+
+-- atualizado_em tem ON UPDATE CURRENT_TIMESTAMP(6) (0005; o arquivo herda pelo LIKE): reatribuí-lo
+-- preserva o instante da última alteração, que é o cursor do feed de sincronização
+UPDATE agendamentos SET avaliado_em = atualizado_em, atualizado_em = atualizado_em WHERE avaliacao_nota IS NOT NULL AND avaliado_em IS NULL;
+
+UPDATE agendamentos_arquivo SET avaliado_em = atualizado_em, atualizado_em = atualizado_em WHERE avaliacao_nota IS NOT NULL AND avaliado_em IS NULL;
+
+CREATE INDEX idx_agendamentos_avaliacoes ON agendamentos (barbearia_id, avaliado_em, id);
+
+CREATE INDEX idx_arquivo_avaliacoes ON agendamentos_arquivo (barbearia_id, avaliado_em, id);
+
+-- Histograma mantido incrementalmente (ver backend/rollups.py); estrela = parte inteira da nota, entre 1 e 5
+CREATE TABLE IF NOT EXISTS avaliacoes_resumo (
+    barbearia_id INT PRIMARY KEY,
+    qtd_1 INT NOT NULL DEFAULT 0,
+    qtd_2 INT NOT NULL DEFAULT 0,
+    qtd_3 INT NOT NULL DEFAULT 0,
+    qtd_4 INT NOT NULL DEFAULT 0,
+    qtd_5 INT NOT NULL DEFAULT 0,
+    total INT NOT NULL DEFAULT 0,
+    soma_notas DECIMAL(12, 1) NOT NULL DEFAULT 0
+);
+
+INSERT INTO avaliacoes_resumo (barbearia_id, qtd_1, qtd_2, qtd_3, qtd_4, qtd_5, total, soma_notas)
+SELECT barbearia_id,
+       SUM(LEAST(5, GREATEST(1, FLOOR(avaliacao_nota))) = 1), SUM(LEAST(5, GREATEST(1, FLOOR(avaliacao_nota))) = 2),
+       SUM(LEAST(5, GREATEST(1, FLOOR(avaliacao_nota))) = 3), SUM(LEAST(5, GREATEST(1, FLOOR(avaliacao_nota))) = 4),
+       SUM(LEAST(5, GREATEST(1, FLOOR(avaliacao_nota))) = 5), COUNT(*), SUM(avaliacao_nota)
+FROM (SELECT barbearia_id, avaliacao_nota FROM agendamentos WHERE avaliacao_nota IS NOT NULL
+      UNION ALL
+      SELECT barbearia_id, avaliacao_nota FROM agendamentos_arquivo WHERE avaliacao_nota IS NOT NULL) h
+GROUP BY barbearia_id;
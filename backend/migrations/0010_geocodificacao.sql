@@ -0,0 +1,9 @@
+-- Geocodificação assíncrona (ver backend/geocoding.py): o cadastro/edição grava
+-- 'pendente' e o worker da outbox preenche latitude/longitude.
+-- Valores: ok, pendente, falhou, sem_endereco.
+
+ALTER TABLE barbearias ADD COLUMN geocode_status VARCHAR(12) NOT NULL DEFAULT 'ok';
+
+UPDATE barbearias SET geocode_status = 'falhou' WHERE latitude IS NULL OR longitude IS NULL;
+
+CREATE INDEX idx_barbearias_geocode_status ON barbearias (geocode_status);
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Migrações de Esquema
+Runner de migrações versionadas (arquivos NNNN_nome.sql desta pasta) com
+controle na tabela schema_version e verificação dos planos das consultas quentes.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_FILENAME_RE = re.compile(r'^(\d{4})_([\w\-]+)\.sql$')
+
+# Erros do MySQL que indicam que a alteração já existe num banco criado
+# antes do runner: tabela (1050), coluna (1060) ou índice (1061) duplicados.
+TOLERATED_ERRNOS = frozenset({1050, 1060, 1061})
+# Só as migrações que reproduzem o antigo init_db (0001 e 0002) podem encontrar
+# o objeto já criado; a partir daí um duplicado é erro de verdade
+LEGACY_BASELINE_VERSION = 2
+
+# Lock nomeado para que vários workers do gunicorn não migrem ao mesmo tempo
+_LOCK_NAME = 'easycut_schema_migrations'
+
+
+@dataclass
+class Migration:
+    """Arquivo de migração descoberto na pasta"""
+    version: int
+    name: str
+    path: str
+
+    def statements(self) -> List[str]:
+        with open(self.path, encoding='utf-8') as f:
+            return split_statements(f.read())
+
+
+def discover_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """
+    Lista as migrações da pasta em ordem de versão
+
+    Args:
+        directory (str): Pasta com os arquivos NNNN_nome.sql
+
+    Returns:
+        List[Migration]: Migrações ordenadas
+    """
+    found: Dict[int, Migration] = {}
+    for filename in os.listdir(directory):
+        m = _FILENAME_RE.match(filename)
+        if not m:
+            continue
+        version = int(m.group(1))
+        if version in found:
+            raise ValueError(f"Versão de migração duplicada: {version}")
+        found[version] = Migration(version, m.group(2), os.path.join(directory, filename))
+    return [found[v] for v in sorted(found)]
+
+
+def split_statements(sql: str) -> List[str]:
+    """Remove comentários de linha (--) e separa o script em comandos por ';'"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [stmt.strip() for stmt in "\n".join(lines).split(';') if stmt.strip()]
+
+
+def _ensure_version_table(cursor) -> None:
+    # comandos_aplicados/concluida: o DDL do MySQL não é transacional, então o
+    # progresso de cada migração é gravado comando a comando para retomar após falha
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INT PRIMARY KEY,
+            nome VARCHAR(255) NOT NULL,
+            comandos_aplicados INT NOT NULL DEFAULT 0,
+            concluida BOOLEAN NOT NULL DEFAULT TRUE,
+            aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+_RECORD_PROGRESS = '''
+    INSERT INTO schema_version (versao, nome, comandos_aplicados, concluida)
+    VALUES (%s, %s, %s, FALSE)
+    ON DUPLICATE KEY UPDATE comandos_aplicados = VALUES(comandos_aplicados)
+'''
+
+
+def _first_value(rows):
+    if not rows:
+        return None
+    row = rows[0]
+    return list(row.values())[0] if isinstance(row, dict) else row[0]
+
+
+def _acquire_lock(cursor) -> None:
+    cursor.execute('SELECT GET_LOCK(%s, 60)', (_LOCK_NAME,))
+    if _first_value(cursor.fetchall()) != 1:
+        raise RuntimeError("Não foi possível obter o lock de migração: outro processo ainda está migrando o esquema")
+
+
+def migration_progress(cursor) -> Dict[int, int]:
+    """Comandos já aplicados das migrações interrompidas no meio (versão -> quantidade)"""
+    cursor.execute('SELECT versao, comandos_aplicados FROM schema_version WHERE concluida = FALSE')
+    rows = cursor.fetchall()
+    return {int(r['versao'] if isinstance(r, dict) else r[0]):
+            int(r['comandos_aplicados'] if isinstance(r, dict) else r[1]) for r in rows}
+
+
+def applied_versions(cursor) -> Set[int]:
+    cursor.execute('SELECT versao FROM schema_version WHERE concluida = TRUE')
+    return {int(r['versao'] if isinstance(r, dict) else r[0]) for r in cursor.fetchall()}
+
+
+def run_migrations(conn, directory: str = MIGRATIONS_DIR, log: Callable[[str], None] = print) -> List[int]:
+    """
+    Aplica, em ordem, as migrações ainda não registradas em schema_version
+
+    Cada comando aplicado é registrado em schema_version.comandos_aplicados (na
+    mesma transação, para DML). Uma migração interrompida retoma no comando que
+    falhou em vez de repetir DDL que o MySQL já efetivou.
+
+    Args:
+        conn: Conexão MySQL aberta
+        directory (str): Pasta das migrações
+        log (Callable[[str], None]): Função de log
+
+    Returns:
+        List[int]: Versões aplicadas nesta execução
+
+    Raises:
+        RuntimeError: Lock de migração indisponível ou falha num comando
+    """
+    cursor = conn.cursor()
+    applied: List[int] = []
+    try:
+        _acquire_lock(cursor)
+        _ensure_version_table(cursor)
+        done = applied_versions(cursor)
+        progress = migration_progress(cursor)
+        for migration in discover_migrations(directory):
+            if migration.version in done:
+                continue
+            statements = migration.statements()
+            resumed = migration.version in progress
+            start = progress.get(migration.version, 0)
+            if resumed:
+                log(f"[MIGRAÇÃO] {migration.version:04d}: retomando no comando {start + 1} de {len(statements)}")
+            else:
+                cursor.execute(_RECORD_PROGRESS, (migration.version, migration.name, 0))
+                conn.commit()
+            for index in range(start, len(statements)):
+                try:
+                    cursor.execute(statements[index])
+                except Exception as e:
+                    # Banco legado (0001/0002 reproduzem o antigo init_db) ou queda entre o DDL
+                    # e o registro do progresso: o objeto duplicado já é resultado deste comando
+                    tolerated = migration.version <= LEGACY_BASELINE_VERSION or (resumed and index == start)
+                    if not tolerated or getattr(e, 'errno', None) not in TOLERATED_ERRNOS:
+                        conn.rollback()
+                        ran = f"comandos 1-{index} já aplicados" if index else "nenhum comando aplicado"
+                        raise RuntimeError(
+                            f"Falha na migração {migration.version:04d}_{migration.name} no comando "
+                            f"{index + 1} de {len(statements)} ({ran}; a próxima execução retoma "
+                            f"no comando {index + 1}): {e}"
+                        ) from e
+                    log(f"[MIGRAÇÃO] {migration.version:04d}: comando {index + 1} já aplicado ({e})")
+                cursor.execute(_RECORD_PROGRESS, (migration.version, migration.name, index + 1))
+                conn.commit()
+            cursor.execute('''
+                INSERT INTO schema_version (versao, nome, comandos_aplicados, concluida)
+                VALUES (%s, %s, %s, TRUE)
+                ON DUPLICATE KEY UPDATE comandos_aplicados = VALUES(comandos_aplicados), concluida = TRUE
+            ''', (migration.version, migration.name, len(statements)))
+            conn.commit()
+            applied.append(migration.version)
+            log(f"[MIGRAÇÃO] {migration.version:04d}_{migration.name} aplicada.")
+        return applied
+    finally:
+        try:
+            cursor.execute('SELECT RELEASE_LOCK(%s)', (_LOCK_NAME,))
+            cursor.fetchall()
+        except Exception:
+            pass
+        cursor.close()
+
+
+# --- VERIFICAÇÃO DE PLANOS ---
+@dataclass
+class HotQuery:
+    """Consulta quente e os índices que o plano deve usar"""
+    description: str
+    sql: str
+    params: tuple
+    table: str
+    expected_keys: frozenset
+
+
+HOT_QUERIES: Sequence[HotQuery] = (
+    HotQuery("disponibilidade: agendamentos do dia na barbearia",
+             "SELECT a.horario_inicio FROM agendamentos a WHERE a.barbearia_id = %s "
+             "AND a.data_agendamento = %s AND a.status != 'cancelado'",
+             (1, '2030-01-01'), 'a',
+             frozenset({'idx_agendamentos_barbearia_data_status', 'idx_agendamentos_barbearia_agenda'})),
+    HotQuery("lista de agendamentos do cliente",
+             "SELECT a.id FROM agendamentos a WHERE a.cliente_id = %s AND a.data_agendamento >= %s "
+             "ORDER BY a.data_agendamento DESC, a.horario_inicio DESC, a.id DESC LIMIT 50",
+             (1, '2030-01-01'), 'a', frozenset({'idx_agendamentos_cliente_agenda'})),
+    HotQuery("lista de agendamentos da barbearia",
+             "SELECT a.id FROM agendamentos a WHERE a.barbearia_id = %s "
+             "ORDER BY a.data_agendamento DESC, a.horario_inicio DESC, a.id DESC LIMIT 50",
+             (1,), 'a', frozenset({'idx_agendamentos_barbearia_agenda', 'idx_agendamentos_barbearia_data_status'})),
+    HotQuery("serviços ativos da barbearia",
+             "SELECT nome_servico FROM servicos WHERE barbearia_id = %s AND status = 'ativo'",
+             (1,), 'servicos', frozenset({'idx_servicos_barbearia_status'})),
+    HotQuery("faixas de horário do dia",
+             "SELECT inicio, fim FROM horarios_slots WHERE barbearia_id = %s AND dia_semana = %s",
+             (1, 'monday'), 'horarios_slots', frozenset({'idx_horarios_slots_barbearia_dia'})),
+)
+
+
+def check_query_plans(cursor, queries: Sequence[HotQuery] = HOT_QUERIES) -> List[Dict[str, Any]]:
+    """
+    Executa EXPLAIN nas consultas quentes e confere o índice escolhido
+
+    Args:
+        cursor: Cursor com dictionary=True
+        queries (Sequence[HotQuery]): Consultas a verificar
+
+    Returns:
+        List[Dict[str, Any]]: Um item por consulta com 'ok', 'key' e 'expected'
+    """
+    report = []
+    for q in queries:
+        cursor.execute(f"EXPLAIN {q.sql}", q.params)
+        rows = cursor.fetchall()
+        row = next((r for r in rows if r.get('table') == q.table), rows[0] if rows else {})
+        key = row.get('key')
+        report.append({
+            'query': q.description,
+            'key': key,
+            'expected': sorted(q.expected_keys),
+            'ok': key in q.expected_keys,
+        })
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Migrações de esquema do EasyCut")
+    parser.add_argument('--check-plans', action='store_true',
+                        help="Confere se as consultas quentes usam os índices esperados")
+    args = parser.parse_args(argv)
+
+    # Importar o app já executa init_db (e portanto as migrações pendentes)
+    from app import get_db_connection
+    conn = get_db_connection()
+    if not conn:
+        print("[ERRO] Sem conexão com o banco.")
+        return 1
+    try:
+        run_migrations(conn)
+        cursor = conn.cursor(dictionary=True)
+        print("Versões aplicadas:", sorted(applied_versions(cursor)))
+        if not args.check_plans:
+            return 0
+        failures = 0
+        for item in check_query_plans(cursor):
+            status = "OK " if item['ok'] else "FALHA"
+            failures += 0 if item['ok'] else 1
+            print(f"  [{status}] {item['query']}: key={item['key']} (esperado: {', '.join(item['expected'])})")
+        return 1 if failures else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
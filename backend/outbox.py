@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Outbox Transacional
+Eventos de agendamento gravados na mesma transação da escrita e entregues
+por um worker separado (confirmações, cancelamentos e lembretes). Outros
+tipos de evento podem registrar um EventHandler (ex.: geocodificação).
+"""
+
+import json
+import logging
+from abc import ABC, abstractmethod
+import os
+import random
+import smtplib
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, date
+from email.message import EmailMessage
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Tipos de evento gerados pelas rotas de agendamento
+EVENTO_CRIADO = 'agendamento_criado'
+EVENTO_CONFIRMADO = 'agendamento_confirmado'
+EVENTO_CANCELADO = 'agendamento_cancelado'
+EVENTO_LEMBRETE = 'agendamento_lembrete'
+
+# Antecedência do lembrete em relação ao horário do agendamento
+LEMBRETE_ANTECEDENCIA = timedelta(hours=24)
+
+# Horário de Brasília (UTC-3), o mesmo deslocamento usado em get_availability
+_UTC_OFFSET_BR = timedelta(hours=3)
+
+
+def enqueue_event(cursor, tipo_evento: str, agregado_id: int, payload: Optional[Dict[str, Any]] = None,
+                  disponivel_em: Optional[datetime] = None) -> None:
+    """
+    Grava um evento na outbox usando o cursor (e a transação) da escrita principal
+
+    Args:
+        cursor: Cursor da conexão que fará o commit do agendamento
+        tipo_evento (str): Tipo do evento (ex.: 'agendamento_criado')
+        agregado_id (int): ID do registro de origem (agendamento)
+        payload (Dict[str, Any], optional): Dados extras do evento
+        disponivel_em (datetime, optional): Instante UTC a partir do qual o evento pode ser entregue
+    """
+    cursor.execute(
+        """INSERT INTO outbox_eventos (tipo_evento, agregado_id, payload, disponivel_em)
+           VALUES (%s, %s, %s, %s)""",
+        (tipo_evento, agregado_id, json.dumps(payload or {}, default=str),
+         disponivel_em or datetime.utcnow()),
+    )
+
+
+def cancel_pending_events(cursor, tipo_evento: str, agregado_id: int) -> None:
+    """Cancela eventos ainda não entregues (ex.: lembrete de um agendamento cancelado)"""
+    cursor.execute(
+        """UPDATE outbox_eventos SET status = 'cancelado'
+           WHERE tipo_evento = %s AND agregado_id = %s AND status = 'pendente'""",
+        (tipo_evento, agregado_id),
+    )
+
+
+def reminder_time_utc(data_agendamento: Any, horario_inicio: Any) -> Optional[datetime]:
+    """
+    Calcula o instante UTC em que o lembrete deve ser enviado
+
+    Args:
+        data_agendamento: Data do agendamento (date ou 'YYYY-MM-DD')
+        horario_inicio: Horário de início (time, timedelta ou 'HH:MM')
+
+    Returns:
+        Optional[datetime]: Instante UTC do lembrete, ou None se os dados forem inválidos
+    """
+    try:
+        if isinstance(data_agendamento, (datetime, date)):
+            d = data_agendamento if not isinstance(data_agendamento, datetime) else data_agendamento.date()
+        else:
+            d = datetime.strptime(str(data_agendamento)[:10], "%Y-%m-%d").date()
+        if isinstance(horario_inicio, timedelta):
+            minutos = int(horario_inicio.total_seconds()) // 60
+        else:
+            partes = str(horario_inicio).split(":")
+            minutos = int(partes[0]) * 60 + int(partes[1])
+    except (TypeError, ValueError, IndexError):
+        return None
+    inicio_local = datetime(d.year, d.month, d.day) + timedelta(minutes=minutos)
+    return inicio_local + _UTC_OFFSET_BR - LEMBRETE_ANTECEDENCIA
+
+
+# --- CANAIS DE ENTREGA ---
+@dataclass
+class Notification:
+    """Mensagem pronta para ser entregue por um canal"""
+    destinatario: str
+    assunto: str
+    corpo: str
+    evento_id: int
+    tipo_evento: str
+
+
+class NotificationChannel(ABC):
+    """
+    Interface dos canais de entrega. Uma exceção em send() faz o evento
+    ser reagendado com backoff.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def send(self, notification: Notification) -> None:
+        """Entrega a mensagem (roda fora de transação)"""
+
+
+class LogChannel(NotificationChannel):
+    """Canal que apenas registra a mensagem no log (útil em desenvolvimento)"""
+
+    name = 'log'
+
+    def send(self, notification: Notification) -> None:
+        logger.info(f"[OUTBOX] {notification.tipo_evento} #{notification.evento_id} -> "
+                    f"{notification.destinatario}: {notification.assunto}")
+
+
+class SMTPChannel(NotificationChannel):
+    """
+    Canal de e-mail via SMTP. Em desenvolvimento aponte para um servidor
+    local de testes (ex.: `python -m aiosmtpd -n -l localhost:1025`).
+    """
+
+    name = 'smtp'
+
+    def __init__(self, host: str = 'localhost', port: int = 1025, sender: str = 'nao-responda@easycut.local',
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = False, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send(self, notification: Notification) -> None:
+        msg = EmailMessage()
+        msg['From'] = self.sender
+        msg['To'] = notification.destinatario
+        msg['Subject'] = notification.assunto
+        msg.set_content(notification.corpo)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or '')
+            smtp.send_message(msg)
+
+
+def build_channels_from_env() -> List[NotificationChannel]:
+    """
+    Monta os canais a partir de OUTBOX_CHANNELS (ex.: "log,smtp")
+
+    Returns:
+        List[NotificationChannel]: Canais configurados
+    """
+    names = [n.strip().lower() for n in os.environ.get('OUTBOX_CHANNELS', 'log').split(',') if n.strip()]
+    channels: List[NotificationChannel] = []
+    for name in names:
+        if name == 'log':
+            channels.append(LogChannel())
+        elif name == 'smtp':
+            channels.append(SMTPChannel(
+                host=os.environ.get('OUTBOX_SMTP_HOST', 'localhost'),
+                port=int(os.environ.get('OUTBOX_SMTP_PORT', 1025)),
+                sender=os.environ.get('OUTBOX_SMTP_FROM', 'nao-responda@easycut.local'),
+                username=os.environ.get('OUTBOX_SMTP_USER') or None,
+                password=os.environ.get('OUTBOX_SMTP_PASSWORD') or None,
+                use_tls=os.environ.get('OUTBOX_SMTP_TLS', '').lower() in ('1', 'true', 'yes'),
+            ))
+        else:
+            logger.warning(f"[OUTBOX] Canal desconhecido ignorado: {name}")
+    return channels
+
+
+# --- TAREFAS EM SEGUNDO PLANO ---
+class EventHandler(ABC):
+    """
+    Processa um tipo de evento da outbox que não é notificação, em três passos:
+    prepare() lê numa transação curta, resolve() faz o trabalho lento (rede)
+    sem transação aberta e handle() grava o resultado na transação que também
+    marca o evento como processado. Uma exceção em qualquer passo reagenda o
+    evento com backoff; give_up() é chamado quando as tentativas se esgotam.
+    """
+
+    def prepare(self, cursor, evento: Dict[str, Any]) -> Any:
+        """Leitura inicial; o worker faz commit logo em seguida"""
+        return None
+
+    def resolve(self, evento: Dict[str, Any], prepared: Any) -> Any:
+        """Trabalho lento fora de transação; o resultado vai para handle()"""
+        return prepared
+
+    @abstractmethod
+    def handle(self, cursor, evento: Dict[str, Any], resolved: Any = None) -> None:
+        """Grava o resultado com o cursor da transação que conclui o evento"""
+
+    def give_up(self, cursor, evento: Dict[str, Any], error: Exception) -> None:
+        pass
+
+
+# --- RENDERIZAÇÃO DAS MENSAGENS ---
+def _fmt_data(v: Any) -> str:
+    s = str(v or '')[:10]
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").strftime("%d/%m/%Y")
+    except ValueError:
+        return s
+
+
+def _fmt_hora(v: Any) -> str:
+    if isinstance(v, timedelta):
+        total = int(v.total_seconds()) % 86400
+        return f"{total // 3600:02d}:{(total % 3600) // 60:02d}"
+    return str(v or '')[:5]
+
+
+def render_notifications(evento: Dict[str, Any], ctx: Optional[Dict[str, Any]]) -> List[Notification]:
+    """
+    Converte um evento da outbox nas mensagens a enviar
+
+    Args:
+        evento (Dict[str, Any]): Linha de outbox_eventos
+        ctx (Dict[str, Any], optional): Dados atuais do agendamento (cliente, barbearia, serviço)
+
+    Returns:
+        List[Notification]: Mensagens; vazia quando não há nada a enviar
+    """
+    if not ctx:
+        return []
+    tipo = evento['tipo_evento']
+    quando = f"{_fmt_data(ctx.get('data_agendamento'))} às {_fmt_hora(ctx.get('horario_inicio'))}"
+    servico = ctx.get('nome_servico') or 'serviço'
+    barbearia = ctx.get('nome_barbearia') or 'barbearia'
+    cliente = ctx.get('nome_cliente') or 'Cliente'
+    out: List[Notification] = []
+
+    def add(dest, assunto, corpo):
+        if dest:
+            out.append(Notification(dest, assunto, corpo, evento['id'], tipo))
+
+    if tipo == EVENTO_CRIADO:
+        add(ctx.get('email_cliente'), 'Agendamento recebido',
+            f"Olá, {cliente}! Seu pedido de {servico} na {barbearia} em {quando} foi recebido "
+            f"e aguarda confirmação.")
+        add(ctx.get('email_barbearia'), 'Novo agendamento',
+            f"{cliente} solicitou {servico} em {quando}.")
+    elif tipo == EVENTO_CONFIRMADO:
+        add(ctx.get('email_cliente'), 'Agendamento confirmado',
+            f"Olá, {cliente}! A {barbearia} confirmou seu {servico} em {quando}.")
+    elif tipo == EVENTO_CANCELADO:
+        add(ctx.get('email_cliente'), 'Agendamento cancelado',
+            f"Olá, {cliente}. O agendamento de {servico} na {barbearia} em {quando} foi cancelado.")
+        add(ctx.get('email_barbearia'), 'Agendamento cancelado',
+            f"O agendamento de {cliente} ({servico}) em {quando} foi cancelado.")
+    elif tipo == EVENTO_LEMBRETE:
+        # O lembrete só vale se o agendamento continuar confirmado na hora do envio
+        if str(ctx.get('status') or '').lower() == 'confirmado':
+            add(ctx.get('email_cliente'), 'Lembrete de agendamento',
+                f"Olá, {cliente}! Lembrete: {servico} na {barbearia} em {quando}.")
+    return out
+
+
+# --- WORKER ---
+class OutboxWorker:
+    """
+    Drena a outbox em lotes. Cada lote é reservado com
+    `FOR UPDATE SKIP LOCKED` e marcado como 'processando' com um prazo
+    (lease) numa transação curta; o envio acontece depois do commit, sem
+    travas abertas, e cada evento é concluído no seu próprio commit. Um
+    worker que cair no meio do lote libera os eventos quando o prazo vence.
+    A entrega é "pelo menos uma vez": uma falha reagenda o evento inteiro.
+    """
+
+    def __init__(self, connection_factory: Callable[[], Any], channels: Sequence[NotificationChannel],
+                 batch_size: int = 50, max_attempts: int = 8, base_delay: float = 30.0,
+                 max_delay: float = 3600.0, clock: Callable[[], datetime] = datetime.utcnow,
+                 handlers: Optional[Dict[str, EventHandler]] = None, lease_seconds: float = 600.0):
+        self.connection_factory = connection_factory
+        self.channels = list(channels)
+        self.handlers = dict(handlers or {})
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.stats = {'lotes': 0, 'enviados': 0, 'reagendados': 0, 'falhos': 0, 'ultimo_lote_em': None}
+
+    def backoff_seconds(self, tentativas: int) -> float:
+        """Backoff exponencial com jitter, limitado a max_delay"""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, tentativas - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _load_context(self, cursor, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not ids:
+            return {}
+        marks = ",".join(["%s"] * len(ids))
+        cursor.execute(f"""SELECT a.id, a.status, a.data_agendamento, a.horario_inicio,
+                                  c.nome_completo AS nome_cliente, c.email AS email_cliente,
+                                  b.nome_barbearia, b.email AS email_barbearia, s.nome_servico
+                           FROM agendamentos a
+                           JOIN clientes c ON c.id = a.cliente_id
+                           JOIN barbearias b ON b.id = a.barbearia_id
+                           LEFT JOIN servicos s ON s.id = a.servico_id
+                           WHERE a.id IN ({marks})""", tuple(ids))
+        return {r['id']: r for r in cursor.fetchall()}
+
+    def _deliver(self, evento: Dict[str, Any], ctx: Optional[Dict[str, Any]]) -> None:
+        for notification in render_notifications(evento, ctx):
+            for channel in self.channels:
+                channel.send(notification)
+
+    def _claim(self, conn, cur, now: datetime) -> List[Dict[str, Any]]:
+        """Reserva o lote (pendentes vencidos e reservas com prazo vencido) e faz commit"""
+        cur.execute("""SELECT id, tipo_evento, agregado_id, payload, tentativas FROM outbox_eventos
+                       WHERE status IN ('pendente', 'processando') AND disponivel_em <= %s
+                       ORDER BY disponivel_em, id LIMIT %s
+                       FOR UPDATE SKIP LOCKED""", (now, self.batch_size))
+        eventos = cur.fetchall()
+        if eventos:
+            marks = ",".join(["%s"] * len(eventos))
+            cur.execute(f"""UPDATE outbox_eventos SET status = 'processando', disponivel_em = %s
+                            WHERE id IN ({marks})""",
+                        (now + timedelta(seconds=self.lease_seconds), *[e['id'] for e in eventos]))
+        conn.commit()
+        return eventos
+
+    def _mark_sent(self, cur, evento: Dict[str, Any], now: datetime) -> None:
+        cur.execute("""UPDATE outbox_eventos SET status = 'enviado', processado_em = %s
+                       WHERE id = %s AND status = 'processando'""", (now, evento['id']))
+        self.stats['enviados'] += 1
+
+    def _mark_failed(self, cur, evento: Dict[str, Any], handler: Optional[EventHandler],
+                     error: Exception, now: datetime) -> None:
+        tentativas = int(evento['tentativas'] or 0) + 1
+        if tentativas >= self.max_attempts:
+            if handler is not None:
+                handler.give_up(cur, evento, error)
+            cur.execute("""UPDATE outbox_eventos SET status = 'falhou', tentativas = %s,
+                           processado_em = %s, ultimo_erro = %s WHERE id = %s""",
+                        (tentativas, now, str(error)[:1000], evento['id']))
+            self.stats['falhos'] += 1
+            logger.error(f"[OUTBOX] Evento {evento['id']} descartado após {tentativas} tentativas: {error}")
+        else:
+            retry_at = now + timedelta(seconds=self.backoff_seconds(tentativas))
+            cur.execute("""UPDATE outbox_eventos SET status = 'pendente', tentativas = %s, disponivel_em = %s,
+                           ultimo_erro = %s WHERE id = %s""",
+                        (tentativas, retry_at, str(error)[:1000], evento['id']))
+            self.stats['reagendados'] += 1
+            logger.warning(f"[OUTBOX] Evento {evento['id']} reagendado para {retry_at}: {error}")
+
+    def _process(self, conn, cur, evento: Dict[str, Any], ctx: Optional[Dict[str, Any]], now: datetime) -> None:
+        """Executa um evento já reservado e grava o resultado no seu próprio commit"""
+        handler = self.handlers.get(evento['tipo_evento'])
+        try:
+            if handler is not None:
+                prepared = handler.prepare(cur, evento)
+                # Encerra a leitura: nenhuma transação fica aberta durante resolve()
+                conn.commit()
+                handler.handle(cur, evento, handler.resolve(evento, prepared))
+            else:
+                self._deliver(evento, ctx)
+            self._mark_sent(cur, evento, now)
+        except Exception as e:
+            # Desfaz escritas parciais do handler antes de registrar a falha
+            conn.rollback()
+            self._mark_failed(cur, evento, handler, e, now)
+        conn.commit()
+
+    def run_once(self) -> int:
+        """
+        Processa um lote de eventos vencidos
+
+        Returns:
+            int: Quantidade de eventos processados no lote
+        """
+        conn = self.connection_factory()
+        if not conn:
+            logger.error("[OUTBOX] Sem conexão com o banco.")
+            return 0
+        cur = conn.cursor(dictionary=True)
+        try:
+            now = self.clock()
+            eventos = self._claim(conn, cur, now)
+            if not eventos:
+                return 0
+            contexts = self._load_context(cur, sorted({e['agregado_id'] for e in eventos
+                                                       if e['tipo_evento'] not in self.handlers}))
+            # Encerra a leitura antes dos envios: nenhuma transação fica aberta durante o SMTP
+            conn.commit()
+            for evento in eventos:
+                self._process(conn, cur, evento, contexts.get(evento['agregado_id']), now)
+            self.stats['lotes'] += 1
+            self.stats['ultimo_lote_em'] = now.isoformat()
+            return len(eventos)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    def run_forever(self, interval: float = 5.0) -> None:
+        """Loop do worker: drena lotes cheios imediatamente e dorme quando a fila esvazia"""
+        while True:
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                logger.error(f"[OUTBOX] Erro ao processar lote: {e}", exc_info=True)
+                processed = 0
+            if processed < self.batch_size:
+                time.sleep(interval)
+
+
+def outbox_metrics(cursor, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Métricas de atraso (lag) e vazão da outbox
+
+    Args:
+        cursor: Cursor com dictionary=True
+        now (datetime, optional): Instante UTC de referência
+
+    Returns:
+        Dict[str, Any]: Pendentes, vencidos, lag do mais antigo, enviados por janela e reservados
+    """
+    now = now or datetime.utcnow()
+    cursor.execute("""SELECT COUNT(*) AS pendentes,
+                             COALESCE(SUM(disponivel_em <= %s), 0) AS vencidos,
+                             MIN(CASE WHEN disponivel_em <= %s THEN disponivel_em END) AS mais_antigo
+                      FROM outbox_eventos WHERE status = 'pendente'""", (now, now))
+    fila = cursor.fetchone() or {}
+    cursor.execute("""SELECT COALESCE(SUM(processado_em >= %s), 0) AS ultimo_minuto,
+                             COUNT(*) AS ultima_hora
+                      FROM outbox_eventos WHERE status = 'enviado' AND processado_em >= %s""",
+                   (now - timedelta(minutes=1), now - timedelta(hours=1)))
+    vazao = cursor.fetchone() or {}
+    cursor.execute("""SELECT COALESCE(SUM(status = 'falhou'), 0) AS falhos,
+                             COALESCE(SUM(status = 'processando'), 0) AS processando
+                      FROM outbox_eventos WHERE status IN ('falhou', 'processando')""")
+    falhos = cursor.fetchone() or {}
+    mais_antigo = fila.get('mais_antigo')
+    return {
+        'pendentes': int(fila.get('pendentes') or 0),
+        'vencidos': int(fila.get('vencidos') or 0),
+        'lag_segundos': max(0.0, (now - mais_antigo).total_seconds()) if mais_antigo else 0.0,
+        'enviados_ultimo_minuto': int(vazao.get('ultimo_minuto') or 0),
+        'enviados_ultima_hora': int(vazao.get('ultima_hora') or 0),
+        'falhos': int(falhos.get('falhos') or 0),
+        'em_processamento': int(falhos.get('processando') or 0),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Worker da outbox de agendamentos do EasyCut")
+    parser.add_argument('--once', action='store_true', help="Processa um único lote e sai")
+    parser.add_argument('--batch-size', type=int, default=int(os.environ.get('OUTBOX_BATCH_SIZE', 50)))
+    parser.add_argument('--interval', type=float, default=float(os.environ.get('OUTBOX_INTERVAL', 5)))
+    args = parser.parse_args(argv)
+
+    # Reaproveita a configuração de conexão do app (variáveis MYSQL_*/DB_*)
+    from app import get_db_connection
+    try:
+        from .geocoding import EVENTO_GEOCODIFICAR, GeocodeHandler
+    except ImportError:
+        from geocoding import EVENTO_GEOCODIFICAR, GeocodeHandler
+    worker = OutboxWorker(get_db_connection, build_channels_from_env(), batch_size=args.batch_size,
+                          handlers={EVENTO_GEOCODIFICAR: GeocodeHandler()})
+    if args.once:
+        print(f"[OK] {worker.run_once()} evento(s) processado(s).")
+        return 0
+    worker.run_forever(interval=args.interval)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
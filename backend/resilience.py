@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Proteção das APIs Externas
+Limite de requisições (token bucket) e circuit breaker por upstream
+(Google Places, Nominatim). Com a cota local esgotada ou o circuito aberto a
+chamada falha na hora, sem chegar à API; os contadores de uso ficam em
+/api/metrics/quotas. Os limites valem por processo.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+UPSTREAM_GOOGLE = 'google_places'
+UPSTREAM_NOMINATIM = 'nominatim'
+
+
+@dataclass(frozen=True)
+class Quota:
+    """Cota de um upstream: requisições/s, rajada e espera máxima por uma ficha"""
+    rate: float
+    burst: int
+    max_wait: float = 0.0
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+
+# A política do Nominatim público é 1 requisição/s; o Google cobra por requisição
+DEFAULT_QUOTAS = {
+    UPSTREAM_GOOGLE: Quota(rate=10.0, burst=20, max_wait=0.2),
+    UPSTREAM_NOMINATIM: Quota(rate=1.0, burst=1, max_wait=1.5),
+}
+
+
+class UpstreamUnavailable(Exception):
+    """Chamada recusada localmente (o upstream não foi consultado)"""
+
+
+class QuotaExceeded(UpstreamUnavailable):
+    pass
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+class TokenBucket:
+    """Fichas repostas a `rate` por segundo, até `burst` acumuladas"""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: float = 0.0) -> bool:
+        """
+        Retira uma ficha, esperando até `timeout` segundos se preciso
+
+        Returns:
+            bool: False se a ficha não estaria disponível dentro do prazo
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            wait = (1 - self._tokens) / self.rate if self.rate > 0 else float('inf')
+            if wait > timeout:
+                return False
+            # Reserva a ficha futura; quem chegar depois espera a seguinte
+            self._tokens -= 1
+        self.sleep(wait)
+        return True
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return max(0.0, self._tokens)
+
+
+class CircuitBreaker:
+    """
+    Fechado -> aberto após `failure_threshold` falhas seguidas; aberto por
+    `reset_timeout` segundos, depois deixa passar uma chamada de teste
+    (meio-aberto) que fecha ou reabre o circuito.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'fechado', 'aberto', 'meio_aberto'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+
+    def release_probe(self) -> None:
+        with self._lock:
+            self._probing = False
+
+    def trip(self) -> None:
+        """Abre na hora (ex.: o upstream avisou que a cota acabou)"""
+        with self._lock:
+            self._open()
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = self.clock()
+        self._probing = False
+
+
+class UpstreamGuard:
+    """Token bucket + circuit breaker de um upstream, com contadores de uso"""
+
+    def __init__(self, name: str, quota: Quota, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self.quota = quota
+        self.bucket = TokenBucket(quota.rate, quota.burst, clock, sleep)
+        self.breaker = CircuitBreaker(quota.failure_threshold, quota.reset_timeout, clock)
+        self._lock = threading.Lock()
+        self._stats = {'chamadas': 0, 'sucessos': 0, 'falhas': 0, 'limitadas_pelo_upstream': 0,
+                       'negadas_cota': 0, 'negadas_circuito': 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def call(self, fn: Callable[[], T], throttled: Optional[Callable[[T], bool]] = None,
+             throttled_error: Optional[Callable[[Exception], bool]] = None) -> T:
+        """
+        Executa `fn` se o circuito e a cota permitirem
+
+        Exceções de `fn` contam como falha do upstream e são repassadas, exceto
+        as de cota: as que `throttled_error` reconhece contam só como limitadas
+        pelo upstream, e recusas locais (UpstreamUnavailable) não contam.
+
+        Args:
+            fn (Callable): Chamada ao upstream
+            throttled (Callable, optional): Diz se a resposta é de cota esgotada no upstream
+            throttled_error (Callable, optional): Diz se a exceção é de cota esgotada no upstream
+
+        Raises:
+            CircuitOpen: Circuito aberto
+            QuotaExceeded: Sem ficha dentro de quota.max_wait
+        """
+        if not self.breaker.allow():
+            self._count('negadas_circuito')
+            raise CircuitOpen(f"{self.name}: circuito aberto")
+        if not self.bucket.acquire(self.quota.max_wait):
+            # Não chegou ao upstream: a chamada de teste do meio-aberto fica para a próxima
+            self.breaker.release_probe()
+            self._count('negadas_cota')
+            raise QuotaExceeded(f"{self.name}: limite de {self.quota.rate:g} req/s atingido")
+        self._count('chamadas')
+        try:
+            result = fn()
+        except UpstreamUnavailable:
+            self.breaker.release_probe()
+            raise
+        except Exception as e:
+            if throttled_error is not None and throttled_error(e):
+                self.record_throttled()
+            else:
+                self.record_failure()
+            raise
+        if throttled is not None and throttled(result):
+            self.record_throttled()
+        else:
+            self.record_success()
+        return result
+
+    def record_success(self) -> None:
+        self._count('sucessos')
+        self.breaker.record_success()
+
+    def record_failure(self) -> None:
+        self._count('falhas')
+        self.breaker.record_failure()
+
+    def record_throttled(self) -> None:
+        """O upstream respondeu que a cota acabou (OVER_QUERY_LIMIT, HTTP 429): abre o circuito"""
+        self._count('limitadas_pelo_upstream')
+        self.breaker.trip()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({'circuito': self.breaker.state, 'fichas_disponiveis': round(self.bucket.available, 2),
+                      'cota_por_segundo': self.quota.rate, 'rajada': self.quota.burst})
+        return stats
+
+
+def _quota_from_env(name: str, default: Quota) -> Quota:
+    """GEO_QUOTA_<NOME>='req_por_s:rajada' (ex.: GEO_QUOTA_NOMINATIM='1:1')"""
+    raw = os.environ.get(f"GEO_QUOTA_{name.upper()}")
+    if not raw:
+        return default
+    try:
+        rate, _, burst = raw.partition(':')
+        return Quota(float(rate), int(burst or max(1, float(rate))), default.max_wait,
+                     default.failure_threshold, default.reset_timeout)
+    except ValueError:
+        return default
+
+
+_guards: Dict[str, UpstreamGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(name: str) -> UpstreamGuard:
+    """Guarda do upstream neste processo (criada na primeira chamada)"""
+    with _guards_lock:
+        guard = _guards.get(name)
+        if guard is None:
+            guard = _guards[name] = UpstreamGuard(name, _quota_from_env(name, DEFAULT_QUOTAS.get(name, Quota(5.0, 5))))
+        return guard
+
+
+def quota_snapshot() -> Dict[str, Dict[str, Any]]:
+    with _guards_lock:
+        guards = list(_guards.values())
+    return {guard.name: guard.snapshot() for guard in guards}
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Rollups Diários de Métricas
+Mantém metricas_diarias (barbearia, dia, serviço) e o histograma
+avaliacoes_resumo a partir das escritas de agendamentos e serve as séries
+temporais dos gráficos.
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+STATUSES = ('pendente', 'confirmado', 'cancelado', 'concluido')
+
+METRIC_COLUMNS = ('qtd_total', 'qtd_pendente', 'qtd_confirmado', 'qtd_cancelado', 'qtd_concluido',
+                  'receita', 'soma_notas', 'qtd_notas')
+
+GROUPS = ('day', 'service', 'weekday')
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+
+def contribution(row: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    """
+    Quanto um agendamento soma em cada coluna do rollup
+
+    Args:
+        row (Mapping, optional): Linha com status, valor_total e avaliacao_nota
+
+    Returns:
+        Dict[str, Any]: Valor por coluna (zeros se row for None)
+    """
+    out: Dict[str, Any] = {c: 0 for c in METRIC_COLUMNS}
+    if row is None:
+        return out
+    status = str(row.get('status') or 'pendente').lower().strip()
+    out['qtd_total'] = 1
+    if status in STATUSES:
+        out[f'qtd_{status}'] = 1
+    if status == 'concluido':
+        out['receita'] = Decimal(str(row.get('valor_total') or 0))
+    if row.get('avaliacao_nota') is not None:
+        out['soma_notas'] = Decimal(str(row['avaliacao_nota']))
+        out['qtd_notas'] = 1
+    return out
+
+
+def _key(row: Optional[Mapping[str, Any]]) -> Optional[Tuple[Any, Any, Any]]:
+    if row is None:
+        return None
+    return (int(row['barbearia_id']), str(row['data_agendamento'])[:10], int(row['servico_id']))
+
+
+def _upsert(cursor, key: Tuple[Any, Any, Any], delta: Dict[str, Any]) -> None:
+    if not any(delta.values()):
+        return
+    cols = ', '.join(METRIC_COLUMNS)
+    marks = ', '.join(['%s'] * len(METRIC_COLUMNS))
+    updates = ', '.join(f'{c} = {c} + VALUES({c})' for c in METRIC_COLUMNS)
+    cursor.execute(f"""INSERT INTO metricas_diarias (barbearia_id, dia, servico_id, {cols})
+                       VALUES (%s, %s, %s, {marks})
+                       ON DUPLICATE KEY UPDATE {updates}""",
+                   key + tuple(delta[c] for c in METRIC_COLUMNS))
+
+
+def apply_change(cursor, before: Optional[Mapping[str, Any]], after: Optional[Mapping[str, Any]]) -> None:
+    """
+    Aplica ao rollup a diferença entre o estado anterior e o novo de um
+    agendamento; chamar na mesma transação da escrita.
+
+    Args:
+        cursor: Cursor MySQL
+        before (Mapping, optional): Linha antes da escrita (None em inserções)
+        after (Mapping, optional): Linha depois da escrita (None em remoções)
+    """
+    old_key, new_key = _key(before), _key(after)
+    old_c, new_c = contribution(before), contribution(after)
+    if old_key == new_key:
+        _upsert(cursor, new_key, {c: new_c[c] - old_c[c] for c in METRIC_COLUMNS})
+        return
+    if old_key is not None:
+        _upsert(cursor, old_key, {c: -old_c[c] for c in METRIC_COLUMNS})
+    if new_key is not None:
+        _upsert(cursor, new_key, new_c)
+
+
+def rebuild(cursor, barbearia_id: Optional[int] = None) -> int:
+    """
+    Recalcula o rollup diário e o histograma de avaliações a partir dos
+    agendamentos, incluindo os arquivados (todas as barbearias ou uma)
+
+    Returns:
+        int: Quantidade de linhas gravadas em metricas_diarias
+    """
+    where, params = ("WHERE barbearia_id = %s", (barbearia_id,)) if barbearia_id else ("", ())
+    cols = "barbearia_id, data_agendamento, servico_id, status, valor_total, avaliacao_nota"
+    cursor.execute(f"DELETE FROM metricas_diarias {where}", params)
+    cursor.execute(f"""INSERT INTO metricas_diarias (barbearia_id, dia, servico_id, {', '.join(METRIC_COLUMNS)})
+                       SELECT barbearia_id, data_agendamento, servico_id, COUNT(*),
+                              SUM(status = 'pendente'), SUM(status = 'confirmado'),
+                              SUM(status = 'cancelado'), SUM(status = 'concluido'),
+                              COALESCE(SUM(CASE WHEN status = 'concluido' THEN valor_total END), 0),
+                              COALESCE(SUM(avaliacao_nota), 0), COUNT(avaliacao_nota)
+                       FROM (SELECT {cols} FROM agendamentos {where}
+                             UNION ALL
+                             SELECT {cols} FROM agendamentos_arquivo {where}) h
+                       GROUP BY barbearia_id, data_agendamento, servico_id""", params * 2)
+    linhas = cursor.rowcount
+    _rebuild_review_summary(cursor, where, params)
+    return linhas
+
+
+# --- HISTOGRAMA DE AVALIAÇÕES ---
+REVIEW_COLUMNS = ('qtd_1', 'qtd_2', 'qtd_3', 'qtd_4', 'qtd_5', 'total', 'soma_notas')
+
+
+def star_bucket(nota: Any) -> int:
+    """Estrela do histograma: parte inteira da nota, limitada a 1..5"""
+    return min(5, max(1, int(float(nota))))
+
+
+def apply_review_change(cursor, barbearia_id: int, old_nota: Any, new_nota: Any) -> None:
+    """
+    Atualiza avaliacoes_resumo quando a nota de um agendamento muda (None = sem nota);
+    chamar na mesma transação da escrita.
+    """
+    delta: Dict[str, Any] = {c: 0 for c in REVIEW_COLUMNS}
+    for nota, sign in ((old_nota, -1), (new_nota, 1)):
+        if nota is None:
+            continue
+        delta[f'qtd_{star_bucket(nota)}'] += sign
+        delta['total'] += sign
+        delta['soma_notas'] += sign * Decimal(str(nota))
+    if not any(delta.values()):
+        return
+    updates = ', '.join(f'{c} = {c} + VALUES({c})' for c in REVIEW_COLUMNS)
+    cursor.execute(f"""INSERT INTO avaliacoes_resumo (barbearia_id, {', '.join(REVIEW_COLUMNS)})
+                       VALUES (%s, {', '.join(['%s'] * len(REVIEW_COLUMNS))})
+                       ON DUPLICATE KEY UPDATE {updates}""",
+                   (barbearia_id, *(delta[c] for c in REVIEW_COLUMNS)))
+
+
+def _rebuild_review_summary(cursor, where: str, params: tuple) -> None:
+    star = "LEAST(5, GREATEST(1, FLOOR(avaliacao_nota)))"
+    rated = "avaliacao_nota IS NOT NULL" + (f" AND {where[len('WHERE '):]}" if where else "")
+    cursor.execute(f"DELETE FROM avaliacoes_resumo {where}", params)
+    cursor.execute(f"""INSERT INTO avaliacoes_resumo (barbearia_id, {', '.join(REVIEW_COLUMNS)})
+                       SELECT barbearia_id, {', '.join(f'SUM({star} = {i})' for i in range(1, 6))},
+                              COUNT(*), SUM(avaliacao_nota)
+                       FROM (SELECT barbearia_id, avaliacao_nota FROM agendamentos WHERE {rated}
+                             UNION ALL
+                             SELECT barbearia_id, avaliacao_nota FROM agendamentos_arquivo WHERE {rated}) h
+                       GROUP BY barbearia_id""", params * 2)
+
+
+def review_summary(cursor, barbearia_id: int) -> Dict[str, Any]:
+    """
+    Histograma, total e média das avaliações da barbearia (uma leitura por PK)
+
+    Returns:
+        Dict[str, Any]: {'total', 'average', 'histogram': {'1'..'5': quantidade}}
+    """
+    cursor.execute(f"SELECT {', '.join(REVIEW_COLUMNS)} FROM avaliacoes_resumo WHERE barbearia_id = %s",
+                   (barbearia_id,))
+    row = cursor.fetchone()
+    if row and not isinstance(row, dict):
+        row = dict(zip(REVIEW_COLUMNS, row))
+    row = row or {}
+    total = int(row.get('total') or 0)
+    return {
+        'total': total,
+        'average': round(float(row.get('soma_notas') or 0) / total, 2) if total else None,
+        'histogram': {str(i): int(row.get(f'qtd_{i}') or 0) for i in range(1, 6)},
+    }
+
+
+def _point(key: str, label: str, row: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    row = row or {}
+    reviews = int(row.get('qtd_notas') or 0)
+    return {
+        'key': key,
+        'label': label,
+        'bookings': int(row.get('qtd_total') or 0),
+        'pending': int(row.get('qtd_pendente') or 0),
+        'confirmed': int(row.get('qtd_confirmado') or 0),
+        'cancelled': int(row.get('qtd_cancelado') or 0),
+        'completed': int(row.get('qtd_concluido') or 0),
+        'revenue': float(row.get('receita') or 0),
+        'reviews': reviews,
+        'ratingSum': float(row.get('soma_notas') or 0),
+        'averageRating': round(float(row.get('soma_notas') or 0) / reviews, 2) if reviews else None,
+    }
+
+
+def query_series(cursor, barbearia_id: int, start: date, end: date, group: str = 'day') -> List[Dict[str, Any]]:
+    """
+    Série de métricas do período [start, end] lida só do rollup
+
+    Args:
+        cursor: Cursor com dictionary=True
+        barbearia_id (int): Barbearia
+        start (date): Primeiro dia (inclusivo)
+        end (date): Último dia (inclusivo)
+        group (str): 'day', 'service' ou 'weekday'
+
+    Returns:
+        List[Dict[str, Any]]: Pontos da série; por dia, os dias sem movimento vêm zerados
+    """
+    if group not in GROUPS:
+        raise ValueError(f"Agrupamento inválido: {group}")
+    sums = ', '.join(f'SUM(m.{c}) AS {c}' for c in METRIC_COLUMNS)
+    where = "m.barbearia_id = %s AND m.dia BETWEEN %s AND %s"
+    params = (barbearia_id, start, end)
+    if group == 'day':
+        cursor.execute(f"SELECT m.dia AS chave, {sums} FROM metricas_diarias m WHERE {where} GROUP BY m.dia", params)
+        by_day = {str(r['chave'])[:10]: r for r in cursor.fetchall()}
+        out, d = [], start
+        while d <= end:
+            out.append(_point(d.isoformat(), d.isoformat(), by_day.get(d.isoformat())))
+            d += timedelta(days=1)
+        return out
+    if group == 'weekday':
+        cursor.execute(f"SELECT WEEKDAY(m.dia) AS chave, {sums} FROM metricas_diarias m WHERE {where} "
+                       "GROUP BY WEEKDAY(m.dia)", params)
+        by_wd = {int(r['chave']): r for r in cursor.fetchall()}
+        return [_point(str(i), name, by_wd.get(i)) for i, name in enumerate(WEEKDAYS)]
+    cursor.execute(f"""SELECT m.servico_id AS chave, MAX(s.nome_servico) AS nome, {sums}
+                       FROM metricas_diarias m LEFT JOIN servicos s ON s.id = m.servico_id
+                       WHERE {where} GROUP BY m.servico_id ORDER BY receita DESC, qtd_total DESC""", params)
+    return [_point(str(r['chave']), r.get('nome') or f"Serviço {r['chave']}", r) for r in cursor.fetchall()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Rollups diários de métricas do EasyCut")
+    parser.add_argument('--rebuild', action='store_true', help="Recalcula metricas_diarias a partir dos agendamentos")
+    parser.add_argument('--barbearia', type=int, default=None, help="Limita a reconstrução a uma barbearia")
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.print_help()
+        return 0
+
+    from app import get_db_connection
+    conn = get_db_connection()
+    if not conn:
+        print("[ERRO] Sem conexão com o banco.")
+        return 1
+    cursor = conn.cursor()
+    try:
+        linhas = rebuild(cursor, args.barbearia)
+        conn.commit()
+        print(f"[OK] {linhas} linha(s) de rollup gravada(s).")
+        return 0
+    except Exception as e:
+        conn.rollback()
+        print(f"[ERRO] Falha ao reconstruir rollups: {e}")
+        return 1
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EasyCut - Horários de Funcionamento
+Gravação incremental da grade semanal (horarios_status / horarios_slots):
+compara a grade recebida com a armazenada e aplica só as diferenças.
+Leitura: grade compilada (faixas em minutos) em cache no processo,
+validada pela versão 'horarios' de recurso_versoes, e índice
+(dia, minuto) -> barbearias abertas para os filtros "aberta agora/em".
+"""
+
+import re
+import threading
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+_TIME_RE = re.compile(r'^(\d{1,2}):(\d{2})(?::(\d{2}))?$')
+
+
+def normalize_time(val: Any) -> str:
+    """
+    Converte TIME do MySQL (timedelta) ou 'HH:MM[:SS]' para 'HH:MM:SS'
+
+    Raises:
+        ValueError: Horário em formato inválido
+    """
+    if isinstance(val, timedelta):
+        total = int(val.total_seconds()) % 86400
+        return f"{total // 3600:02d}:{(total % 3600) // 60:02d}:{total % 60:02d}"
+    m = _TIME_RE.match(str(val or '').strip())
+    if not m or int(m.group(1)) > 23 or int(m.group(2)) > 59:
+        raise ValueError(f"Horário inválido: {val!r}")
+    return f"{int(m.group(1)):02d}:{m.group(2)}:{m.group(3) or '00'}"
+
+
+@dataclass
+class ScheduleDiff:
+    """Alterações a aplicar para que a grade armazenada vire a desejada"""
+    status_upserts: List[Tuple[str, str]] = field(default_factory=list)
+    status_deletes: List[str] = field(default_factory=list)
+    slot_inserts: List[Tuple[str, str, str]] = field(default_factory=list)
+    slot_deletes: List[int] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (self.status_upserts or self.status_deletes or self.slot_inserts or self.slot_deletes)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'status_gravados': len(self.status_upserts),
+            'status_removidos': len(self.status_deletes),
+            'faixas_inseridas': len(self.slot_inserts),
+            'faixas_removidas': len(self.slot_deletes),
+        }
+
+
+def diff_schedule(current_status: Mapping[str, str], current_slots: List[Tuple[int, str, Any, Any]],
+                  schedule: Mapping[str, Any]) -> ScheduleDiff:
+    """
+    Compara a grade armazenada com a recebida da API
+
+    Args:
+        current_status (Mapping[str, str]): dia -> status gravado
+        current_slots (List[Tuple]): (id, dia, inicio, fim) gravados
+        schedule (Mapping[str, Any]): {dia: {"status": "open"|"closed", "slots": [{"start", "end"}]}};
+            dias ausentes ficam sem registro, como na gravação completa
+
+    Returns:
+        ScheduleDiff: Linhas a gravar e a remover
+
+    Raises:
+        ValueError: Dia desconhecido ou faixa inválida
+    """
+    desired_status: Dict[str, str] = {}
+    desired_slots: Counter = Counter()
+    for day, block in schedule.items():
+        if day not in DAYS:
+            raise ValueError(f"Dia da semana inválido: {day}")
+        block = block or {}
+        status = block.get('status', 'closed')
+        desired_status[day] = status
+        if status != 'open':
+            continue
+        for slot in block.get('slots') or []:
+            start, end = normalize_time(slot.get('start')), normalize_time(slot.get('end'))
+            if start >= end:
+                raise ValueError(f"Faixa inválida em {day}: {slot.get('start')}-{slot.get('end')}")
+            desired_slots[(day, start, end)] += 1
+
+    diff = ScheduleDiff()
+    for day in DAYS:
+        if day in desired_status and current_status.get(day) != desired_status[day]:
+            diff.status_upserts.append((day, desired_status[day]))
+        elif day not in desired_status and day in current_status:
+            diff.status_deletes.append(day)
+
+    # Faixas iguais são mantidas (mesmo id); sobras de um lado viram DELETE ou INSERT
+    remaining = Counter(desired_slots)
+    for slot_id, day, start, end in sorted(current_slots, key=lambda s: s[0]):
+        key = (day, normalize_time(start), normalize_time(end))
+        if remaining[key] > 0:
+            remaining[key] -= 1
+        else:
+            diff.slot_deletes.append(slot_id)
+    for key in sorted(remaining.elements()):
+        diff.slot_inserts.append(key)
+    return diff
+
+
+def load_stored_schedule(cursor, barbearia_id: int) -> Tuple[Dict[str, str], List[Tuple[int, str, Any, Any]]]:
+    """Lê (e bloqueia, FOR UPDATE) a grade atual da barbearia"""
+    cursor.execute("SELECT dia_semana, status FROM horarios_status WHERE barbearia_id = %s FOR UPDATE",
+                   (barbearia_id,))
+    status = {}
+    for r in cursor.fetchall():
+        day, st = (r['dia_semana'], r['status']) if isinstance(r, dict) else (r[0], r[1])
+        status[day] = st
+    cursor.execute("SELECT id, dia_semana, inicio, fim FROM horarios_slots WHERE barbearia_id = %s FOR UPDATE",
+                   (barbearia_id,))
+    slots = []
+    for r in cursor.fetchall():
+        slots.append((r['id'], r['dia_semana'], r['inicio'], r['fim']) if isinstance(r, dict) else tuple(r))
+    return status, slots
+
+
+def apply_schedule_diff(cursor, barbearia_id: int, diff: ScheduleDiff) -> None:
+    """Aplica a diferença com comandos em lote (executemany / IN)"""
+    if diff.status_upserts:
+        cursor.executemany("""INSERT INTO horarios_status (barbearia_id, dia_semana, status) VALUES (%s, %s, %s)
+                              ON DUPLICATE KEY UPDATE status = VALUES(status)""",
+                           [(barbearia_id, day, st) for day, st in diff.status_upserts])
+    if diff.status_deletes:
+        cursor.execute(f"""DELETE FROM horarios_status WHERE barbearia_id = %s
+                           AND dia_semana IN ({', '.join(['%s'] * len(diff.status_deletes))})""",
+                       (barbearia_id, *diff.status_deletes))
+    if diff.slot_deletes:
+        cursor.execute(f"""DELETE FROM horarios_slots WHERE barbearia_id = %s
+                           AND id IN ({', '.join(['%s'] * len(diff.slot_deletes))})""",
+                       (barbearia_id, *diff.slot_deletes))
+    if diff.slot_inserts:
+        cursor.executemany("INSERT INTO horarios_slots (barbearia_id, dia_semana, inicio, fim) VALUES (%s, %s, %s, %s)",
+                           [(barbearia_id, day, start, end) for day, start, end in diff.slot_inserts])
+
+
+def time_to_minutes(val: Any) -> int:
+    """Minutos desde a meia-noite de um TIME do MySQL ou 'HH:MM[:SS]'"""
+    hh, mm, _ = normalize_time(val).split(':')
+    return int(hh) * 60 + int(mm)
+
+
+def _fmt_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+@dataclass(frozen=True)
+class CompiledSchedule:
+    """
+    Grade semanal pronta para consulta
+
+    status: dia -> 'open'/'closed' (só os dias gravados)
+    ranges: dia -> faixas (início, fim) em minutos do dia, ordenadas
+    """
+    status: Mapping[str, str] = field(default_factory=dict)
+    ranges: Mapping[str, Tuple[Tuple[int, int], ...]] = field(default_factory=dict)
+
+    def is_closed(self, day: str) -> bool:
+        """Fechado só quando o dia está gravado como 'closed' (regra da disponibilidade)"""
+        return self.status.get(day) == 'closed'
+
+    def day_ranges(self, day: str) -> Tuple[Tuple[int, int], ...]:
+        return () if self.is_closed(day) else self.ranges.get(day, ())
+
+    def opening_hours(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Formato exibido nos cards/detalhes: {dia: {"open", "close"}} ou {"closed": True};
+        dia sem status gravado conta como fechado
+        """
+        hours = {}
+        for day in DAYS:
+            ranges = self.ranges.get(day)
+            if self.status.get(day, 'closed') == 'open' and ranges:
+                hours[day] = {"open": _fmt_minutes(min(r[0] for r in ranges)),
+                              "close": _fmt_minutes(max(r[1] for r in ranges))}
+            else:
+                hours[day] = {"closed": True}
+        return hours
+
+
+def _in_clause(ids: List[int]) -> str:
+    return ', '.join(['%s'] * len(ids))
+
+
+def load_compiled_schedules(cursor, barbearia_ids: List[int]) -> Dict[int, CompiledSchedule]:
+    """
+    Compila a grade de várias barbearias com duas consultas (status e faixas)
+
+    Args:
+        cursor: Cursor MySQL (dicionário ou tupla)
+        barbearia_ids (List[int]): Barbearias a carregar
+
+    Returns:
+        Dict[int, CompiledSchedule]: Uma grade por id (vazia se nada gravado)
+    """
+    if not barbearia_ids:
+        return {}
+    status: Dict[int, Dict[str, str]] = {bid: {} for bid in barbearia_ids}
+    ranges: Dict[int, Dict[str, List[Tuple[int, int]]]] = {bid: {} for bid in barbearia_ids}
+    cursor.execute(f"""SELECT barbearia_id, dia_semana, status FROM horarios_status
+                       WHERE barbearia_id IN ({_in_clause(barbearia_ids)})""", tuple(barbearia_ids))
+    for r in cursor.fetchall():
+        bid, day, st = (r['barbearia_id'], r['dia_semana'], r['status']) if isinstance(r, dict) else tuple(r)
+        status.setdefault(int(bid), {})[day] = st
+    cursor.execute(f"""SELECT barbearia_id, dia_semana, inicio, fim FROM horarios_slots
+                       WHERE barbearia_id IN ({_in_clause(barbearia_ids)})""", tuple(barbearia_ids))
+    for r in cursor.fetchall():
+        bid, day, start, end = (r['barbearia_id'], r['dia_semana'], r['inicio'], r['fim']) \
+            if isinstance(r, dict) else tuple(r)
+        ranges.setdefault(int(bid), {}).setdefault(day, []).append((time_to_minutes(start), time_to_minutes(end)))
+    return {
+        bid: CompiledSchedule(status=status[bid],
+                              ranges={day: tuple(sorted(rs)) for day, rs in ranges[bid].items()})
+        for bid in barbearia_ids
+    }
+
+
+def load_schedule_versions(cursor, barbearia_ids: List[int]) -> Dict[int, int]:
+    """Versão 'horarios' de cada barbearia (ausente = 0, nunca gravada)"""
+    if not barbearia_ids:
+        return {}
+    cursor.execute(f"""SELECT escopo_id, versao FROM recurso_versoes
+                       WHERE escopo = 'barbearia' AND recurso = 'horarios'
+                       AND escopo_id IN ({_in_clause(barbearia_ids)})""", tuple(barbearia_ids))
+    versions = {}
+    for r in cursor.fetchall():
+        bid, ver = (r['escopo_id'], r['versao']) if isinstance(r, dict) else (r[0], r[1])
+        versions[int(bid)] = int(ver)
+    return versions
+
+
+class ScheduleCache:
+    """
+    Grades compiladas em memória (LRU por barbearia)
+
+    Cada leitura confere a versão 'horarios' em recurso_versoes com uma consulta
+    por chave primária; gravações feitas em outro worker também invalidam a
+    entrada. post_horarios_barbearia ainda chama invalidate() localmente.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[int, CompiledSchedule]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cursor, barbearia_id: int) -> CompiledSchedule:
+        return self.get_many(cursor, [barbearia_id])[int(barbearia_id)]
+
+    def get_many(self, cursor, barbearia_ids: Iterable[int]) -> Dict[int, CompiledSchedule]:
+        """
+        Grades de várias barbearias; só as ausentes ou desatualizadas vão ao banco
+
+        Args:
+            cursor: Cursor MySQL
+            barbearia_ids (Iterable[int]): Ids das barbearias
+
+        Returns:
+            Dict[int, CompiledSchedule]: Grade por id
+        """
+        ids = list(dict.fromkeys(int(b) for b in barbearia_ids))
+        if not ids:
+            return {}
+        versions = load_schedule_versions(cursor, ids)
+        out: Dict[int, CompiledSchedule] = {}
+        stale = []
+        with self._lock:
+            for bid in ids:
+                entry = self._entries.get(bid)
+                if entry is not None and entry[0] == versions.get(bid, 0):
+                    self._entries.move_to_end(bid)
+                    out[bid] = entry[1]
+                else:
+                    stale.append(bid)
+        if stale:
+            # A versão foi lida antes da grade: no pior caso a entrada fica mais nova que a versão
+            # e é recarregada na próxima leitura, nunca o contrário
+            compiled = load_compiled_schedules(cursor, stale)
+            with self._lock:
+                for bid in stale:
+                    self._entries[bid] = (versions.get(bid, 0), compiled[bid])
+                    self._entries.move_to_end(bid)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            out.update(compiled)
+        return out
+
+    def invalidate(self, barbearia_id: Any = None) -> None:
+        """Descarta a grade de uma barbearia (ou todas, sem argumento)"""
+        with self._lock:
+            if barbearia_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(int(barbearia_id), None)
+
+
+def build_open_segments(rows: Iterable[Tuple[int, str, int, int]]) -> Dict[str, Tuple[List[int], List[FrozenSet[int]]]]:
+    """
+    Varredura das faixas abertas de cada dia em segmentos contíguos
+
+    Args:
+        rows (Iterable[Tuple]): (barbearia_id, dia, início, fim) em minutos, só de dias 'open'
+
+    Returns:
+        Dict[str, Tuple[List[int], List[FrozenSet[int]]]]: dia -> (inícios dos segmentos,
+            barbearias abertas em cada segmento); o último segmento de cada dia é vazio
+    """
+    events: Dict[str, Dict[int, List[Tuple[int, int]]]] = {}
+    for bid, day, start, end in rows:
+        if start >= end:
+            continue
+        by_minute = events.setdefault(day, {})
+        by_minute.setdefault(start, []).append((bid, 1))
+        by_minute.setdefault(end, []).append((bid, -1))
+
+    segments = {}
+    for day, by_minute in events.items():
+        # Contador por barbearia: faixas sobrepostas da mesma barbearia não a fecham antes da hora
+        depth: Counter = Counter()
+        bounds: List[int] = []
+        sets: List[FrozenSet[int]] = []
+        for minute in sorted(by_minute):
+            for bid, delta in by_minute[minute]:
+                depth[bid] += delta
+                if depth[bid] == 0:
+                    del depth[bid]
+            bounds.append(minute)
+            sets.append(frozenset(depth))
+        segments[day] = (bounds, sets)
+    return segments
+
+
+class OpenIndex:
+    """
+    Índice (dia da semana, minuto do dia) -> barbearias abertas
+
+    Reconstruído a partir de horarios_status/horarios_slots quando a versão global
+    'horarios' (escopo 'global', id 0), incrementada a cada gravação de grade, muda.
+    A consulta é uma busca binária nos segmentos do dia; filtrar uma barbearia é
+    um teste de pertinência no conjunto devolvido.
+    """
+
+    def __init__(self):
+        self._version: Optional[int] = None
+        self._segments: Dict[str, Tuple[List[int], List[FrozenSet[int]]]] = {}
+        self._lock = threading.Lock()
+
+    def _load_version(self, cursor) -> int:
+        cursor.execute("""SELECT versao FROM recurso_versoes
+                          WHERE escopo = 'global' AND escopo_id = 0 AND recurso = 'horarios'""")
+        row = cursor.fetchone()
+        if not row:
+            return 0
+        return int(row['versao'] if isinstance(row, dict) else row[0])
+
+    def _rebuild(self, cursor) -> None:
+        cursor.execute("""SELECT s.barbearia_id, s.dia_semana, s.inicio, s.fim
+                          FROM horarios_slots s
+                          JOIN horarios_status st ON st.barbearia_id = s.barbearia_id
+                                                 AND st.dia_semana = s.dia_semana
+                          WHERE st.status = 'open'""")
+        rows = []
+        for r in cursor.fetchall():
+            bid, day, start, end = (r['barbearia_id'], r['dia_semana'], r['inicio'], r['fim']) \
+                if isinstance(r, dict) else tuple(r)
+            rows.append((int(bid), day, time_to_minutes(start), time_to_minutes(end)))
+        self._segments = build_open_segments(rows)
+
+    def open_at(self, cursor, day: str, minute: int) -> FrozenSet[int]:
+        """
+        Barbearias abertas no dia/minuto informados
+
+        Args:
+            cursor: Cursor MySQL (usado para conferir a versão e, se preciso, reconstruir)
+            day (str): Dia da semana ('monday' ... 'sunday')
+            minute (int): Minuto do dia (0-1439)
+
+        Returns:
+            FrozenSet[int]: Ids das barbearias abertas
+        """
+        version = self._load_version(cursor)
+        with self._lock:
+            if self._version != version:
+                self._rebuild(cursor)
+                self._version = version
+            bounds, sets = self._segments.get(day, ([], []))
+        i = bisect_right(bounds, minute) - 1
+        return sets[i] if i >= 0 else frozenset()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
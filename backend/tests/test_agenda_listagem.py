@@ -0,0 +1,107 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from datetime import date, datetime, timedelta
+import sys
+import os
+
+# Raiz do repositório (onde está app.py)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, _agenda_page_filters, _agenda_next_cursor
+
+
+@pytest.fixture
+def client():
+    """Fixture que cria um cliente de teste do Flask"""
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+def _linhas():
+    return [
+        {'id': 30, 'data_agendamento': date(2026, 5, 10), 'horario_inicio': timedelta(hours=9)},
+        {'id': 29, 'data_agendamento': date(2026, 5, 9), 'horario_inicio': timedelta(hours=14, minutes=30)},
+        {'id': 28, 'data_agendamento': date(2026, 5, 9), 'horario_inicio': timedelta(hours=10)},
+    ]
+
+
+def test_status_so_com_virgulas_nao_gera_in_vazio():
+    where, params, _, _ = _agenda_page_filters({'status': ' , ,'}, 'a.barbearia_id', 7)
+
+    assert not any('IN ()' in cond or 'a.status' in cond for cond in where)
+    assert params == [7]
+
+
+def test_status_com_espacos_e_convertido_para_o_banco():
+    where, params, _, _ = _agenda_page_filters({'status': 'pending, confirmed'}, 'a.barbearia_id', 7)
+
+    assert 'a.status IN (%s, %s)' in where
+    assert params[-2:] == ['pendente', 'confirmado']
+
+
+def test_cursor_ida_e_volta_no_mesmo_scope():
+    linhas = _linhas()
+    cursor = _agenda_next_cursor(linhas, 2, 'history')
+
+    assert len(linhas) == 2
+    where, params, ascending, limit = _agenda_page_filters({'scope': 'history', 'limit': '2', 'cursor': cursor},
+                                                           'a.barbearia_id', 7)
+    assert not ascending and limit == 2
+    assert 'a.data_agendamento <' in where[-1]
+    assert params[-5:] == ['2026-05-09', '2026-05-09', '14:30:00', '14:30:00', 29]
+
+
+def test_cursor_sem_scope_continua_valido_sem_scope():
+    cursor = _agenda_next_cursor(_linhas(), 1)
+
+    where, params, _, _ = _agenda_page_filters({'cursor': cursor}, 'a.barbearia_id', 7)
+    assert params[-1] == 30
+
+
+def test_cursor_de_outro_scope_e_rejeitado():
+    cursor = _agenda_next_cursor(_linhas(), 2, 'history')
+
+    with pytest.raises(ValueError):
+        _agenda_page_filters({'scope': 'upcoming', 'cursor': cursor}, 'a.barbearia_id', 7)
+    with pytest.raises(ValueError):
+        _agenda_page_filters({'cursor': cursor}, 'a.barbearia_id', 7)
+
+
+@patch('app.get_db_connection')
+def test_listagem_com_cursor_de_outro_scope_retorna_400(mock_get_db, client):
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_get_db.return_value = mock_conn
+    mock_conn.cursor.return_value = mock_cursor
+    cursor = _agenda_next_cursor(_linhas(), 2, 'upcoming')
+
+    response = client.get(f'/api/barbearias/7/agendamentos?scope=history&cursor={cursor}')
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    mock_cursor.execute.assert_not_called()
+
+
+@patch('app.get_db_connection')
+def test_listagem_pagina_e_devolve_cursor_do_scope(mock_get_db, client):
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_get_db.return_value = mock_conn
+    mock_conn.cursor.return_value = mock_cursor
+    linhas = [dict(r, cliente_id=1, barbearia_id=7, nome_completo='Ana', telefone='31999990000', nome_servico='Corte',
+                   preco=40, status='confirmado', valor_total=40, observacoes=None) for r in _linhas()]
+    mock_cursor.fetchall.return_value = linhas
+
+    with patch('app.initial_position', return_value=(datetime(2026, 5, 11, 8, 0), 0, 0)):
+        response = client.get('/api/barbearias/7/agendamentos?scope=history&limit=2&status=,')
+    data = response.get_json()
+
+    assert response.status_code == 200, data
+    assert len(data['agendamentos']) == 2
+    sql = mock_cursor.execute.call_args[0][0]
+    assert 'IN ()' not in sql
+    _, params, _, _ = _agenda_page_filters({'scope': 'history', 'cursor': data['nextCursor']}, 'a.barbearia_id', 7)
+    assert params[-1] == 29
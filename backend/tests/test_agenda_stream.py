@@ -0,0 +1,119 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from datetime import date, datetime, timedelta
+import json
+import threading
+import time
+import sys
+import os
+
+# Raiz do repositório (onde está app.py)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app as app_module
+from app import app, _agenda_event_type, _sse_message, _agenda_stream_read, _decode_sync_cursor, _encode_sync_cursor
+
+CRIADO = datetime(2026, 5, 13, 10, 0, 0)
+CORTE = CRIADO + timedelta(minutes=5)
+
+
+@pytest.fixture
+def client():
+    """Fixture que cria um cliente de teste do Flask"""
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+def _parse(mensagem):
+    campos = dict(linha.split(': ', 1) for linha in mensagem.rstrip('\n').split('\n'))
+    return campos['id'], campos['event'], json.loads(campos['data'])
+
+
+def test_tipo_de_evento():
+    assert _agenda_event_type({'status': 'cancelado', 'criado_em': CRIADO, 'atualizado_em': CRIADO}) == 'agendamento_cancelado'
+    assert _agenda_event_type({'status': 'pendente', 'criado_em': CRIADO,
+                               'atualizado_em': CRIADO + timedelta(milliseconds=300)}) == 'agendamento_criado'
+    assert _agenda_event_type({'status': 'confirmado', 'criado_em': CRIADO,
+                               'atualizado_em': CRIADO + timedelta(minutes=2)}) == 'agendamento_atualizado'
+    assert _agenda_event_type({'status': 'pendente', 'criado_em': None, 'atualizado_em': CRIADO}) == 'agendamento_atualizado'
+
+
+def test_mensagem_sse_tem_id_evento_dados_e_linha_em_branco():
+    mensagem = _sse_message('agendamento_criado', 'abc', {'id': 5, 'date': date(2026, 5, 13), 'price': 40.0})
+
+    assert mensagem.endswith('\n\n') and mensagem.count('\n') == 4
+    assert _parse(mensagem) == ('abc', 'agendamento_criado', {'id': 5, 'date': '2026-05-13', 'price': 40.0})
+
+
+@patch('app.get_db_connection')
+def test_leitura_do_feed_gera_eventos_com_cursor_retomavel(mock_get_db):
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_get_db.return_value = mock_conn
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = {'corte': CORTE}
+    linha = {'id': 12, 'barbearia_id': 7, 'nome_completo': 'Ana', 'telefone': '31999990000',
+             'data_agendamento': date(2026, 5, 20), 'horario_inicio': timedelta(hours=9), 'nome_servico': 'Corte',
+             'status': 'pendente', 'valor_total': 40, 'observacoes': None,
+             'criado_em': CRIADO, 'atualizado_em': CRIADO}
+    mock_cursor.fetchall.side_effect = [[linha], [{'id': 4, 'agendamento_id': 9, 'motivo': 'arquivado'}]]
+
+    mensagens, posicao = _agenda_stream_read(7, (CRIADO - timedelta(minutes=1), 0, 1))
+
+    evento_id, tipo, dados = _parse(mensagens[0])
+    assert tipo == 'agendamento_criado' and dados['id'] == 12
+    assert _decode_sync_cursor(evento_id) == (CRIADO, 12, 1)
+    evento_id, tipo, dados = _parse(mensagens[1])
+    assert tipo == 'agendamento_removido' and dados == {'id': 9, 'motivo': 'arquivado'}
+    assert _decode_sync_cursor(evento_id) == (CRIADO, 12, 4)
+    assert posicao == (CRIADO, 12, 4)
+    mock_conn.close.assert_called_once()
+
+
+def test_stream_acima_do_limite_responde_503(client):
+    vagas = threading.BoundedSemaphore(1)
+    vagas.acquire()
+    with patch('app.sse_slots', vagas):
+        response = client.get('/api/barbearias/7/agendamentos/stream')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(app_module.SSE_BUSY_RETRY_SECONDS)
+
+
+def test_stream_le_o_banco_so_ao_ser_acordado_e_libera_a_vaga(client):
+    vagas = threading.BoundedSemaphore(1)
+    posicao = (CORTE, 0, 0)
+    leituras = []
+
+    def leitura(barbearia_id, pos):
+        leituras.append(time.monotonic())
+        return ([_sse_message('agendamento_atualizado', 'c', {'id': 1})] if len(leituras) > 1 else []), posicao
+
+    def publica():
+        time.sleep(0.1)
+        app_module.agenda_events.publish(7)
+
+    with patch('app.sse_slots', vagas), patch('app._agenda_stream_read', side_effect=leitura), \
+            patch('app.SSE_POLL_SECONDS', 60.0), patch('app.SSE_MAX_SECONDS', 0.6), patch('app.SAFETY_LAG_SECONDS', 0):
+        response = client.get(f'/api/barbearias/7/agendamentos/stream?since={_encode_sync_cursor(*posicao)}')
+        threading.Thread(target=publica).start()
+        corpo = response.get_data(as_text=True)
+        response.close()
+
+    assert response.status_code == 200
+    assert corpo.startswith('retry: ')
+    assert 'event: agendamento_atualizado' in corpo
+    # Uma leitura ao conectar e outra após a publicação; nenhuma por intervalo fixo
+    assert len(leituras) == 2
+    assert vagas.acquire(blocking=False)
+    assert app_module.agenda_events.subscriber_count(7) == 0
+
+
+def test_limite_de_streams_sai_do_orcamento_de_threads():
+    if 'SSE_MAX_STREAMS' in os.environ:
+        pytest.skip("limite definido explicitamente no ambiente")
+    assert app_module.SSE_MAX_STREAMS == app_module.WEB_THREADS - app_module.SSE_RESERVED_THREADS
+    assert app_module.SSE_MAX_STREAMS > app_module.SSE_RESERVED_THREADS
@@ -0,0 +1,81 @@
+from unittest.mock import MagicMock
+from datetime import datetime, timedelta
+import sys
+import os
+
+# Raiz do repositório (onde está app.py)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import _agenda_changes, _AGENDA_BARBEARIA_SELECT
+from backend.agenda_sync import SAFETY_LAG_SECONDS, record_removals
+
+INICIO = datetime(2026, 5, 13, 10, 0, 0)
+CORTE = INICIO + timedelta(seconds=30)
+
+
+def _cursor(linhas, lapides):
+    cursor = MagicMock()
+    cursor.fetchone.return_value = {'corte': CORTE}
+    cursor.fetchall.side_effect = [linhas, lapides]
+    return cursor
+
+
+def _linha(i, segundos):
+    return {'id': i, 'atualizado_em': INICIO + timedelta(seconds=segundos)}
+
+
+def test_corte_fica_atras_do_relogio_do_banco_pela_janela_de_seguranca():
+    cursor = _cursor([], [])
+
+    _agenda_changes(cursor, _AGENDA_BARBEARIA_SELECT, 'barbearia_id', 7, (INICIO, 0, 0))
+
+    corte_sql = cursor.execute.call_args_list[0][0][0]
+    assert f"NOW(6) - INTERVAL {SAFETY_LAG_SECONDS} SECOND" in corte_sql
+    linhas_sql, linhas_params = cursor.execute.call_args_list[1][0]
+    assert 'a.atualizado_em <= %s' in linhas_sql
+    assert CORTE in linhas_params
+
+
+def test_cursor_avanca_ate_a_ultima_linha_e_lapide():
+    cursor = _cursor([_linha(4, 2), _linha(2, 5)], [{'id': 11, 'agendamento_id': 8, 'motivo': 'arquivado'}])
+
+    linhas, lapides, posicao, has_more = _agenda_changes(cursor, _AGENDA_BARBEARIA_SELECT, 'barbearia_id', 7,
+                                                         (INICIO, 0, 3))
+
+    assert [r['id'] for r in linhas] == [4, 2]
+    assert [r['agendamento_id'] for r in lapides] == [8]
+    assert posicao == (INICIO + timedelta(seconds=5), 2, 11)
+    assert has_more is False
+
+
+def test_sem_alteracoes_o_cursor_salta_para_o_corte():
+    cursor = _cursor([], [])
+
+    _, _, posicao, has_more = _agenda_changes(cursor, _AGENDA_BARBEARIA_SELECT, 'cliente_id', 3, (INICIO, 9, 5))
+
+    assert posicao == (CORTE, 0, 5)
+    assert has_more is False
+
+
+def test_pagina_cheia_nao_salta_para_o_corte():
+    cursor = _cursor([_linha(1, 1), _linha(2, 2), _linha(3, 3)], [])
+
+    linhas, _, posicao, has_more = _agenda_changes(cursor, _AGENDA_BARBEARIA_SELECT, 'barbearia_id', 7,
+                                                   (INICIO, 0, 0), max_rows=2)
+
+    assert [r['id'] for r in linhas] == [1, 2]
+    assert posicao == (INICIO + timedelta(seconds=2), 2, 0)
+    assert has_more is True
+
+
+def test_lapides_copiam_dono_das_linhas_apagadas():
+    cursor = MagicMock()
+
+    record_removals(cursor, "id IN (%s, %s)", (3, 9), motivo='arquivado')
+
+    sql, params = cursor.execute.call_args[0]
+    assert sql.strip().startswith('INSERT INTO agendamentos_removidos')
+    assert 'FROM agendamentos WHERE id IN (%s, %s)' in sql
+    assert params == ('arquivado', 3, 9)
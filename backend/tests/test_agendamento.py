@@ -69,11 +69,15 @@ def test_agendamento_valido(mock_get_db, client):
     print("   ✅ ID do agendamento retornado corretamente")
     
     # Verificar se o SQL de INSERT foi chamado
-    mock_cursor.execute.assert_called_once()
-    query_arg = mock_cursor.execute.call_args[0][0]
-    assert 'INSERT INTO agendamentos' in query_arg, "❌ A query SQL de INSERT não foi chamada corretamente"
+    queries = [c[0][0] for c in mock_cursor.execute.call_args_list]
+    assert 'INSERT INTO agendamentos' in queries[0], "❌ A query SQL de INSERT não foi chamada corretamente"
     print("   ✅ Query SQL verificada com sucesso")
 
+    # O evento de notificação vai para a outbox na mesma transação
+    assert any('INSERT INTO outbox_eventos' in q for q in queries), "❌ Evento da outbox não foi gravado"
+    mock_conn.commit.assert_called_once()
+    print("   ✅ Evento da outbox gravado antes do commit")
+
 def test_agendamento_dados_invalidos_campos_vazios(client):
     """
     RF06 - Teste de Dados Inválidos
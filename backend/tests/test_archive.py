@@ -0,0 +1,36 @@
+import os
+import sys
+from datetime import date
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.archive import archive_batch, archive_cutoff, run_archiver
+
+
+def test_lote_copia_para_o_arquivo_antes_de_apagar():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{'id': 3}, {'id': 9}]
+
+    assert archive_batch(cursor, date(2025, 9, 1), batch_size=2) == 2
+    sqls = [c[0][0] for c in cursor.execute.call_args_list]
+    assert 'FOR UPDATE' in sqls[0]
+    assert sqls[1].startswith('INSERT INTO agendamentos_arquivo')
+    assert 'INSERT INTO agendamentos_removidos' in sqls[2] and 'id IN (%s, %s)' in sqls[2]
+    assert cursor.execute.call_args_list[2][0][1] == ('arquivado', 3, 9)
+    assert sqls[3].startswith('DELETE FROM agendamentos')
+    assert cursor.execute.call_args_list[3][0][1] == (3, 9)
+
+
+def test_arquivador_para_no_lote_incompleto_com_um_commit_por_lote():
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [[(1,), (2,)], [(3,)]]
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    assert run_archiver(conn, date(2025, 9, 1), batch_size=2, log=lambda m: None) == 3
+    assert conn.commit.call_count == 2
+
+
+def test_corte_respeita_retencao():
+    assert archive_cutoff(date(2026, 3, 10), 180) == date(2025, 9, 11)
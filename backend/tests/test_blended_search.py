@@ -0,0 +1,111 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import app as app_module
+from backend.blended_search import ExternalSearch, external_item, merge_external, name_tokens, similar_names
+
+
+def lugar(place_id, nome, lat, lng):
+    return {'place_id': place_id, 'name': nome, 'vicinity': 'Centro', 'geometry': {'location': {'lat': lat, 'lng': lng}}}
+
+
+def test_nomes_equivalentes_ignoram_termos_genericos():
+    assert similar_names(name_tokens('Barbearia do Zé'), name_tokens('Zé Barber Shop'))
+    assert not similar_names(name_tokens('Barbearia do Zé'), name_tokens('Barbearia Central'))
+    assert not similar_names(name_tokens('Barbearia'), name_tokens('Barbearia Central'))
+
+
+def test_externo_perto_e_com_mesmo_nome_e_descartado():
+    proprias = [{'name': 'Barbearia do Zé', 'latitude': '-19.4700', 'longitude': '-42.5400'}]
+    externos = [external_item(lugar('g1', 'Zé Barber Shop', -19.4705, -42.5402), -19.47, -42.54),
+                external_item(lugar('g2', 'Zé Barber Shop', -19.4900, -42.5400), -19.47, -42.54),
+                external_item(lugar('g3', 'Corte Fino', -19.4701, -42.5401), -19.47, -42.54)]
+
+    assert [i['place_id'] for i in merge_external(proprias, externos)] == ['g2', 'g3']
+
+
+def test_item_externo_sem_coordenadas_e_ignorado():
+    assert external_item({'place_id': 'g1', 'name': 'Sem geometria'}, -19.47, -42.54) is None
+    item = external_item(lugar('g1', 'Corte Fino', -19.47, -42.54), -19.47, -42.54)
+    assert item['external'] and item['distance'] == 0
+
+
+def test_busca_externa_nao_passa_do_orcamento():
+    liberar = threading.Event()
+
+    def fonte(stop):
+        yield lugar('g1', 'Rápida', -19.47, -42.54)
+        liberar.wait(2)
+        yield lugar('g2', 'Lenta', -19.47, -42.54)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        busca = ExternalSearch(fonte, executor, budget=0.1)
+        inicio = time.perf_counter()
+        itens = busca.collect()
+        liberar.set()
+
+    assert time.perf_counter() - inicio < 0.5
+    assert busca.timed_out
+    assert [i['place_id'] for i in itens] == ['g1']
+
+
+def test_falha_externa_devolve_lista_vazia():
+    def fonte(stop):
+        raise RuntimeError('Google fora do ar')
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        busca = ExternalSearch(fonte, executor, budget=1.0)
+        assert busca.collect() == []
+        assert not busca.timed_out
+
+
+def test_cancelar_para_a_fonte_sem_esperar_o_proximo_item():
+    parou = threading.Event()
+
+    def fonte(stop):
+        yield lugar('g1', 'Rápida', -19.47, -42.54)
+        stop.wait(2)
+        parou.set()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        busca = ExternalSearch(fonte, executor, budget=5.0)
+        time.sleep(0.05)
+        inicio = time.perf_counter()
+        busca.cancel()
+        assert parou.wait(1)
+
+    assert time.perf_counter() - inicio < 0.5
+
+
+def test_sem_conexao_com_o_banco_a_busca_externa_nem_comeca():
+    servico = app_module.BarbeariasService()
+    servico.places_service = MagicMock()
+
+    with patch('app.get_db_connection', return_value=None), patch.object(servico, '_start_external_search') as inicio:
+        assert servico.find_nearby_barbearias(-19.47, -42.54, include_external=True) is None
+
+    inicio.assert_not_called()
+
+
+def test_erro_na_consulta_cancela_a_busca_externa():
+    servico = app_module.BarbeariasService()
+    servico.places_service = MagicMock()
+    conn = MagicMock()
+    conn.cursor.return_value.execute.side_effect = RuntimeError('banco caiu')
+    busca = MagicMock()
+
+    with patch('app.get_db_connection', return_value=conn), \
+            patch.object(servico, '_start_external_search', return_value=busca):
+        with pytest.raises(RuntimeError):
+            servico.find_nearby_barbearias(-19.47, -42.54, include_external=True)
+
+    busca.cancel.assert_called_once()
+    busca.collect.assert_not_called()
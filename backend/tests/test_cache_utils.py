@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.cache_utils import PrefixCache, SingleFlight, TTLCache, normalize_query
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_normalizacao_preserva_o_prefixo():
+    assert normalize_query('  Av. Selim   José de SALES ') == 'av selim jose de sales'
+    assert normalize_query('Timóteo') == 'timoteo'
+
+
+def test_ttl_cache_expira_e_descarta_o_menos_usado():
+    relogio = Relogio()
+    cache = TTLCache(max_entries=2, ttl=10, clock=relogio)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == (True, 1)
+    cache.set('c', 3)  # 'b' é o menos usado
+
+    assert cache.get('b') == (False, None)
+    relogio.agora += 11
+    assert cache.get('a') == (False, None)
+    assert cache.snapshot()['entradas'] == 1
+
+
+def test_single_flight_coalesce_chamadas_simultaneas():
+    flight = SingleFlight()
+    liberar = threading.Event()
+    chamadas = []
+
+    def consulta():
+        chamadas.append(1)
+        liberar.wait(2)
+        return ['Rua A']
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(flight.do('rua', consulta))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while flight.coalesced < 4:
+        time.sleep(0.01)
+    liberar.set()
+    for t in threads:
+        t.join()
+
+    assert len(chamadas) == 1
+    assert resultados == [['Rua A']] * 5
+
+
+def test_single_flight_repassa_o_erro_e_libera_a_chave():
+    flight = SingleFlight()
+
+    def falha():
+        raise RuntimeError('provedor fora')
+
+    with pytest.raises(RuntimeError):
+        flight.do('x', falha)
+    assert flight.do('x', lambda: 42) == 42
+
+
+def test_prefixo_completo_atende_consulta_mais_longa():
+    cache = PrefixCache()
+    cache.put('nominatim', 'rua dia', ['Rua Diamantina, Centro, Ipatinga', 'Rua Dias Gomes, Veneza, Ipatinga'],
+              complete=True)
+
+    assert cache.get('nominatim', 'Rua Diam') == ['Rua Diamantina, Centro, Ipatinga']
+    assert cache.get('nominatim', 'rua dias gomes') == ['Rua Dias Gomes, Veneza, Ipatinga']
+    assert cache.snapshot()['acertos_por_prefixo'] == 2
+
+
+def test_prefixo_cortado_no_limite_vai_ao_provedor():
+    cache = PrefixCache()
+    cache.put('google', 'rua', ['Rua A', 'Rua B'], complete=False)
+
+    assert cache.get('google', 'rua') == ['Rua A', 'Rua B']
+    assert cache.get('google', 'rua a') is None
+    assert cache.get('nominatim', 'rua') is None
+
+
+def test_prefixo_vencido_nao_e_usado():
+    relogio = Relogio()
+    cache = PrefixCache(ttl=60, clock=relogio)
+    cache.put('nominatim', 'rua dia', ['Rua Diamantina'], complete=True)
+    relogio.agora += 61
+
+    assert cache.get('nominatim', 'rua diam') is None
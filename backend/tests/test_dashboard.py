@@ -0,0 +1,81 @@
+from unittest.mock import MagicMock
+from datetime import datetime
+from decimal import Decimal
+import sys
+import os
+
+# Raiz do repositório (onde está app.py)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import _dashboard_summary, ARCHIVE_TABLE
+
+# Quarta-feira, 13/05/2026: semana desde 11/05, mês desde 01/05
+AGORA = datetime(2026, 5, 13, 10, 30)
+
+
+def _sqls(cursor):
+    return [c[0][0] for c in cursor.execute.call_args_list]
+
+
+def test_resumo_da_barbearia_soma_rollup_do_passado_com_o_dia_atual():
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [
+        # metricas_diarias (dias anteriores a hoje)
+        {'total': 40, 'pendente': 2, 'confirmado': 5, 'cancelado': 3, 'concluido': 30,
+         'receita_semana': Decimal('120.00'), 'receita_mes': Decimal('800.00'), 'receita_total': Decimal('1500.00')},
+        # agendamentos de hoje em diante
+        {'total': 6, 'pendente': 3, 'confirmado': 2, 'cancelado': 0, 'concluido': 1, 'hoje': 4,
+         'receita_dia': Decimal('50.00'), 'receita_total': Decimal('50.00'), 'clientes': 9},
+        # avaliacoes_resumo
+        {'qtd_1': 0, 'qtd_2': 0, 'qtd_3': 1, 'qtd_4': 1, 'qtd_5': 2, 'total': 4, 'soma_notas': Decimal('17.5')},
+    ]
+
+    resumo = _dashboard_summary(cursor, 'barbearia_id', 7, AGORA)
+
+    assert resumo['totalAppointments'] == 46
+    assert resumo['statusCounts'] == {'pending': 5, 'confirmed': 7, 'cancelled': 3, 'completed': 31}
+    assert resumo['todayCount'] == 4
+    assert resumo['revenue'] == {'day': 50.0, 'week': 170.0, 'month': 850.0, 'total': 1550.0}
+    assert resumo['averageRating'] == 4.38
+    assert resumo['totalReviews'] == 4
+    assert resumo['activeClients'] == 9
+
+    rollup_sql, atual_sql, notas_sql = _sqls(cursor)
+    assert 'FROM metricas_diarias' in rollup_sql and 'dia < %s' in rollup_sql
+    assert cursor.execute.call_args_list[0][0][1] == (datetime(2026, 5, 11).date(), datetime(2026, 5, 1).date(),
+                                                      7, AGORA.date())
+    assert 'FROM agendamentos' in atual_sql and ARCHIVE_TABLE not in atual_sql
+    assert 'FROM avaliacoes_resumo' in notas_sql
+
+
+def test_resumo_da_barbearia_sem_historico():
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [None, None, None]
+
+    resumo = _dashboard_summary(cursor, 'barbearia_id', 7, AGORA)
+
+    assert resumo['totalAppointments'] == 0
+    assert resumo['revenue'] == {'day': 0.0, 'week': 0.0, 'month': 0.0, 'total': 0.0}
+    assert resumo['averageRating'] is None
+    assert resumo['totalReviews'] == 0
+
+
+def test_resumo_do_cliente_agrega_o_proprio_historico_com_arquivo():
+    cursor = MagicMock()
+    cursor.fetchone.return_value = {
+        'total': 3, 'pendente': 1, 'confirmado': 0, 'cancelado': 0, 'concluido': 2, 'hoje': 1,
+        'receita_dia': 0, 'receita_semana': Decimal('35.00'), 'receita_mes': Decimal('80.00'),
+        'receita_total': Decimal('80.00'), 'clientes': 1, 'media_avaliacao': Decimal('4.5'), 'total_avaliacoes': 2,
+    }
+
+    resumo = _dashboard_summary(cursor, 'cliente_id', 3, AGORA)
+
+    assert resumo['totalAppointments'] == 3
+    assert resumo['revenue']['month'] == 80.0
+    assert resumo['averageRating'] == 4.5
+    assert resumo['totalReviews'] == 2
+    (sql,) = _sqls(cursor)
+    assert 'cliente_id = %s' in sql and ARCHIVE_TABLE in sql
+    assert 'metricas_diarias' not in sql
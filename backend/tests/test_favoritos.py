@@ -0,0 +1,115 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from decimal import Decimal
+import sys
+import os
+
+# Raiz do repositório (onde está app.py)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, _FAVORITOS_STATUS_MAX
+
+
+@pytest.fixture
+def client():
+    """Fixture que cria um cliente de teste do Flask"""
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+def _conexao():
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    return mock_conn, mock_cursor
+
+
+def _barbearia(i, nome, total=None, soma=None):
+    return {'id': i, 'nome_barbearia': nome, 'logradouro': 'Rua Diamantina', 'numero': str(i), 'bairro': 'Centro',
+            'cidade': 'Ipatinga', 'estado': 'MG', 'whatsapp': '31988887777',
+            'total_avaliacoes': total, 'soma_notas': soma}
+
+
+@patch('app.get_db_connection')
+def test_lista_de_favoritos_monta_notas_do_resumo_e_servicos_em_duas_consultas(mock_get_db, client):
+    mock_conn, mock_cursor = _conexao()
+    # Sem conexão para o ETag a rota responde sem cache condicional
+    mock_get_db.side_effect = [None, mock_conn]
+    mock_cursor.fetchall.side_effect = [
+        [_barbearia(7, 'Barbearia do Zé', total=4, soma=Decimal('17.5')), _barbearia(3, 'Corte Fino')],
+        [{'barbearia_id': 7, 'nome_servico': 'Corte'}, {'barbearia_id': 7, 'nome_servico': 'Barba'}],
+    ]
+
+    response = client.get('/api/clientes/1/favoritos')
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert [f['id'] for f in data['favoritos']] == ['7', '3']
+    ze, fino = data['favoritos']
+    assert ze['rating'] == 4.4 and ze['totalReviews'] == 4
+    assert ze['services'] == ['Corte', 'Barba']
+    assert ze['address'] == 'Rua Diamantina, 7, Centro, Ipatinga, MG'
+    assert fino['rating'] is None and fino['totalReviews'] == 0 and fino['services'] == []
+    sqls = [c[0][0] for c in mock_cursor.execute.call_args_list]
+    assert len(sqls) == 2
+    assert 'avaliacoes_resumo' in sqls[0] and 'ROW_NUMBER()' in sqls[1]
+
+
+@patch('app.get_db_connection')
+def test_lista_de_favoritos_vazia_nao_busca_servicos(mock_get_db, client):
+    mock_conn, mock_cursor = _conexao()
+    mock_get_db.side_effect = [None, mock_conn]
+    mock_cursor.fetchall.return_value = []
+
+    response = client.get('/api/clientes/1/favoritos')
+
+    assert response.get_json() == {'success': True, 'favoritos': []}
+    assert mock_cursor.execute.call_count == 1
+    mock_conn.close.assert_called_once()
+
+
+@patch('app.get_db_connection')
+def test_status_em_lote_ignora_ids_repetidos_e_desconhecidos(mock_get_db, client):
+    mock_conn, mock_cursor = _conexao()
+    mock_get_db.return_value = mock_conn
+    mock_cursor.fetchall.return_value = [(3,)]
+
+    response = client.get('/api/clientes/1/favoritos/status?ids=3,99,3, 1,')
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data['favoritos'] == [3]
+    sql, params = mock_cursor.execute.call_args[0]
+    assert 'IN (%s, %s, %s)' in sql
+    assert params == (1, 1, 3, 99)
+
+
+@patch('app.get_db_connection')
+def test_status_em_lote_sem_ids_nao_consulta_o_banco(mock_get_db, client):
+    response = client.get('/api/clientes/1/favoritos/status?ids=,')
+
+    assert response.get_json() == {'success': True, 'favoritos': []}
+    mock_get_db.assert_not_called()
+
+
+@patch('app.get_db_connection')
+def test_status_em_lote_rejeita_ids_invalidos_ou_demais(mock_get_db, client):
+    assert client.get('/api/clientes/1/favoritos/status?ids=3,abc').status_code == 400
+    muitos = ','.join(str(i) for i in range(_FAVORITOS_STATUS_MAX + 1))
+    assert client.get(f'/api/clientes/1/favoritos/status?ids={muitos}').status_code == 400
+    mock_get_db.assert_not_called()
+
+
+@patch('app.get_db_connection')
+def test_status_de_uma_barbearia(mock_get_db, client):
+    mock_conn, mock_cursor = _conexao()
+    mock_get_db.return_value = mock_conn
+    mock_cursor.fetchone.return_value = None
+
+    response = client.get('/api/clientes/1/favoritos/7')
+
+    assert response.get_json() == {'success': True, 'favorito': False}
+    assert mock_cursor.execute.call_args[0][1] == (1, 7)
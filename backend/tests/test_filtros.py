@@ -0,0 +1,44 @@
+import pytest
+import sys
+import os
+
+# Raiz do repositório (onde está app.py)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, FilterOptions
+
+
+@pytest.fixture
+def client():
+    """Fixture que cria um cliente de teste do Flask"""
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+def test_servicos_em_lista():
+    assert FilterOptions.from_request({'services': ['Corte', ' Barba ', '']}).services == ['corte', 'barba']
+
+
+def test_servicos_em_texto_sao_separados_por_virgula():
+    filtros = FilterOptions.from_request({'services': 'Corte, Barba,'})
+
+    assert filtros.services == ['corte', 'barba']
+    assert filtros.accepts({'services': ['Corte masculino', 'Barba']})
+    assert not filtros.accepts({'services': ['Corte masculino']})
+
+
+def test_servicos_vazios_nao_filtram():
+    assert FilterOptions.from_request({'services': ' , '}).services is None
+    assert FilterOptions.from_request({'services': []}).services is None
+
+
+def test_servicos_em_formato_invalido_sao_rejeitados(client):
+    with pytest.raises(ValueError):
+        FilterOptions.from_request({'services': {'corte': True}})
+
+    response = client.post('/api/barbearias/nearby', json={'latitude': -19.46, 'longitude': -42.54, 'services': 5})
+    assert response.status_code == 400
+    assert 'services' in response.get_json()['message']
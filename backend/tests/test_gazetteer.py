@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend import gazetteer
+from backend.gazetteer import Gazetteer, build
+from backend.geocoding import request_geocode, STATUS_OK
+
+LINHAS = [
+    {'cep': '35160-011', 'logradouro': 'Av. Pedro Linhares Gomes', 'bairro': 'Centro', 'cidade': 'Ipatinga',
+     'uf': 'MG', 'lat': '-19.468200', 'lng': '-42.536700'},
+    {'cep': '35180-000', 'logradouro': '', 'bairro': '', 'cidade': 'Timóteo', 'uf': 'MG',
+     'lat': '-19.582100', 'lng': '-42.644300'},
+    # Belo Horizonte: fora do viewbox do Vale do Aço
+    {'cep': '30130-000', 'logradouro': 'Av. Afonso Pena', 'bairro': 'Centro', 'cidade': 'Belo Horizonte',
+     'uf': 'MG', 'lat': '-19.919000', 'lng': '-43.938600'},
+]
+
+
+def _gazetteer(tmp_path):
+    caminho = str(tmp_path / 'gazetteer.bin')
+    contagens = build(LINHAS, caminho)
+    return Gazetteer(caminho), contagens
+
+
+def test_compila_so_a_regiao_atendida(tmp_path):
+    gaz, contagens = _gazetteer(tmp_path)
+
+    assert contagens == {'ceps': 2, 'logradouros': 1, 'descartadas': 1}
+    assert gaz.lookup_cep('30130000') is None
+
+
+def test_logradouro_normalizado_e_cep_como_reserva(tmp_path):
+    gaz, _ = _gazetteer(tmp_path)
+
+    assert gaz.lookup({'logradouro': 'avenida pedro linhares gomes', 'bairro': 'CENTRO',
+                       'cidade': 'Ipatinga'}) == (-19.4682, -42.5367)
+    assert gaz.lookup({'logradouro': 'Rua Desconhecida', 'cidade': 'Ipatinga', 'cep': '35160-011'}) == \
+        (-19.4682, -42.5367)
+    assert gaz.lookup({'logradouro': 'Rua Desconhecida', 'cidade': 'Timóteo'}) is None
+
+
+def test_cep_geral_de_cidade_nao_e_usado_como_localizacao(tmp_path):
+    gaz, _ = _gazetteer(tmp_path)
+
+    assert gaz.lookup_cep('35180-000') == (-19.5821, -42.6443)
+    assert gaz.lookup({'logradouro': 'Rua Desconhecida', 'cidade': 'Timóteo', 'cep': '35180-000'}) is None
+
+
+def test_arquivo_ausente_e_um_gazetteer_vazio(tmp_path):
+    assert Gazetteer(str(tmp_path / 'nao_existe.bin')).lookup({'cep': '35160011'}) is None
+
+
+def test_acerto_offline_grava_coordenadas_sem_enfileirar(tmp_path):
+    gaz, _ = _gazetteer(tmp_path)
+    cursor = MagicMock()
+    with patch('backend.geocoding.get_gazetteer', return_value=gaz):
+        status = request_geocode(cursor, 4, {'logradouro': 'Rua X', 'cidade': 'Ipatinga', 'cep': '35160-011'})
+
+    assert status == STATUS_OK
+    sqls = [c[0][0] for c in cursor.execute.call_args_list]
+    assert len(sqls) == 1 and 'latitude' in sqls[0]
+
+
+def test_compilacoes_simultaneas_nao_compartilham_o_temporario(tmp_path):
+    caminho = str(tmp_path / 'gazetteer.bin')
+    threads = [threading.Thread(target=build, args=(LINHAS * 200, caminho)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert os.listdir(tmp_path) == ['gazetteer.bin']
+    assert Gazetteer(caminho).lookup_cep('35160-011') == (-19.4682, -42.5367)
+
+
+def test_sem_a_base_da_regiao_nada_e_compilado(tmp_path):
+    caminho = str(tmp_path / 'gazetteer.bin')
+    with patch('backend.gazetteer.CSV_PATH', str(tmp_path / 'ausente.csv')), \
+            patch('backend.gazetteer.BIN_PATH', caminho), patch('backend.gazetteer._shared', None):
+        gaz = gazetteer.get_gazetteer()
+
+    assert len(gaz) == 0 and not os.path.exists(caminho)
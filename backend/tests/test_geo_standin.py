@@ -0,0 +1,79 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend import geocoding, resilience
+from backend.geo_standin import FixtureStore, StandinConfig, start
+from backend.google_places_integration import GooglePlacesAPI
+
+DETALHES = {'status': 'OK', 'result': {'place_id': 'p1', 'formatted_address': 'Rua A, 10, Ipatinga - MG',
+                                       'name': 'Barbearia A', 'geometry': {'location': {'lat': -19.47, 'lng': -42.54}}}}
+NOMINATIM = [{'lat': '-19.4680', 'lon': '-42.5370', 'display_name': 'Rua Diamantina, Centro, Ipatinga, Minas Gerais'}]
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    store = FixtureStore(str(tmp_path / 'geo.json'))
+    store.add('/maps/api/place/details/json', [('place_id', 'p1'), ('language', 'pt-BR'),
+                                               ('fields', 'place_id,name,formatted_address,geometry,types,rating,price_level')],
+              200, DETALHES)
+    store.add('/search', [('q', 'Rua Diamantina, Ipatinga'), ('format', 'json'), ('limit', '1')], 200, NOMINATIM)
+    return store
+
+
+@pytest.fixture
+def standin(fixtures):
+    resilience._guards.clear()
+    server = start(fixtures, StandinConfig(seed=1))
+    yield server
+    server.shutdown()
+    server.server_close()
+    resilience._guards.clear()
+
+
+def test_fixtures_sao_gravadas_e_relidas_sem_a_api_key(fixtures):
+    relida = FixtureStore(fixtures.path)
+
+    assert len(relida) == 2
+    assert relida.get('/search', [('limit', '1'), ('format', 'json'), ('q', 'rua diamantina ipatinga')])
+
+
+def test_google_places_reproduz_a_fixture(standin):
+    api = GooglePlacesAPI('qualquer-chave', base_url=f"{standin.base_url}/maps/api")
+
+    detalhes = api.get_place_details('p1')
+
+    assert detalhes.name == 'Barbearia A'
+    assert api.geocode_with_status('Endereço sem fixture')[0] == 'ZERO_RESULTS'
+    assert standin.stats['fixtures'] == 1 and standin.stats['sem_fixture'] == 1
+
+
+def test_nominatim_usa_o_dominio_configurado(standin, monkeypatch):
+    monkeypatch.setattr(geocoding, 'NOMINATIM_DOMAIN', standin.base_url.split('://')[1])
+    monkeypatch.setattr(geocoding, 'NOMINATIM_SCHEME', 'http')
+    monkeypatch.setattr(geocoding, '_geolocator', None)
+
+    assert geocoding.nominatim_geocode('Rua Diamantina, Ipatinga') == (-19.468, -42.537)
+
+
+def test_erro_e_limite_injetados(standin):
+    api = GooglePlacesAPI('qualquer-chave', base_url=f"{standin.base_url}/maps/api")
+    standin.config.error_rate = 1.0
+    assert api.get_place_details('p1') is None
+
+    standin.config.error_rate, standin.config.throttle_rate = 0.0, 1.0
+    api.cache = type(api.cache)()
+    resilience._guards.clear()
+    api.guard = resilience.get_guard(resilience.UPSTREAM_GOOGLE)
+    assert api.get_place_details('p1') is None
+    assert api.guard.breaker.state == 'aberto'
+    assert standin.stats['erros_injetados'] == 1 and standin.stats['limites_injetados'] == 1
+
+
+def test_latencia_configurada():
+    config = StandinConfig(latency_ms=100, jitter_ms=20, seed=3)
+
+    assert all(0.08 <= config.delay() <= 0.12 for _ in range(50))
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.geocode_backfill import Backfill, FixtureGeocoder, Throttle
+
+BARBEARIAS = [
+    {'id': 3, 'logradouro': 'Rua A', 'numero': '1', 'bairro': 'Centro', 'cidade': 'Ipatinga', 'estado': 'MG', 'cep': None},
+    {'id': 5, 'logradouro': 'Rua Inexistente', 'numero': None, 'bairro': None, 'cidade': 'Timóteo', 'estado': 'MG', 'cep': None},
+    {'id': 8, 'logradouro': None, 'numero': None, 'bairro': None, 'cidade': None, 'estado': None, 'cep': None},
+    {'id': 9, 'logradouro': 'Rua B', 'numero': '2', 'bairro': 'Bom Retiro', 'cidade': 'Ipatinga', 'estado': 'MG', 'cep': None},
+]
+
+FIXTURES = {'Rua A, 1, Centro, Ipatinga, MG, Brasil': [-19.47, -42.53],
+            'Rua B, 2, Bom Retiro, Ipatinga, MG, Brasil': [-19.48, -42.55]}
+
+
+class BancoFalso:
+    """Devolve as barbearias com id > cursor do checkpoint, como a consulta por chave"""
+
+    def __init__(self):
+        self.gravadas = {}
+        self.status = {}
+
+    def conexao(self):
+        cursor = MagicMock()
+        pendente = []
+
+        def execute(sql, params=None):
+            if sql.lstrip().startswith('SELECT'):
+                _, depois_de, limite = params
+                pendente.append([b for b in BARBEARIAS if b['id'] > depois_de][:limite])
+            elif 'SET latitude = NULL' in sql:
+                self.gravadas[params[1]] = None
+                self.status[params[1]] = params[0]
+            elif 'SET latitude' in sql:
+                self.gravadas[params[3]] = (params[0], params[1])
+            elif 'SET geocode_status' in sql:
+                self.status[params[1]] = params[0]
+        cursor.execute.side_effect = execute
+        cursor.fetchall.side_effect = lambda: pendente.pop(0)
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+        return conn
+
+
+@pytest.fixture(autouse=True)
+def sem_gazetteer():
+    with patch('backend.geocoding.offline_geocode', return_value=None):
+        yield
+
+
+def test_backfill_resolve_marca_falhas_e_relata(tmp_path):
+    banco, geocoder = BancoFalso(), FixtureGeocoder(FIXTURES)
+    relatorio = Backfill(banco.conexao, geocoder, str(tmp_path / 'cp.json'), batch_size=2, log=lambda m: None).run()
+
+    assert banco.gravadas == {3: (-19.47, -42.53), 9: (-19.48, -42.55), 8: None}
+    assert banco.status == {5: 'falhou', 8: 'sem_endereco'}
+    assert (relatorio['resolvidos'], relatorio['nao_encontrados'], relatorio['sem_endereco']) == (2, 1, 1)
+    assert relatorio['nesta_execucao'] == 4 and geocoder.calls == 3
+
+
+def test_execucao_interrompida_continua_do_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / 'cp.json')
+    banco, geocoder = BancoFalso(), FixtureGeocoder(FIXTURES)
+
+    Backfill(banco.conexao, geocoder, checkpoint, batch_size=2, log=lambda m: None).run(limit=2)
+    assert json.load(open(checkpoint))['ultimo_id'] == 5
+
+    relatorio = Backfill(banco.conexao, geocoder, checkpoint, batch_size=2, log=lambda m: None).run()
+    assert relatorio['nesta_execucao'] == 2 and relatorio['processados'] == 4
+    assert geocoder.calls == 3  # nenhum endereço geocodificado duas vezes
+
+
+def test_erro_do_geocoder_nao_interrompe_o_lote(tmp_path):
+    def instavel(endereco):
+        if 'Rua A' in endereco:
+            raise TimeoutError('sem resposta')
+        return None
+
+    banco = BancoFalso()
+    relatorio = Backfill(banco.conexao, instavel, str(tmp_path / 'cp.json'), log=lambda m: None).run()
+    assert relatorio['erros'] == 1 and relatorio['ids_com_erro'] == [3]
+    assert relatorio['processados'] == 4
+
+
+def test_throttle_espaca_as_chamadas():
+    agora, esperas = [0.0], []
+
+    def dormir(s):
+        esperas.append(s)
+        agora[0] += s
+
+    throttle = Throttle(2.0, clock=lambda: agora[0], sleep=dormir)
+    for _ in range(3):
+        throttle.wait()
+    assert esperas == [0.5, 0.5]
@@ -0,0 +1,97 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.geocode_cache import GeocodeCache, normalize_address
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1_000_000.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio():
+    return Relogio()
+
+
+@pytest.fixture
+def cache(tmp_path, relogio):
+    return GeocodeCache(str(tmp_path / 'geo.sqlite3'), ttl=3600, negative_ttl=60, clock=relogio)
+
+
+def test_enderecos_equivalentes_tem_a_mesma_chave():
+    assert normalize_address('Av. Pedro Linhares Gomes, nº 100 - Centro') == \
+        normalize_address('avenida  pedro linhares gomes, 100, CENTRO')
+    assert normalize_address('Praça Timóteo') == 'praca timoteo'
+
+
+def test_abreviacao_so_expande_no_tipo_de_logradouro_ou_com_ponto():
+    assert normalize_address('Av Brasil, 10') == 'avenida brasil 10'
+    assert normalize_address('Rua Est. Velha') == 'rua estrada velha'
+    assert normalize_address('Rua Est Velha') == 'rua est velha'
+    assert normalize_address('Rua B, Bairro N') == 'rua b bairro n'
+    assert normalize_address('R. Diamantina') == 'r diamantina'
+
+
+def test_marcador_de_numero_so_sai_antes_de_digitos():
+    assert normalize_address('Rua Sete, n. 45') == normalize_address('Rua Sete, nº 45') == 'rua sete 45'
+    assert normalize_address('Rua N 12') == 'rua 12'
+    assert normalize_address('Rua N, 12') == 'rua n 12'
+
+
+def test_cada_geocoder_tem_as_proprias_entradas(cache):
+    nominatim = MagicMock(return_value=None)
+    google = MagicMock(return_value=(-19.47, -42.53))
+
+    assert cache.lookup('Rua D, 5, Ipatinga', nominatim, origem='nominatim') is None
+    assert cache.lookup('Rua D, 5, Ipatinga', google, origem='google') == (-19.47, -42.53)
+    assert cache.lookup('Rua D, 5, Ipatinga', nominatim, origem='nominatim') is None
+    assert nominatim.call_count == 1 and google.call_count == 1
+
+
+def test_segunda_consulta_nao_chama_o_geocoder(cache):
+    geocoder = MagicMock(return_value=(-19.47, -42.53))
+
+    assert cache.lookup('Rua A, 10, Ipatinga', geocoder) == (-19.47, -42.53)
+    assert cache.lookup('rua a 10 ipatinga', geocoder) == (-19.47, -42.53)
+    geocoder.assert_called_once()
+    stats = cache.snapshot()
+    assert stats['acertos'] == 1 and stats['faltas'] == 1 and stats['entradas'] == 1
+
+
+def test_cache_negativo_expira_antes_do_positivo(cache, relogio):
+    geocoder = MagicMock(return_value=None)
+
+    assert cache.lookup('Rua Inexistente', geocoder) is None
+    assert cache.lookup('Rua Inexistente', geocoder) is None
+    assert geocoder.call_count == 1
+    assert cache.snapshot()['acertos_negativos'] == 1
+
+    relogio.agora += 61
+    cache.lookup('Rua Inexistente', geocoder)
+    assert geocoder.call_count == 2
+
+
+def test_erro_do_geocoder_nao_e_guardado(cache):
+    geocoder = MagicMock(side_effect=[TimeoutError('lento'), (-19.5, -42.6)])
+
+    with pytest.raises(TimeoutError):
+        cache.lookup('Rua B', geocoder)
+    assert cache.lookup('Rua B', geocoder) == (-19.5, -42.6)
+    assert cache.snapshot()['erros'] == 1
+
+
+def test_persiste_entre_instancias(tmp_path, relogio):
+    caminho = str(tmp_path / 'geo.sqlite3')
+    GeocodeCache(caminho, clock=relogio).put('Rua C', (-19.4, -42.5), 'nominatim')
+
+    assert GeocodeCache(caminho, clock=relogio).get('rua c', 'nominatim') == (True, (-19.4, -42.5))
+    assert GeocodeCache(caminho, clock=relogio).get('rua c', 'google') == (False, None)
@@ -0,0 +1,190 @@
+import json
+import os
+import sys
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.geocoding import (GeocodeHandler, request_geocode, build_address, EVENTO_GEOCODIFICAR,
+                               STATUS_OK, STATUS_FALHOU, STATUS_PENDENTE)
+from backend.outbox import OutboxWorker
+
+AGORA = datetime(2026, 3, 10, 12, 0, 0)
+
+LINHA = {'id': 4, 'logradouro': 'Av. Pedro Linhares Gomes', 'numero': '100', 'bairro': 'Centro',
+         'cidade': 'Ipatinga', 'estado': 'MG'}
+ENDERECO = build_address(LINHA)
+
+
+@pytest.fixture(autouse=True)
+def sem_gazetteer():
+    # Sem o gazetteer real: a suíte não compila nem lê instance/gazetteer.bin
+    with patch('backend.geocoding.offline_geocode', return_value=None):
+        yield
+
+
+def _evento(endereco=ENDERECO, tentativas=0):
+    return {'id': 9, 'tipo_evento': EVENTO_GEOCODIFICAR, 'agregado_id': 4,
+            'payload': json.dumps({'endereco': endereco}), 'tentativas': tentativas}
+
+
+def _sqls(cursor):
+    return [c[0] for c in cursor.execute.call_args_list]
+
+
+def _executar(handler, cursor, evento):
+    """Os três passos do worker: leitura, geocodificação e gravação"""
+    handler.handle(cursor, evento, handler.resolve(evento, handler.prepare(cursor, evento)))
+
+
+def test_endereco_vazio_nao_enfileira_e_apaga_coordenadas():
+    cursor = MagicMock()
+    assert request_geocode(cursor, 4, {'cidade': '  '}) == 'sem_endereco'
+    assert not any('outbox_eventos' in sql for sql, _ in _sqls(cursor))
+    sql, params = _sqls(cursor)[-1]
+    assert 'latitude = NULL' in sql and params == ('sem_endereco', 4)
+
+
+def test_cadastro_enfileira_na_mesma_transacao():
+    cursor = MagicMock()
+    assert request_geocode(cursor, 4, LINHA) == STATUS_PENDENTE
+    sql, params = _sqls(cursor)[-1]
+    assert 'outbox_eventos' in sql and params[0] == EVENTO_GEOCODIFICAR and params[1] == 4
+    assert json.loads(params[2]) == {'endereco': ENDERECO}
+
+
+def test_job_grava_coordenadas_e_invalida_perfil():
+    cursor = MagicMock()
+    cursor.fetchone.return_value = LINHA
+    _executar(GeocodeHandler(lambda endereco: (-19.47, -42.53)), cursor, _evento())
+
+    sqls = _sqls(cursor)
+    assert 'FOR UPDATE' not in sqls[0][0] and 'FOR UPDATE' in sqls[1][0]
+    assert sqls[2][1] == (-19.47, -42.53, STATUS_OK, 4)
+    assert 'recurso_versoes' in sqls[3][0]
+
+
+def test_job_de_endereco_antigo_e_ignorado():
+    geocoder = MagicMock()
+    cursor = MagicMock()
+    cursor.fetchone.return_value = LINHA
+    _executar(GeocodeHandler(geocoder), cursor, _evento(endereco='Rua Velha, Timóteo, MG, Brasil'))
+    geocoder.assert_not_called()
+    assert len(_sqls(cursor)) == 1
+
+
+def test_endereco_alterado_durante_a_geocodificacao_nao_e_gravado():
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = [LINHA, dict(LINHA, numero='200')]
+    _executar(GeocodeHandler(lambda endereco: (-19.47, -42.53)), cursor, _evento())
+
+    assert not any(sql.lstrip().startswith('UPDATE') for sql, _ in _sqls(cursor))
+
+
+def test_endereco_apagado_antes_do_job_zera_coordenadas():
+    sem_endereco = {'id': 4, 'logradouro': None, 'numero': '', 'bairro': None, 'cidade': ' ', 'estado': None}
+    geocoder = MagicMock()
+    cursor = MagicMock()
+    cursor.fetchone.return_value = sem_endereco
+    _executar(GeocodeHandler(geocoder), cursor, _evento())
+
+    geocoder.assert_not_called()
+    sqls = _sqls(cursor)
+    assert 'latitude = NULL' in sqls[2][0] and sqls[2][1] == ('sem_endereco', 4)
+    assert 'recurso_versoes' in sqls[3][0]
+
+
+def test_worker_geocodifica_sem_transacao_aberta():
+    ordem = []
+
+    def geocoder(endereco):
+        ordem.append('geocode')
+        return (-19.47, -42.53)
+
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [_evento()]
+    cursor.fetchone.return_value = LINHA
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    conn.commit.side_effect = lambda: ordem.append('commit')
+    worker = OutboxWorker(lambda: conn, [], clock=lambda: AGORA,
+                          handlers={EVENTO_GEOCODIFICAR: GeocodeHandler(geocoder)})
+
+    assert worker.run_once() == 1
+    # Reserva, fim da leitura do lote, fim da leitura do endereço | geocodificação | gravação
+    assert ordem == ['commit', 'commit', 'commit', 'geocode', 'commit']
+
+
+def test_falha_do_geocoder_reagenda_e_esgotamento_marca_falhou():
+    def fora_do_ar(endereco):
+        raise TimeoutError("Nominatim não respondeu")
+
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [_evento(tentativas=7)]
+    cursor.fetchone.return_value = LINHA
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    worker = OutboxWorker(lambda: conn, [], clock=lambda: AGORA, max_attempts=8,
+                          handlers={EVENTO_GEOCODIFICAR: GeocodeHandler(fora_do_ar)})
+
+    assert worker.run_once() == 1
+    sqls = _sqls(cursor)
+    assert any('geocode_status' in sql and params[:2] == (STATUS_FALHOU, 4) for sql, params in sqls[1:])
+    assert any("status = 'falhou'" in sql for sql, _ in sqls)
+    # Eventos com handler não carregam o contexto de agendamento
+    assert not any('FROM agendamentos' in sql for sql, _ in sqls)
+
+
+@patch('app.get_db_connection')
+def test_cadastro_sem_endereco_nao_pede_geocodificacao(mock_get_db):
+    from app import app
+    mock_conn, cursor = MagicMock(), MagicMock()
+    mock_get_db.return_value = mock_conn
+    mock_conn.cursor.return_value = cursor
+    dados = {'nomeBarbearia': 'Barbearia do Zé', 'cnpjCpf': '12345678900', 'responsavel': 'José',
+             'whatsapp': '31988887777', 'email': 'ze@exemplo.com', 'senha': 'segredo'}
+
+    with app.test_client() as client:
+        response = client.post('/api/barbearias', json=dados)
+
+    assert response.get_json()['success'] is True
+    ((sql, params),) = _sqls(cursor)
+    assert sql.strip().startswith('INSERT INTO barbearias') and params[-1] == 'sem_endereco'
+
+
+@patch('app.get_db_connection')
+def test_busca_por_proximidade_ignora_barbearia_com_endereco_pendente(mock_get_db):
+    import app as app_module
+    mock_conn, cursor = MagicMock(), MagicMock()
+    mock_get_db.return_value = mock_conn
+    mock_conn.cursor.return_value = cursor
+    cursor.fetchall.return_value = [
+        {'id': 1, 'latitude': -19.4700, 'longitude': -42.5400, 'geocode_status': STATUS_OK},
+        {'id': 2, 'latitude': -19.4701, 'longitude': -42.5401, 'geocode_status': STATUS_PENDENTE},
+    ]
+
+    with patch.object(app_module.schedule_cache, 'get_many', return_value={}), \
+            patch('app.serialize_barbearia_for_template', side_effect=lambda cur, r, bid, fn: {}):
+        resultados = app_module.barbearias_service.find_nearby_barbearias(-19.47, -42.54, 5.0)
+
+    assert [r['id'] for r in resultados] == ['1']
+
+
+def test_limite_do_nominatim_conta_so_como_limitada():
+    from geopy.exc import GeocoderQuotaExceeded
+    from backend.geocoding import nominatim_geocode
+    from backend.resilience import Quota, UpstreamGuard
+    guarda = UpstreamGuard('nominatim', Quota(rate=100, burst=100))
+    geolocalizador = MagicMock()
+    geolocalizador.geocode.side_effect = GeocoderQuotaExceeded('HTTP 429')
+
+    with patch('backend.geocoding.get_guard', return_value=guarda), \
+            patch('backend.geocoding._nominatim', return_value=geolocalizador):
+        with pytest.raises(GeocoderQuotaExceeded):
+            nominatim_geocode(ENDERECO)
+
+    stats = guarda.snapshot()
+    assert (stats['falhas'], stats['limitadas_pelo_upstream']) == (0, 1)
@@ -0,0 +1,198 @@
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend import resilience
+from backend.google_places_integration import GooglePlacesAPI
+
+
+@pytest.fixture(autouse=True)
+def cotas_novas():
+    resilience._guards.clear()
+    yield
+    resilience._guards.clear()
+
+
+def resposta(data):
+    response = MagicMock()
+    response.json.return_value = data
+    return response
+
+
+def api_com(*respostas):
+    api = GooglePlacesAPI('chave-teste')
+    api.session = MagicMock()
+    api.session.get.side_effect = list(respostas)
+    return api
+
+
+DETALHES = {'status': 'OK', 'result': {'place_id': 'p1', 'formatted_address': 'Rua A, Ipatinga',
+                                       'name': 'Barbearia A', 'geometry': {'location': {'lat': -19.4, 'lng': -42.5}}}}
+
+
+def test_detalhes_do_mesmo_place_id_usam_o_cache():
+    api = api_com(resposta(DETALHES))
+
+    primeiro = api.get_place_details('p1')
+    segundo = api.get_place_details('p1')
+
+    assert primeiro == segundo
+    assert api.session.get.call_count == 1
+
+
+def test_chave_ignora_api_key_acentos_e_espacos():
+    api = api_com(resposta({'status': 'OK', 'predictions': [{'description': 'Rua Timóteo, Ipatinga'}]}))
+
+    api.get_place_autocomplete('Rua  Timóteo')
+    api.api_key = 'outra-chave'
+    sugestoes = api.get_place_autocomplete('rua timoteo')
+
+    assert sugestoes == [{'description': 'Rua Timóteo, Ipatinga'}]
+    assert api.session.get.call_count == 1
+
+
+def test_erro_transitorio_nao_fica_em_cache():
+    api = api_com(resposta({'status': 'UNKNOWN_ERROR'}), resposta(DETALHES))
+
+    assert api.get_place_details('p1') is None
+    assert api.get_place_details('p1').name == 'Barbearia A'
+    assert api.session.get.call_count == 2
+
+
+def test_resultado_em_cache_nao_e_alterado_pelo_chamador():
+    api = api_com(resposta({'status': 'OK', 'results': [{'place_id': 'p1', 'name': 'A'}]}))
+
+    api.search_nearby_places(-19.47, -42.54)[0]['distance'] = 1.2
+
+    assert 'distance' not in api.search_nearby_places(-19.47, -42.54)[0]
+
+
+def test_chamadas_simultaneas_viram_uma_requisicao():
+    api = GooglePlacesAPI('chave-teste')
+    liberar = threading.Event()
+
+    def get_lento(*args, **kwargs):
+        liberar.wait(2)
+        return resposta(DETALHES)
+
+    api.session = MagicMock()
+    api.session.get.side_effect = get_lento
+    threads = [threading.Thread(target=api.get_place_details, args=('p1',)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while api.flight.coalesced < 3:
+        time.sleep(0.01)
+    liberar.set()
+    for t in threads:
+        t.join()
+
+    assert api.session.get.call_count == 1
+
+
+def pagina(ids, token=None):
+    data = {'status': 'OK', 'results': [{'place_id': i, 'name': i} for i in ids]}
+    if token:
+        data['next_page_token'] = token
+    return data
+
+
+def servico_com(rotas, atraso=0.0):
+    """PlacesService com a sessão trocada por respostas por (tipo | pagetoken)"""
+    from backend.google_places_integration import PlacesService
+    servico = PlacesService('chave-teste')
+    servico.places_api.page_token_delay = 0
+    chamadas = []
+
+    def get(url, params=None, timeout=None):
+        chamadas.append(dict(params))
+        time.sleep(atraso)
+        return resposta(rotas[params.get('pagetoken') or params['type']])
+
+    servico.places_api.session = MagicMock()
+    servico.places_api.session.get.side_effect = get
+    return servico, chamadas
+
+
+def test_tipos_sao_buscados_em_paralelo():
+    servico, _ = servico_com({'beauty_salon': pagina(['a']), 'hair_care': pagina(['b']),
+                              'establishment': pagina(['c'])}, atraso=0.3)
+
+    inicio = time.perf_counter()
+    resultados = servico.find_nearby_barbearias(-19.47, -42.54)
+
+    assert time.perf_counter() - inicio < 0.6
+    assert sorted(r['place_id'] for r in resultados) == ['a', 'b', 'c']
+
+
+def test_segue_next_page_token_sem_repetir_place_id():
+    servico, chamadas = servico_com({'beauty_salon': pagina(['a', 'b'], token='t1'), 't1': pagina(['c']),
+                                     'hair_care': pagina(['b', 'd']), 'establishment': pagina([])})
+
+    ids = [r['place_id'] for r in servico.find_nearby_barbearias(-19.47, -42.54)]
+
+    assert sorted(ids) == ['a', 'b', 'c', 'd']
+    assert {'pagetoken': 't1', 'key': 'chave-teste'} in chamadas
+
+
+def test_sem_consumo_as_buscas_nao_paginam_tudo_e_param_ao_fechar():
+    rotas = {'beauty_salon': pagina(['a1', 'a2'], token='ta'), 'ta': pagina(['a3'], token='ta2'), 'ta2': pagina(['a4']),
+             'hair_care': pagina(['b1'], token='tb'), 'tb': pagina(['b2'], token='tb2'), 'tb2': pagina(['b3']),
+             'establishment': pagina(['c1'], token='tc'), 'tc': pagina(['c2'], token='tc2'), 'tc2': pagina(['c3'])}
+    servico, chamadas = servico_com(rotas)
+
+    resultados = servico.iter_nearby_barbearias(-19.47, -42.54)
+    next(resultados)
+    time.sleep(0.3)
+    # Fila limitada: parado o consumo, as buscas esperam em vez de pedir as 9 páginas
+    pedidas = len(chamadas)
+    assert pedidas < len(rotas)
+
+    resultados.close()
+    time.sleep(0.3)
+    assert len(chamadas) == pedidas
+
+
+def test_stop_encerra_o_consumidor_sem_esperar_pagina_nova():
+    servico, _ = servico_com({'beauty_salon': pagina(['a']), 'hair_care': pagina(['b']),
+                              'establishment': pagina(['c'])}, atraso=1.0)
+    stop = threading.Event()
+    stop.set()
+
+    inicio = time.perf_counter()
+    assert list(servico.iter_nearby_barbearias(-19.47, -42.54, stop=stop)) == []
+    assert time.perf_counter() - inicio < 0.5
+
+
+def test_token_ainda_invalido_e_tentado_de_novo():
+    api = api_com(resposta(pagina(['a'], token='t1')), resposta({'status': 'INVALID_REQUEST'}),
+                  resposta(pagina(['b'])))
+    api.page_token_delay = 0
+
+    paginas = list(api.iter_nearby_pages(-19.47, -42.54, place_type='hair_care'))
+
+    assert [[r['place_id'] for r in p] for p in paginas] == [['a'], ['b']]
+
+
+def test_proxima_pagina_so_e_pedida_sob_demanda():
+    api = api_com(resposta(pagina(['a'], token='t1')), resposta(pagina(['b'])))
+    api.page_token_delay = 0
+
+    paginas = api.iter_nearby_pages(-19.47, -42.54)
+    next(paginas)
+
+    assert api.session.get.call_count == 1
+
+
+def test_over_query_limit_abre_o_circuito():
+    api = api_com(resposta({'status': 'OVER_QUERY_LIMIT'}), resposta(DETALHES))
+
+    assert api.get_place_details('p1') is None
+    assert api.get_place_details('p1') is None
+    assert api.session.get.call_count == 1
+    assert resilience.quota_snapshot()['google_places']['circuito'] == 'aberto'
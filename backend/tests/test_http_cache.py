@@ -0,0 +1,67 @@
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import app, etag_stats
+from backend.http_cache import make_etag, etag_matches
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+def _conexao(versoes):
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = lambda: (
+        [{'recurso': 'servicos', 'versao': versoes}]
+        if 'recurso_versoes' in cursor.execute.call_args[0][0] else []
+    )
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+
+def test_if_none_match_aceita_lista_e_etag_fraca():
+    etag = make_etag('rota', 1)
+    assert etag_matches(f'"outra", W/{etag}', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag('rota', 2), etag)
+
+
+@patch('app.get_db_connection')
+def test_servicos_responde_304_sem_consulta_completa(mock_get_db, client):
+    conn, cursor = _conexao(3)
+    mock_get_db.return_value = conn
+
+    primeira = client.get('/api/barbearias/1/servicos')
+    etag = primeira.headers['ETag']
+    assert primeira.status_code == 200
+
+    cursor.execute.reset_mock()
+    segunda = client.get('/api/barbearias/1/servicos', headers={'If-None-Match': etag})
+    assert segunda.status_code == 304
+    assert segunda.headers['ETag'] == etag
+    sqls = [c[0][0] for c in cursor.execute.call_args_list]
+    assert len(sqls) == 1 and 'recurso_versoes' in sqls[0]
+    assert etag_stats.snapshot()['barbearia_servicos']['hits'] >= 1
+
+
+@patch('app.get_db_connection')
+def test_nova_versao_invalida_etag(mock_get_db, client):
+    conn, _ = _conexao(3)
+    mock_get_db.return_value = conn
+    etag = client.get('/api/barbearias/1/servicos').headers['ETag']
+
+    conn, _ = _conexao(4)
+    mock_get_db.return_value = conn
+    resposta = client.get('/api/barbearias/1/servicos', headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert resposta.headers['ETag'] != etag
@@ -0,0 +1,192 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.migrations import (discover_migrations, split_statements, run_migrations, check_query_plans,
+                                HOT_QUERIES)
+
+
+class ErroMySQL(Exception):
+    def __init__(self, errno, msg):
+        super().__init__(msg)
+        self.errno = errno
+
+
+class CursorFalso:
+    """Registra os comandos e simula schema_version, o lock e erros por trecho de SQL"""
+
+    def __init__(self, aplicadas=(), erros=None, parciais=None, lock=1):
+        # versão -> (comandos_aplicados, concluida)
+        self.versoes = {v: (0, True) for v in aplicadas}
+        self.versoes.update({v: (n, False) for v, n in (parciais or {}).items()})
+        self.erros = erros or {}
+        self.lock = lock
+        self.executados = []
+        self._resultado = []
+
+    @property
+    def aplicadas(self):
+        return {v for v, (_, concluida) in self.versoes.items() if concluida}
+
+    def execute(self, sql, params=None):
+        self.executados.append(sql)
+        for trecho, erro in self.erros.items():
+            if trecho in sql:
+                raise erro
+        self._resultado = []
+        if sql.startswith('SELECT GET_LOCK'):
+            self._resultado = [(self.lock,)]
+        elif 'INSERT INTO schema_version' in sql:
+            self.versoes[params[0]] = (params[2], 'TRUE)' in sql)
+        elif sql == 'SELECT versao FROM schema_version WHERE concluida = TRUE':
+            self._resultado = [(v,) for v in self.aplicadas]
+        elif sql.startswith('SELECT versao, comandos_aplicados'):
+            self._resultado = [(v, n) for v, (n, concluida) in self.versoes.items() if not concluida]
+
+    def fetchall(self):
+        return self._resultado
+
+    def close(self):
+        pass
+
+
+def _escrever(tmp_path, nome, conteudo):
+    (tmp_path / nome).write_text(conteudo, encoding='utf-8')
+
+
+def test_migracoes_do_repositorio_estao_em_ordem_e_sem_lacunas():
+    versoes = [m.version for m in discover_migrations()]
+    assert versoes == list(range(1, len(versoes) + 1))
+
+
+def test_split_ignora_comentarios_e_linhas_vazias():
+    sql = "-- comentário\nCREATE TABLE a (id INT);\n\n-- outro\nCREATE INDEX i ON a (id);\n"
+    assert split_statements(sql) == ["CREATE TABLE a (id INT)", "CREATE INDEX i ON a (id)"]
+
+
+def test_aplica_somente_versoes_pendentes_em_ordem(tmp_path):
+    _escrever(tmp_path, '0002_b.sql', 'CREATE INDEX b ON t (x);')
+    _escrever(tmp_path, '0001_a.sql', 'CREATE TABLE t (x INT);')
+    _escrever(tmp_path, '0003_c.sql', 'CREATE INDEX c ON t (x);')
+    _escrever(tmp_path, 'LEIAME.txt', 'ignorado')
+    cursor = CursorFalso(aplicadas={1})
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    assert run_migrations(conn, str(tmp_path), log=lambda m: None) == [2, 3]
+    ddl = [s for s in cursor.executados if s.startswith('CREATE INDEX')]
+    assert ddl == ['CREATE INDEX b ON t (x)', 'CREATE INDEX c ON t (x)']
+    assert run_migrations(conn, str(tmp_path), log=lambda m: None) == []
+
+
+def test_indice_ja_existente_em_banco_legado_e_tolerado(tmp_path):
+    _escrever(tmp_path, '0001_idx.sql', 'CREATE INDEX dup ON t (x);')
+    cursor = CursorFalso(erros={'CREATE INDEX dup': ErroMySQL(1061, "Duplicate key name 'dup'")})
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    assert run_migrations(conn, str(tmp_path), log=lambda m: None) == [1]
+
+
+def test_duplicado_apos_a_base_legada_nao_e_tolerado(tmp_path):
+    _escrever(tmp_path, '0001_base.sql', 'CREATE TABLE IF NOT EXISTS t (x INT);')
+    _escrever(tmp_path, '0003_idx.sql', 'CREATE INDEX dup ON t (x);')
+    cursor = CursorFalso(erros={'CREATE INDEX dup': ErroMySQL(1061, "Duplicate key name 'dup'")})
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    try:
+        run_migrations(conn, str(tmp_path), log=lambda m: None)
+        assert False, "deveria ter falhado"
+    except RuntimeError as e:
+        assert '0003_idx' in str(e)
+    assert cursor.aplicadas == {1}
+
+
+def test_erro_real_interrompe_sem_registrar_versao(tmp_path):
+    _escrever(tmp_path, '0001_ruim.sql', 'ALTER TABLE inexistente ADD COLUMN y INT;')
+    cursor = CursorFalso(erros={'inexistente': ErroMySQL(1146, "Table doesn't exist")})
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    try:
+        run_migrations(conn, str(tmp_path), log=lambda m: None)
+        assert False, "deveria ter falhado"
+    except RuntimeError as e:
+        assert '0001_ruim' in str(e)
+    assert 1 not in cursor.aplicadas
+
+
+def test_lock_ocupado_por_outro_processo_nao_migra(tmp_path):
+    _escrever(tmp_path, '0001_a.sql', 'CREATE TABLE t (x INT);')
+    cursor = CursorFalso(lock=0)
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    try:
+        run_migrations(conn, str(tmp_path), log=lambda m: None)
+        assert False, "deveria ter falhado"
+    except RuntimeError as e:
+        assert 'lock' in str(e)
+    assert not any(s.startswith('CREATE TABLE t') for s in cursor.executados)
+
+
+def test_falha_no_meio_registra_progresso_e_retoma_no_comando_seguinte(tmp_path):
+    _escrever(tmp_path, '0003_multi.sql', 'ALTER TABLE t ADD COLUMN a INT;\nALTER TABLE t ADD COLUMN b INT;\n'
+                                         'CREATE INDEX c ON t (b);')
+    cursor = CursorFalso(aplicadas={1, 2}, erros={'ADD COLUMN b': ErroMySQL(1205, "Lock wait timeout")})
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    try:
+        run_migrations(conn, str(tmp_path), log=lambda m: None)
+        assert False, "deveria ter falhado"
+    except RuntimeError as e:
+        assert 'comando 2 de 3' in str(e) and 'comandos 1-1 já aplicados' in str(e)
+    assert cursor.versoes[3] == (1, False)
+
+    cursor.erros = {}
+    cursor.executados = []
+    assert run_migrations(conn, str(tmp_path), log=lambda m: None) == [3]
+    ddl = [s for s in cursor.executados if s.startswith(('ALTER', 'CREATE INDEX'))]
+    assert ddl == ['ALTER TABLE t ADD COLUMN b INT', 'CREATE INDEX c ON t (b)']
+    assert cursor.versoes[3] == (3, True)
+
+
+def test_retomada_tolera_duplicado_so_no_comando_interrompido(tmp_path):
+    _escrever(tmp_path, '0004_idx.sql', 'CREATE INDEX a ON t (x);\nCREATE INDEX b ON t (y);')
+    # Sem registro de início, o duplicado não vem de uma execução interrompida
+    cursor = CursorFalso(erros={'CREATE INDEX a': ErroMySQL(1061, "Duplicate key name 'a'")})
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+
+    try:
+        run_migrations(conn, str(tmp_path), log=lambda m: None)
+        assert False, "deveria ter falhado"
+    except RuntimeError:
+        pass
+
+    # O índice a foi criado, mas o processo caiu antes de registrar o progresso
+    cursor = CursorFalso(parciais={4: 0}, erros={'CREATE INDEX a': ErroMySQL(1061, "Duplicate key name 'a'")})
+    conn.cursor.return_value = cursor
+    assert run_migrations(conn, str(tmp_path), log=lambda m: None) == [4]
+
+
+def test_verificacao_de_plano_aponta_indice_nao_usado():
+    cursor = MagicMock()
+    planos = [[{'table': q.table, 'key': sorted(q.expected_keys)[0]}] for q in HOT_QUERIES]
+    planos[-1] = [{'table': HOT_QUERIES[-1].table, 'key': None}]
+    cursor.fetchall.side_effect = planos
+
+    relatorio = check_query_plans(cursor)
+    assert [r['ok'] for r in relatorio] == [True] * (len(HOT_QUERIES) - 1) + [False]
+    assert all(c[0][0].startswith('EXPLAIN ') for c in cursor.execute.call_args_list)
+
+
+def test_soma_de_notas_do_rollup_diario_aceita_notas_fracionarias():
+    migracoes = {m.version: m for m in discover_migrations()}
+    (criacao,) = [c for c in migracoes[7].statements() if c.startswith('CREATE TABLE IF NOT EXISTS metricas_diarias')]
+    assert 'soma_notas DECIMAL(12, 1)' in criacao
+    assert not any('metricas_diarias' in c for v, m in migracoes.items() if v != 7 for c in m.statements())
@@ -0,0 +1,128 @@
+import os
+import sys
+from datetime import datetime, date, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.outbox import (OutboxWorker, NotificationChannel, render_notifications, reminder_time_utc,
+                            EVENTO_CRIADO, EVENTO_LEMBRETE)
+
+AGORA = datetime(2026, 3, 10, 12, 0, 0)
+
+CONTEXTO = {
+    'id': 7, 'status': 'confirmado', 'data_agendamento': date(2026, 3, 12), 'horario_inicio': timedelta(hours=14),
+    'nome_cliente': 'Ana', 'email_cliente': 'ana@example.com', 'nome_barbearia': 'Barbearia X',
+    'email_barbearia': 'x@example.com', 'nome_servico': 'Corte',
+}
+
+
+class CanalMemoria(NotificationChannel):
+    name = 'memoria'
+
+    def __init__(self, falhar=False):
+        self.enviadas = []
+        self.falhar = falhar
+
+    def send(self, notification):
+        if self.falhar:
+            raise ConnectionError("SMTP indisponível")
+        self.enviadas.append(notification)
+
+
+def _worker(eventos, canal, **kwargs):
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [eventos, [CONTEXTO]]
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    worker = OutboxWorker(lambda: conn, [canal], clock=lambda: AGORA, **kwargs)
+    return worker, conn, cursor
+
+
+def _updates(cursor):
+    """UPDATEs de conclusão (sem a reserva do lote como 'processando')"""
+    return [c[0] for c in cursor.execute.call_args_list
+            if c[0][0].lstrip().startswith('UPDATE') and "status = 'processando'," not in c[0][0]]
+
+
+def test_lote_entregue_marca_evento_como_enviado():
+    canal = CanalMemoria()
+    eventos = [{'id': 1, 'tipo_evento': EVENTO_CRIADO, 'agregado_id': 7, 'payload': '{}', 'tentativas': 0}]
+    worker, conn, cursor = _worker(eventos, canal)
+
+    assert worker.run_once() == 1
+    assert {n.destinatario for n in canal.enviadas} == {'ana@example.com', 'x@example.com'}
+    sql, params = _updates(cursor)[0]
+    assert "status = 'enviado'" in sql and params == (AGORA, 1)
+
+
+def test_lote_e_reservado_e_comitado_antes_do_envio():
+    ordem = []
+
+    class CanalQueRegistra(CanalMemoria):
+        def send(self, notification):
+            ordem.append('envio')
+
+    eventos = [{'id': 1, 'tipo_evento': EVENTO_CRIADO, 'agregado_id': 7, 'payload': '{}', 'tentativas': 0}]
+    worker, conn, cursor = _worker(eventos, CanalQueRegistra())
+    conn.commit.side_effect = lambda: ordem.append('commit')
+
+    worker.run_once()
+
+    reserva = [c[0] for c in cursor.execute.call_args_list if "status = 'processando'," in c[0][0]]
+    assert reserva and reserva[0][1] == (AGORA + timedelta(seconds=worker.lease_seconds), 1)
+    # Reserva e leitura do contexto comitadas antes do SMTP; conclusão num commit próprio
+    assert ordem == ['commit', 'commit', 'envio', 'envio', 'commit']
+
+
+def test_reserva_com_prazo_vencido_e_retomada():
+    worker, conn, cursor = _worker([], CanalMemoria())
+
+    assert worker.run_once() == 0
+    sql = cursor.execute.call_args_list[0][0][0]
+    assert "status IN ('pendente', 'processando')" in sql and 'SKIP LOCKED' in sql
+
+
+def test_canal_sem_send_nao_pode_ser_instanciado():
+    class CanalIncompleto(NotificationChannel):
+        pass
+
+    with pytest.raises(TypeError):
+        CanalIncompleto()
+
+
+def test_falha_no_canal_reagenda_com_backoff():
+    eventos = [{'id': 2, 'tipo_evento': EVENTO_CRIADO, 'agregado_id': 7, 'payload': '{}', 'tentativas': 0}]
+    worker, conn, cursor = _worker(eventos, CanalMemoria(falhar=True), base_delay=60)
+
+    worker.run_once()
+    sql, params = _updates(cursor)[0]
+    assert 'disponivel_em' in sql and "status = 'pendente'" in sql
+    tentativas, retry_at = params[0], params[1]
+    assert tentativas == 1
+    assert AGORA + timedelta(seconds=48) <= retry_at <= AGORA + timedelta(seconds=72)
+    assert worker.stats['reagendados'] == 1
+
+
+def test_excesso_de_tentativas_descarta_evento():
+    eventos = [{'id': 3, 'tipo_evento': EVENTO_CRIADO, 'agregado_id': 7, 'payload': '{}', 'tentativas': 4}]
+    worker, conn, cursor = _worker(eventos, CanalMemoria(falhar=True), max_attempts=5)
+
+    worker.run_once()
+    sql, _ = _updates(cursor)[0]
+    assert "status = 'falhou'" in sql
+    assert worker.stats['falhos'] == 1
+
+
+def test_lembrete_ignorado_se_agendamento_nao_esta_confirmado():
+    evento = {'id': 4, 'tipo_evento': EVENTO_LEMBRETE}
+    assert render_notifications(evento, dict(CONTEXTO, status='cancelado')) == []
+    assert len(render_notifications(evento, CONTEXTO)) == 1
+
+
+def test_horario_do_lembrete_em_utc():
+    # 14:00 em Brasília (UTC-3) = 17:00 UTC; lembrete 24h antes
+    assert reminder_time_utc('2026-03-12', '14:00') == datetime(2026, 3, 11, 17, 0)
+    assert reminder_time_utc('data inválida', '14:00') is None
@@ -0,0 +1,123 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.resilience import (CircuitBreaker, CircuitOpen, Quota, QuotaExceeded, TokenBucket, UpstreamGuard,
+                                _quota_from_env)
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 100.0
+        self.esperas = []
+
+    def __call__(self):
+        return self.agora
+
+    def dormir(self, segundos):
+        self.esperas.append(segundos)
+        self.agora += segundos
+
+
+def test_bucket_libera_a_rajada_e_repoe_pela_taxa():
+    relogio = Relogio()
+    bucket = TokenBucket(rate=2, burst=2, clock=relogio, sleep=relogio.dormir)
+
+    assert bucket.acquire() and bucket.acquire()
+    assert not bucket.acquire()
+    relogio.agora += 0.5
+    assert bucket.acquire()
+
+
+def test_bucket_espera_dentro_do_prazo():
+    relogio = Relogio()
+    bucket = TokenBucket(rate=1, burst=1, clock=relogio, sleep=relogio.dormir)
+    bucket.acquire()
+
+    assert bucket.acquire(timeout=1.5)
+    assert relogio.esperas == [pytest.approx(1.0)]
+
+
+def test_circuito_abre_apos_falhas_e_testa_uma_chamada_depois():
+    relogio = Relogio()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=relogio)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert not breaker.allow()
+    relogio.agora += 30
+    assert breaker.allow()
+    assert not breaker.allow()  # só uma chamada de teste por vez
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_guarda_falha_rapido_com_circuito_aberto():
+    relogio = Relogio()
+    guarda = UpstreamGuard('teste', Quota(rate=100, burst=100, failure_threshold=1), clock=relogio)
+    chamadas = []
+
+    def upstream():
+        chamadas.append(1)
+        raise ConnectionError('fora do ar')
+
+    with pytest.raises(ConnectionError):
+        guarda.call(upstream)
+    with pytest.raises(CircuitOpen):
+        guarda.call(upstream)
+
+    assert len(chamadas) == 1
+    assert guarda.snapshot()['negadas_circuito'] == 1
+
+
+def test_guarda_recusa_sem_cota_e_abre_com_resposta_de_limite():
+    relogio = Relogio()
+    guarda = UpstreamGuard('teste', Quota(rate=1, burst=1), clock=relogio, sleep=relogio.dormir)
+
+    assert guarda.call(lambda: 'ok') == 'ok'
+    with pytest.raises(QuotaExceeded):
+        guarda.call(lambda: 'ok')
+
+    relogio.agora += 1
+    guarda.call(lambda: {'status': 'OVER_QUERY_LIMIT'}, throttled=lambda d: d['status'] == 'OVER_QUERY_LIMIT')
+    assert guarda.breaker.state == CircuitBreaker.OPEN
+    assert guarda.snapshot()['limitadas_pelo_upstream'] == 1
+
+
+def test_excecao_de_cota_do_upstream_conta_so_como_limitada():
+    relogio = Relogio()
+    guarda = UpstreamGuard('teste', Quota(rate=100, burst=100), clock=relogio)
+
+    def upstream():
+        raise PermissionError('HTTP 429')
+
+    with pytest.raises(PermissionError):
+        guarda.call(upstream, throttled_error=lambda e: isinstance(e, PermissionError))
+
+    stats = guarda.snapshot()
+    assert (stats['falhas'], stats['limitadas_pelo_upstream']) == (0, 1)
+
+
+def test_recusa_local_dentro_da_chamada_nao_conta_como_falha():
+    relogio = Relogio()
+    guarda = UpstreamGuard('teste', Quota(rate=100, burst=100, failure_threshold=1), clock=relogio)
+
+    def upstream():
+        raise QuotaExceeded('cota interna')
+
+    with pytest.raises(QuotaExceeded):
+        guarda.call(upstream)
+
+    assert guarda.snapshot()['falhas'] == 0
+    assert guarda.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cota_configuravel_por_ambiente(monkeypatch):
+    monkeypatch.setenv('GEO_QUOTA_NOMINATIM', '0.5:2')
+
+    quota = _quota_from_env('nominatim', Quota(1, 1, max_wait=1.5))
+
+    assert (quota.rate, quota.burst, quota.max_wait) == (0.5, 2, 1.5)
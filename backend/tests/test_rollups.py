@@ -0,0 +1,50 @@
+import os
+import sys
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.rollups import apply_change, query_series, METRIC_COLUMNS
+
+AGENDAMENTO = {'barbearia_id': 1, 'data_agendamento': '2026-03-10', 'servico_id': 5,
+               'status': 'confirmado', 'valor_total': Decimal('40.00'), 'avaliacao_nota': None}
+
+
+def _deltas(cursor):
+    return [dict(zip(METRIC_COLUMNS, c[0][1][3:])) for c in cursor.execute.call_args_list]
+
+
+def test_conclusao_move_contagem_e_soma_receita():
+    cursor = MagicMock()
+    apply_change(cursor, AGENDAMENTO, dict(AGENDAMENTO, status='concluido'))
+
+    (delta,) = _deltas(cursor)
+    assert delta['qtd_confirmado'] == -1 and delta['qtd_concluido'] == 1
+    assert delta['qtd_total'] == 0 and delta['receita'] == Decimal('40.00')
+
+
+def test_avaliacao_soma_nota_sem_alterar_contagens():
+    cursor = MagicMock()
+    apply_change(cursor, AGENDAMENTO, dict(AGENDAMENTO, avaliacao_nota=4))
+
+    (delta,) = _deltas(cursor)
+    assert delta['soma_notas'] == 4 and delta['qtd_notas'] == 1 and delta['qtd_total'] == 0
+
+
+def test_alteracao_sem_efeito_nao_grava():
+    cursor = MagicMock()
+    apply_change(cursor, AGENDAMENTO, dict(AGENDAMENTO))
+    cursor.execute.assert_not_called()
+
+
+def test_serie_diaria_preenche_dias_sem_movimento():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{'chave': date(2026, 3, 2), 'qtd_total': 3, 'qtd_concluido': 2,
+                                     'receita': Decimal('80'), 'soma_notas': 9, 'qtd_notas': 2}]
+    serie = query_series(cursor, 1, date(2026, 3, 1), date(2026, 3, 3), 'day')
+
+    assert [p['key'] for p in serie] == ['2026-03-01', '2026-03-02', '2026-03-03']
+    assert serie[1]['bookings'] == 3 and serie[1]['averageRating'] == 4.5
+    assert serie[0]['bookings'] == 0 and serie[0]['averageRating'] is None
@@ -0,0 +1,153 @@
+import os
+import sys
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.schedule import diff_schedule, apply_schedule_diff, normalize_time, ScheduleCache
+
+GRAVADO_STATUS = {'monday': 'open', 'tuesday': 'open', 'sunday': 'closed'}
+GRAVADO_FAIXAS = [
+    (1, 'monday', timedelta(hours=9), timedelta(hours=12)),
+    (2, 'monday', timedelta(hours=13), timedelta(hours=18)),
+    (3, 'tuesday', timedelta(hours=9), timedelta(hours=18)),
+]
+
+
+def _grade(**dias):
+    return {dia: {'status': 'open', 'slots': [{'start': a, 'end': b} for a, b in faixas]} if faixas is not None
+            else {'status': 'closed'} for dia, faixas in dias.items()}
+
+
+def test_grade_identica_nao_gera_alteracoes():
+    grade = _grade(monday=[('09:00', '12:00'), ('13:00', '18:00')], tuesday=[('09:00', '18:00')], sunday=None)
+    assert diff_schedule(GRAVADO_STATUS, GRAVADO_FAIXAS, grade).is_empty()
+
+
+def test_so_a_faixa_alterada_e_trocada():
+    grade = _grade(monday=[('09:00', '12:00'), ('14:00', '18:00')], tuesday=[('09:00', '18:00')], sunday=None)
+    diff = diff_schedule(GRAVADO_STATUS, GRAVADO_FAIXAS, grade)
+
+    assert diff.slot_deletes == [2]
+    assert diff.slot_inserts == [('monday', '14:00:00', '18:00:00')]
+    assert not diff.status_upserts and not diff.status_deletes
+
+
+def test_fechar_dia_remove_faixas_e_dia_ausente_perde_status():
+    grade = _grade(monday=[('09:00', '12:00'), ('13:00', '18:00')], tuesday=None)
+    diff = diff_schedule(GRAVADO_STATUS, GRAVADO_FAIXAS, grade)
+
+    assert diff.status_upserts == [('tuesday', 'closed')]
+    assert diff.status_deletes == ['sunday']
+    assert diff.slot_deletes == [3]
+
+
+def test_faixa_invertida_e_rejeitada():
+    with pytest.raises(ValueError):
+        diff_schedule({}, [], _grade(friday=[('18:00', '09:00')]))
+    with pytest.raises(ValueError):
+        normalize_time('25:00')
+
+
+def test_aplicacao_usa_comandos_em_lote():
+    diff = diff_schedule({}, [], _grade(monday=[('09:00', '12:00'), ('13:00', '18:00')], friday=None))
+    cursor = MagicMock()
+    apply_schedule_diff(cursor, 7, diff)
+
+    assert cursor.executemany.call_count == 2
+    assert cursor.execute.call_count == 0
+    assert len(cursor.executemany.call_args_list[1][0][1]) == 2
+
+
+def _cursor_grade(versao):
+    """Cursor falso: versões, status e faixas conforme a consulta executada"""
+    cur = MagicMock()
+    respostas = []
+
+    def execute(sql, params=None):
+        if 'recurso_versoes' in sql:
+            respostas.append([{'escopo_id': 7, 'versao': versao[0]}])
+        elif 'horarios_status' in sql:
+            respostas.append([{'barbearia_id': 7, 'dia_semana': 'monday', 'status': 'open'},
+                              {'barbearia_id': 7, 'dia_semana': 'sunday', 'status': 'closed'}])
+        else:
+            respostas.append([{'barbearia_id': 7, 'dia_semana': 'monday',
+                               'inicio': timedelta(hours=13), 'fim': timedelta(hours=18)},
+                              {'barbearia_id': 7, 'dia_semana': 'monday',
+                               'inicio': timedelta(hours=9), 'fim': timedelta(hours=12)}])
+    cur.execute.side_effect = execute
+    cur.fetchall.side_effect = lambda: respostas.pop(0)
+    return cur
+
+
+def test_grade_compilada_em_minutos_e_formato_de_exibicao():
+    grade = ScheduleCache().get(_cursor_grade([1]), 7)
+
+    assert grade.day_ranges('monday') == ((540, 720), (780, 1080))
+    assert grade.is_closed('sunday') and not grade.is_closed('tuesday')
+    horas = grade.opening_hours()
+    assert horas['monday'] == {'open': '09:00', 'close': '18:00'}
+    assert horas['tuesday'] == {'closed': True}
+
+
+def test_cache_so_recarrega_quando_a_versao_muda():
+    versao = [1]
+    cur = _cursor_grade(versao)
+    cache = ScheduleCache()
+    primeira = cache.get(cur, 7)
+    assert cur.execute.call_count == 3
+
+    assert cache.get(cur, 7) is primeira
+    assert cur.execute.call_count == 4  # só a consulta de versão
+
+    versao[0] = 2
+    assert cache.get(cur, 7) is not primeira
+    assert cur.execute.call_count == 7
+
+    cache.invalidate(7)
+    cache.get(cur, 7)
+    assert cur.execute.call_count == 10
+
+
+def test_segmentos_de_abertura_respeitam_faixas_sobrepostas_e_intervalos():
+    from backend.schedule import build_open_segments
+    segmentos = build_open_segments([
+        (1, 'monday', 540, 720), (1, 'monday', 780, 1080),   # almoço fechado
+        (2, 'monday', 600, 900), (2, 'monday', 840, 960),    # faixas sobrepostas
+    ])
+    limites, conjuntos = segmentos['monday']
+
+    def abertas(minuto):
+        from bisect import bisect_right
+        i = bisect_right(limites, minuto) - 1
+        return conjuntos[i] if i >= 0 else frozenset()
+
+    assert abertas(539) == frozenset()
+    assert abertas(540) == {1}
+    assert abertas(730) == {2}
+    assert abertas(900) == {1, 2}
+    assert abertas(959) == {1, 2}
+    assert abertas(960) == {1}
+    assert abertas(1080) == frozenset()
+    assert 'tuesday' not in segmentos
+
+
+def test_indice_de_abertura_so_reconstroi_quando_a_versao_global_muda():
+    from backend.schedule import OpenIndex
+    versao = [1]
+    cur = MagicMock()
+    cur.fetchone.side_effect = lambda: {'versao': versao[0]}
+    cur.fetchall.return_value = [{'barbearia_id': 3, 'dia_semana': 'friday',
+                                  'inicio': timedelta(hours=9), 'fim': timedelta(hours=18)}]
+    indice = OpenIndex()
+
+    assert indice.open_at(cur, 'friday', 600) == {3}
+    assert indice.open_at(cur, 'friday', 1080) == frozenset()
+    assert cur.fetchall.call_count == 1
+
+    versao[0] = 2
+    indice.open_at(cur, 'saturday', 600)
+    assert cur.fetchall.call_count == 2